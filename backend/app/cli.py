@@ -0,0 +1,192 @@
+"""
+Linha de comando para processamento offline.
+
+classify: classifica caixas de email inteiras. Fontes: arquivos mbox, Maildir, diretórios com
+.eml/.txt/.pdf (como mock_emails/) ou arquivos avulsos. A saída é gravada aos poucos (JSONL, CSV ou
+Parquet) com checkpoint: rodar o mesmo comando de novo após uma interrupção continua de onde parou.
+
+train / eval: treina e avalia o modelo local que decide, antes do Gemini, os emails em que tem
+confiança suficiente. Dados: log de decisões do Gemini (AI_DECISION_LOG_PATH), JSONL com
+{"text", "category"} ou diretórios com subpastas produtivo/ e improdutivo/.
+
+Uso (a partir de backend/):
+    python -m app.cli classify ../mock_emails -o resultados.jsonl
+    python -m app.cli classify caixa.mbox ~/Maildir -o resultados.csv --concurrency 16
+    python -m app.cli classify export.mbox -o resultados.parquet --checkpoint-every 5000
+    python -m app.cli classify export.mbox -o resultados.jsonl --restart
+    python -m app.cli train data/ai_decisions.jsonl rotulados.jsonl --holdout 0.2
+    python -m app.cli eval avaliacao.jsonl --threshold 0.95
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.config import BATCH_CONCURRENCY, LOCAL_MODEL_PATH, LOCAL_MODEL_THRESHOLD, LOCAL_MODEL_MIN_STEMS
+from app.services.ingest import OUTPUT_FORMATS, ingest
+from app.utils.concurrency import shutdown_executors, warm_up_cpu_executor
+from app.utils.exceptions import EmailClassifierException
+
+
+def _output_format(args: argparse.Namespace) -> str:
+    if args.format:
+        return args.format
+    extension = os.path.splitext(args.output.lower().rstrip('/'))[1].lstrip('.')
+    return extension if extension in OUTPUT_FORMATS else 'jsonl'
+
+
+def _print_progress(state: Dict[str, Any]) -> None:
+    rate = f" - {state['rate']} msg/s" if state.get('rate') else ''
+    print(
+        f"{state['written']} gravadas ({state['succeeded']} ok, {state['failed']} com erro){rate}",
+        file=sys.stderr,
+        flush=True
+    )
+
+
+async def _classify(args: argparse.Namespace) -> Dict[str, Any]:
+    await warm_up_cpu_executor()
+    try:
+        return await ingest(
+            sources=args.sources,
+            output=args.output,
+            output_format=_output_format(args),
+            checkpoint_path=args.checkpoint or f"{args.output.rstrip('/')}.checkpoint.json",
+            concurrency=args.concurrency,
+            checkpoint_every=args.checkpoint_every,
+            resume=not args.restart,
+            limit=args.limit,
+            progress=_print_progress
+        )
+    finally:
+        shutdown_executors()
+
+
+def _percent(value) -> str:
+    return f"{value:.1%}" if value is not None else '-'
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"Exemplos avaliados: {report['examples']}")
+    print(f"Modelo local sozinho: acurácia {_percent(report['model_accuracy'])} "
+          f"(decide {_percent(report['model_coverage'])} dos emails; os demais têm poucos stems conhecidos)")
+    print(f"Cascata com limiar {report['threshold']}:")
+    print(f"  keywords        {report['keywords']:>7}  acurácia {_percent(report['keywords_accuracy'])}")
+    print(f"  modelo local    {report['local_model']:>7}  acurácia {_percent(report['local_model_accuracy'])}")
+    print(f"  Gemini          {report['gemini']:>7}")
+    print(f"  fora do Gemini  {_percent(report['kept_off_gemini']):>7}")
+    print(f"Inferência do modelo local: {report['predict_microseconds']} µs por email")
+    print()
+    print("limiar  modelo local  acurácia  fora do Gemini")
+    for row in report['sweep']:
+        print(f"{row['threshold']:>6}  {row['local_model']:>12}  {_percent(row['local_model_accuracy']):>8}  "
+              f"{_percent(row['kept_off_gemini']):>14}")
+
+
+def _print_evaluation(report: Dict[str, Any], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+def _train(args: argparse.Namespace) -> int:
+    from app.services.model_training import evaluate, load_examples, split_examples, train_model
+    
+    examples = load_examples(args.data)
+    train_set, holdout_set = split_examples(examples, args.holdout, args.seed)
+    print(f"{len(examples)} exemplos: {len(train_set)} para treino, {len(holdout_set)} para avaliação", file=sys.stderr)
+    
+    model = train_model(train_set, l2=args.l2, min_df=args.min_df)
+    if holdout_set:
+        model.metrics = evaluate(model, holdout_set, args.threshold, args.min_stems)
+        _print_evaluation(model.metrics, args.json)
+    
+    model.save(args.output)
+    print(f"Modelo salvo em {args.output} ({len(model.weights)} stems)", file=sys.stderr)
+    return 0
+
+
+def _eval(args: argparse.Namespace) -> int:
+    from app.services.local_model import LocalModel
+    from app.services.model_training import evaluate, load_examples
+    
+    try:
+        model = LocalModel.load(args.model)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erro: modelo inválido ou ausente em {args.model}: {str(e)}", file=sys.stderr)
+        return 2
+    
+    report = evaluate(model, load_examples(args.data), args.threshold, args.min_stems)
+    _print_evaluation(report, args.json)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m app.cli', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-v', '--verbose', action='store_true', help='Log detalhado (cada mensagem, na classificação)')
+    
+    classify = commands.add_parser('classify', parents=[common], help='Classifica mensagens de mbox, Maildir ou diretórios')
+    classify.add_argument('sources', nargs='+', help='Arquivos mbox, diretórios Maildir, diretórios ou arquivos .eml/.txt/.pdf')
+    classify.add_argument('-o', '--output', required=True, help='Arquivo de saída (diretório de partes para parquet)')
+    classify.add_argument('--format', choices=OUTPUT_FORMATS, help='Formato da saída (padrão: pela extensão, ou jsonl)')
+    classify.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY, help='Mensagens classificadas ao mesmo tempo')
+    classify.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: <saída>.checkpoint.json)')
+    classify.add_argument('--checkpoint-every', type=int, default=500, help='Linhas entre checkpoints')
+    classify.add_argument('--restart', action='store_true', help='Ignora o checkpoint e recomeça, sobrescrevendo a saída')
+    classify.add_argument('--limit', type=int, help='Processa no máximo N mensagens nesta execução')
+    
+    model_options = argparse.ArgumentParser(add_help=False)
+    model_options.add_argument('data', nargs='+', help='JSONL (log de decisões do Gemini ou {"text", "category"}) ou diretórios rotulados')
+    model_options.add_argument('--threshold', type=float, default=LOCAL_MODEL_THRESHOLD, help='Confiança mínima para o modelo decidir')
+    model_options.add_argument('--min-stems', type=int, default=LOCAL_MODEL_MIN_STEMS, help='Stems conhecidos mínimos para o modelo decidir')
+    model_options.add_argument('--json', action='store_true', help='Relatório em JSON')
+    
+    train = commands.add_parser('train', parents=[common, model_options], help='Treina o modelo local')
+    train.add_argument('-o', '--output', default=LOCAL_MODEL_PATH, help='Arquivo do modelo (padrão: LOCAL_MODEL_PATH)')
+    train.add_argument('--holdout', type=float, default=0.2, help='Fração dos exemplos separada para avaliação')
+    train.add_argument('--l2', type=float, default=1.0, help='Regularização L2')
+    train.add_argument('--min-df', type=int, default=2, help='Exemplos mínimos em que um stem aparece para entrar no modelo')
+    train.add_argument('--seed', type=int, default=42)
+    
+    evaluate = commands.add_parser('eval', parents=[common, model_options], help='Avalia o modelo local em exemplos rotulados')
+    evaluate.add_argument('--model', default=LOCAL_MODEL_PATH, help='Arquivo do modelo (padrão: LOCAL_MODEL_PATH)')
+    
+    args = parser.parse_args()
+    
+    # O log por email da API vira ruído em execuções offline; o progresso sai no stderr
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger('app.utils.logger').setLevel(logging.WARNING)
+    
+    try:
+        if args.command == 'train':
+            return _train(args)
+        if args.command == 'eval':
+            return _eval(args)
+        state = asyncio.run(_classify(args))
+    except EmailClassifierException as e:
+        print(f"Erro: {str(e)}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("Interrompido; rode o mesmo comando para continuar do último checkpoint", file=sys.stderr)
+        return 130
+    
+    if not state['completed']:
+        print("Limite atingido; rode o mesmo comando para continuar", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,182 @@
 import os
-from typing import List
+from typing import List, Optional
+
+
+def _env_bool(name: str, default: str = 'false') -> bool:
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Logs: nível (OFF desativa), formato 'json' (uma linha por registro, com request_id) ou 'text'. Com LOG_ASYNC,
+# a requisição só enfileira o registro; formatação e escrita no stdout ficam numa thread própria, e com a fila
+# cheia (stdout lento) o registro é descartado e contado em vez de travar o event loop
+LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO').strip().upper()
+LOG_FORMAT: str = os.getenv('LOG_FORMAT', 'json').strip().lower()
+LOG_ASYNC: bool = _env_bool('LOG_ASYNC', 'true')
+LOG_QUEUE_SIZE: int = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Amostragem por nível abaixo de WARNING, ex.: "INFO=0.1,DEBUG=0.01" (avisos e erros são sempre gravados)
+LOG_SAMPLE_RATES: str = os.getenv('LOG_SAMPLE_RATES', '')
+# Linha de log por requisição (método, caminho, status, duração e tempos por etapa); health checks e /metrics ficam de fora
+LOG_REQUESTS: bool = _env_bool('LOG_REQUESTS', 'true')
 
 CORS_ORIGINS: List[str] = os.getenv('CORS_ORIGINS', '*').split(',')
 RATE_LIMIT_PER_MINUTE: int = int(os.getenv('RATE_LIMIT_PER_MINUTE', '10'))
+# memory:// (por worker), sqlite:///caminho (workers do mesmo host) ou redis://host:6379 (todas as réplicas)
+RATE_LIMIT_STORAGE_URI: str = os.getenv('RATE_LIMIT_STORAGE_URI', 'memory://')
+
+# Concorrência por worker
+MAX_CONCURRENT_REQUESTS: int = int(os.getenv('MAX_CONCURRENT_REQUESTS', '32'))
+REQUEST_QUEUE_TIMEOUT: float = float(os.getenv('REQUEST_QUEUE_TIMEOUT', '5'))
+NLP_EXECUTOR_WORKERS: int = int(os.getenv('NLP_EXECUTOR_WORKERS', '4'))
+
+# Execução das etapas de CPU (parsing de PDF, NLP): 'thread' ou 'process'
+CPU_EXECUTOR_MODE: str = os.getenv('CPU_EXECUTOR_MODE', 'thread').lower()
+CPU_MAX_PENDING: int = int(os.getenv('CPU_MAX_PENDING', str(NLP_EXECUTOR_WORKERS * 4)))
+CPU_TASK_TIMEOUT: float = float(os.getenv('CPU_TASK_TIMEOUT', '30'))
+
+# Extração de PDF (0 = sem limite)
+PDF_MAX_PAGES: int = int(os.getenv('PDF_MAX_PAGES', '20'))
+PDF_MAX_CHARS: int = int(os.getenv('PDF_MAX_CHARS', '20000'))
+
+# NLP
+NLTK_AUTO_DOWNLOAD: bool = _env_bool('NLTK_AUTO_DOWNLOAD')
+STEM_CACHE_SIZE: int = int(os.getenv('STEM_CACHE_SIZE', '50000'))
+
+# Keywords de pré-classificação (JSON opcional, recarregado sem reiniciar)
+KEYWORDS_CONFIG_PATH: str = os.getenv('KEYWORDS_CONFIG_PATH', '')
+KEYWORDS_RELOAD_INTERVAL: float = float(os.getenv('KEYWORDS_RELOAD_INTERVAL', '5'))
+
+# Backend de IA: 'gemini' (API real) ou 'fake' (simulação local para testes de carga)
+AI_BACKEND: str = os.getenv('AI_BACKEND', 'gemini').strip().lower()
+FAKE_AI_LATENCY_MS: float = float(os.getenv('FAKE_AI_LATENCY_MS', '800'))
+FAKE_AI_LATENCY_JITTER_MS: float = float(os.getenv('FAKE_AI_LATENCY_JITTER_MS', '200'))
+FAKE_AI_ERROR_RATE: float = float(os.getenv('FAKE_AI_ERROR_RATE', '0'))
+FAKE_AI_QUOTA_ERROR_RATE: float = float(os.getenv('FAKE_AI_QUOTA_ERROR_RATE', '0'))
+FAKE_AI_SEED: Optional[int] = int(os.getenv('FAKE_AI_SEED')) if os.getenv('FAKE_AI_SEED') else None
+
+# Resiliência das chamadas ao Gemini: prazo total, retentativas com jitter e disjuntor
+AI_CALL_DEADLINE: float = float(os.getenv('AI_CALL_DEADLINE', os.getenv('GEMINI_TIMEOUT', '30')))
+AI_MAX_RETRIES: int = int(os.getenv('AI_MAX_RETRIES', '2'))
+AI_RETRY_BASE_DELAY_MS: float = float(os.getenv('AI_RETRY_BASE_DELAY_MS', '200'))
+AI_RETRY_MAX_DELAY_MS: float = float(os.getenv('AI_RETRY_MAX_DELAY_MS', '2000'))
+AI_RETRY_BUDGET_RATIO: float = float(os.getenv('AI_RETRY_BUDGET_RATIO', '0.1'))
+AI_RETRY_BUDGET_MIN_PER_SECOND: float = float(os.getenv('AI_RETRY_BUDGET_MIN_PER_SECOND', '1'))
+CIRCUIT_BREAKER_ENABLED: bool = _env_bool('CIRCUIT_BREAKER_ENABLED', 'true')
+CIRCUIT_FAILURE_RATE: float = float(os.getenv('CIRCUIT_FAILURE_RATE', '0.5'))
+CIRCUIT_SLOW_CALL_SECONDS: float = float(os.getenv('CIRCUIT_SLOW_CALL_SECONDS', '10'))
+CIRCUIT_SLOW_CALL_RATE: float = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', '0.8'))
+CIRCUIT_WINDOW_SIZE: int = int(os.getenv('CIRCUIT_WINDOW_SIZE', '20'))
+CIRCUIT_MIN_CALLS: int = int(os.getenv('CIRCUIT_MIN_CALLS', '10'))
+CIRCUIT_OPEN_SECONDS: float = float(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+CIRCUIT_HALF_OPEN_PROBES: int = int(os.getenv('CIRCUIT_HALF_OPEN_PROBES', '1'))
+
+# Cota global de chamadas ao Gemini (balde de fichas); esgotada, classifica por keywords. 0 = sem controle
+GEMINI_QUOTA_PER_MINUTE: float = float(os.getenv('GEMINI_QUOTA_PER_MINUTE', '0'))
+GEMINI_QUOTA_BURST: float = float(os.getenv('GEMINI_QUOTA_BURST', '0'))
+GEMINI_QUOTA_STORAGE_URI: str = os.getenv('GEMINI_QUOTA_STORAGE_URI', 'memory://')
+
+# Micro-lotes: emails que chegam juntos são classificados em uma única chamada ao Gemini
+AI_MICROBATCH_ENABLED: bool = _env_bool('AI_MICROBATCH_ENABLED')
+AI_MICROBATCH_WINDOW_MS: float = float(os.getenv('AI_MICROBATCH_WINDOW_MS', '10'))
+AI_MICROBATCH_MAX_SIZE: int = int(os.getenv('AI_MICROBATCH_MAX_SIZE', '8'))
+
+# Modelo local (regressão logística sobre os stems) entre as keywords e o Gemini: emails com confiança
+# local >= LOCAL_MODEL_THRESHOLD não vão à IA. Sem o arquivo do modelo (python -m app.cli train), fica desativado
+LOCAL_MODEL_PATH: str = os.getenv('LOCAL_MODEL_PATH', 'data/local_model.json')
+LOCAL_MODEL_THRESHOLD: float = float(os.getenv('LOCAL_MODEL_THRESHOLD', '0.9'))
+LOCAL_MODEL_MIN_STEMS: int = int(os.getenv('LOCAL_MODEL_MIN_STEMS', '3'))
+LOCAL_MODEL_RELOAD_INTERVAL: float = float(os.getenv('LOCAL_MODEL_RELOAD_INTERVAL', '30'))
+# Decisões do Gemini (stems + categoria) gravadas em JSONL como exemplos de treino. Vazio = não grava
+AI_DECISION_LOG_PATH: str = os.getenv('AI_DECISION_LOG_PATH', '')
+
+# Índice de quase-duplicatas (MinHash + LSH sobre os stems): emails quase iguais a um já classificado
+# (mesmo modelo de texto, só nomes, datas ou protocolos diferentes) reaproveitam a categoria
+NEAR_DUPLICATE_ENABLED: bool = _env_bool('NEAR_DUPLICATE_ENABLED')
+NEAR_DUPLICATE_THRESHOLD: float = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.85'))
+NEAR_DUPLICATE_MAX_ENTRIES: int = int(os.getenv('NEAR_DUPLICATE_MAX_ENTRIES', '20000'))
+# Reaproveita também a resposta sugerida (senão a IA gera uma nova, com os dados deste email)
+NEAR_DUPLICATE_REUSE_REPLY: bool = _env_bool('NEAR_DUPLICATE_REUSE_REPLY')
+# Arquivo onde o índice é salvo periodicamente e no desligamento. Vazio = só em memória
+NEAR_DUPLICATE_PATH: str = os.getenv('NEAR_DUPLICATE_PATH', 'data/near_duplicates.json')
+NEAR_DUPLICATE_SAVE_INTERVAL: float = float(os.getenv('NEAR_DUPLICATE_SAVE_INTERVAL', '60'))
+
+# Biblioteca de respostas: respostas do Gemini viram modelos (nomes, datas, valores e protocolos do email trocados
+# por campos); um email produtivo parecido (cosseno TF-IDF dos stems >= REPLY_LIBRARY_THRESHOLD) recebe o modelo
+# preenchido com os dados dele, sem gerar a resposta na IA
+REPLY_LIBRARY_ENABLED: bool = _env_bool('REPLY_LIBRARY_ENABLED')
+REPLY_LIBRARY_THRESHOLD: float = float(os.getenv('REPLY_LIBRARY_THRESHOLD', '0.8'))
+REPLY_LIBRARY_MAX_ENTRIES: int = int(os.getenv('REPLY_LIBRARY_MAX_ENTRIES', '2000'))
+REPLY_LIBRARY_MIN_STEMS: int = int(os.getenv('REPLY_LIBRARY_MIN_STEMS', '4'))
+# Arquivo onde a biblioteca é salva periodicamente e no desligamento. Vazio = só em memória
+REPLY_LIBRARY_PATH: str = os.getenv('REPLY_LIBRARY_PATH', 'data/reply_library.json')
+REPLY_LIBRARY_SAVE_INTERVAL: float = float(os.getenv('REPLY_LIBRARY_SAVE_INTERVAL', '60'))
+
+# Token (Authorization: Bearer ...) dos endpoints /api/v1/admin. Vazio = endpoints administrativos desativados
+ADMIN_API_TOKEN: str = os.getenv('ADMIN_API_TOKEN', '')
+
+# Conversas: o estado de cada mensagem classificada (categoria, resumo e stems acumulados) fica guardado pelo
+# Message-ID e pelo hash do texto novo; numa resposta, só o trecho novo passa pelo NLP e pela IA, com esse contexto
+THREAD_STORE_BACKEND: str = os.getenv('THREAD_STORE_BACKEND', 'none').lower()
+THREAD_STORE_TTL_SECONDS: int = int(os.getenv('THREAD_STORE_TTL_SECONDS', '604800'))
+THREAD_STORE_MAX_ENTRIES: int = int(os.getenv('THREAD_STORE_MAX_ENTRIES', '50000'))
+THREAD_STORE_MAX_MEMORY_MB: int = int(os.getenv('THREAD_STORE_MAX_MEMORY_MB', '32'))
+THREAD_STORE_SQLITE_PATH: str = os.getenv('THREAD_STORE_SQLITE_PATH', 'data/threads.sqlite3')
+THREAD_CONTEXT_MAX_KEYWORDS: int = int(os.getenv('THREAD_CONTEXT_MAX_KEYWORDS', '40'))
+# message_id/in_reply_to enviados a /api/v1/process dão acesso ao estado de qualquer conversa com esse id:
+# só são aceitos com true (API privada, um só cliente). A importação de caixas sempre os usa
+THREAD_TRUST_CLIENT_IDS: bool = _env_bool('THREAD_TRUST_CLIENT_IDS')
+
+# Orçamento (tokens estimados) do email no prompt: limpa citações, assinatura e avisos legais
+# e mantém os trechos mais relevantes. 0 = envia o texto inteiro
+PROMPT_TOKEN_BUDGET: int = int(os.getenv('PROMPT_TOKEN_BUDGET', '1500'))
+
+# Gemini
+GEMINI_TIMEOUT: float = float(os.getenv('GEMINI_TIMEOUT', '30'))
+REPLY_MAX_OUTPUT_TOKENS: int = int(os.getenv('REPLY_MAX_OUTPUT_TOKENS', '400'))
+
+# Respostas sugeridas adiadas
+REPLY_STORE_MAX_ENTRIES: int = int(os.getenv('REPLY_STORE_MAX_ENTRIES', '1000'))
+REPLY_STORE_TTL_SECONDS: int = int(os.getenv('REPLY_STORE_TTL_SECONDS', '600'))
+
+# Processamento em lote
+MAX_BATCH_ITEMS: int = int(os.getenv('MAX_BATCH_ITEMS', '100'))
+MAX_BATCH_UPLOAD_SIZE_MB: int = int(os.getenv('MAX_BATCH_UPLOAD_SIZE_MB', '50'))
+# Soma dos arquivos de um lote, checada antes de lê-los para a memória e ao ler cada um
+MAX_BATCH_TOTAL_SIZE_MB: int = int(os.getenv('MAX_BATCH_TOTAL_SIZE_MB', '100'))
+# Soma dos tamanhos descompactados das entradas de cada .zip, checada antes de descompactar
+MAX_BATCH_UNCOMPRESSED_SIZE_MB: int = int(os.getenv('MAX_BATCH_UNCOMPRESSED_SIZE_MB', '100'))
+BATCH_CONCURRENCY: int = int(os.getenv('BATCH_CONCURRENCY', '8'))
+BATCH_RATE_LIMIT_PER_MINUTE: int = int(os.getenv('BATCH_RATE_LIMIT_PER_MINUTE', '5'))
+
+# Jobs assíncronos (uploads grandes e importações em massa), em fila SQLite consumida por processos worker
+JOB_QUEUE_PATH: str = os.getenv('JOB_QUEUE_PATH', 'data/jobs.sqlite3')
+JOB_WORKERS: int = int(os.getenv('JOB_WORKERS', '0'))
+JOB_WORKER_NICE: int = int(os.getenv('JOB_WORKER_NICE', '10'))
+JOB_POLL_INTERVAL: float = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+JOB_MAX_ATTEMPTS: int = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BASE_SECONDS: float = float(os.getenv('JOB_RETRY_BASE_SECONDS', '10'))
+JOB_LEASE_SECONDS: float = float(os.getenv('JOB_LEASE_SECONDS', '120'))
+JOB_MAX_ITEMS: int = int(os.getenv('JOB_MAX_ITEMS', '5000'))
+JOB_MAX_UPLOAD_SIZE_MB: int = int(os.getenv('JOB_MAX_UPLOAD_SIZE_MB', '100'))
+# Limites por job, checados antes de ler os arquivos para a memória
+JOB_MAX_FILES: int = int(os.getenv('JOB_MAX_FILES', '20'))
+JOB_MAX_TOTAL_SIZE_MB: int = int(os.getenv('JOB_MAX_TOTAL_SIZE_MB', '200'))
+JOB_RESULT_TTL_SECONDS: int = int(os.getenv('JOB_RESULT_TTL_SECONDS', '604800'))
+JOB_RATE_LIMIT_PER_MINUTE: int = int(os.getenv('JOB_RATE_LIMIT_PER_MINUTE', '30'))
+JOB_WEBHOOK_TIMEOUT: float = float(os.getenv('JOB_WEBHOOK_TIMEOUT', '10'))
+JOB_WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv('JOB_WEBHOOK_MAX_ATTEMPTS', '3'))
+JOB_WEBHOOK_SECRET: str = os.getenv('JOB_WEBHOOK_SECRET', '')
+# Hosts aceitos em webhook_url (separados por vírgula). Vazio = qualquer host com endereço público
+JOB_WEBHOOK_ALLOWED_HOSTS: List[str] = [
+    host.strip().lower().rstrip('.') for host in os.getenv('JOB_WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()
+]
+
+# Cache de classificações
+CACHE_BACKEND: str = os.getenv('CACHE_BACKEND', 'memory').lower()
+CACHE_TTL_SECONDS: int = int(os.getenv('CACHE_TTL_SECONDS', '86400'))
+CACHE_MAX_ENTRIES: int = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+CACHE_MAX_MEMORY_MB: int = int(os.getenv('CACHE_MAX_MEMORY_MB', '64'))
+CACHE_SQLITE_PATH: str = os.getenv('CACHE_SQLITE_PATH', 'data/cache.sqlite3')
+CACHE_KEYWORD_KEY: bool = _env_bool('CACHE_KEYWORD_KEY')
+
+# Métricas: tempos por etapa (ms) também em processing_details
+STAGE_TIMINGS_IN_RESPONSE: bool = _env_bool('STAGE_TIMINGS_IN_RESPONSE')
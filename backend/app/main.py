@@ -1,7 +1,12 @@
-from typing import Union
+import asyncio
+import hmac
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, File, UploadFile, Form, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -9,27 +14,110 @@ from slowapi.errors import RateLimitExceeded
 
 load_dotenv()
 
-from app.models import ProcessResponse, ErrorResponse
+from app.models import (
+    ProcessResponse,
+    ProcessResponseData,
+    BatchProcessResponse,
+    ReplyResponse,
+    CacheStats,
+    JobResponse,
+    JobStats,
+    ReplyLibraryResponse,
+    ReplyLibraryPruneResponse,
+    ReplyTemplateResponse,
+    ErrorResponse
+)
 from app.services.file_reader import read_file
-from app.services.nlp_engine import extract_keywords
-from app.services.ai_handler import analyze_email
+from app.services.pipeline import classify_content, stream_content
+from app.services.batch_processor import BatchItem, expand_upload, process_batch
+from app.services.cache import get_classification_cache
+from app.services.reply_store import get_reply_store
+from app.services.ai_handler import get_circuit_breaker
+from app.services.ai_quota import get_ai_quota
+from app.services.job_queue import DEAD_LETTER, get_job_queue
+from app.services.job_worker import JobWorkerPool
+from app.services.near_duplicate import get_near_duplicate_index, save_near_duplicate_index
+from app.services.reply_library import get_reply_library, save_reply_library
+from app.services.thread_context import get_thread_store
+from app.services.warmup import get_warm_up_state, warm_up
 from app.utils.exceptions import (
     EmailClassifierException,
     InvalidFileException,
     InvalidTextException,
     NLPProcessingException,
-    AIAPIException
+    AIAPIException,
+    ServerBusyException,
+    StageTimeoutException,
+    error_code_for
 )
 from app.utils.validators import validate_text
-from app.config import CORS_ORIGINS, RATE_LIMIT_PER_MINUTE
+from app.utils.webhook import validate_webhook_url
+from app.utils.request_logging import RequestLoggingMiddleware
+from app.utils.concurrency import processing_slot, run_cpu_bound, save_periodically, shutdown_executors
+from app.config import (
+    CORS_ORIGINS,
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_STORAGE_URI,
+    BATCH_RATE_LIMIT_PER_MINUTE,
+    MAX_BATCH_ITEMS,
+    MAX_BATCH_UPLOAD_SIZE_MB,
+    MAX_BATCH_TOTAL_SIZE_MB,
+    GEMINI_TIMEOUT,
+    JOB_WORKERS,
+    JOB_MAX_UPLOAD_SIZE_MB,
+    JOB_MAX_FILES,
+    JOB_MAX_TOTAL_SIZE_MB,
+    JOB_RATE_LIMIT_PER_MINUTE,
+    NEAR_DUPLICATE_SAVE_INTERVAL,
+    REPLY_LIBRARY_SAVE_INTERVAL,
+    ADMIN_API_TOKEN,
+    THREAD_TRUST_CLIENT_IDS
+)
 from app.utils.logger import logger
+# Registra o esquema sqlite:// no `limits` antes de criar o Limiter
+from app.utils import rate_limit_storage  # noqa: F401
+from app.utils.metrics import record_job, render_metrics, start_stage_timings
+
+# Com storage compartilhado, o limite vale para todos os workers; se ele cair, cada worker limita em memória
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    in_memory_fallback_enabled=not RATE_LIMIT_STORAGE_URI.startswith('memory://')
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up em segundo plano: o processo já responde à liveness enquanto NLP, cliente de IA e modelos
+    # carregam; a readiness (/health/ready) só fica ok quando terminar
+    warm_up_task = asyncio.create_task(warm_up(get_warm_up_state()))
+    savers = [
+        asyncio.create_task(save_periodically(NEAR_DUPLICATE_SAVE_INTERVAL, save_near_duplicate_index)),
+        asyncio.create_task(save_periodically(REPLY_LIBRARY_SAVE_INTERVAL, save_reply_library))
+    ]
+    
+    # Workers da fila de jobs em processos separados (com JOB_WORKERS=0, rodar `python -m app.worker` à parte)
+    job_workers = JobWorkerPool(JOB_WORKERS) if JOB_WORKERS > 0 else None
+    if job_workers:
+        job_workers.start()
+    
+    yield
+    
+    warm_up_task.cancel()
+    for saver in savers:
+        saver.cancel()
+    save_near_duplicate_index()
+    save_reply_library()
+    if job_workers:
+        job_workers.stop()
+    shutdown_executors()
 
-limiter = Limiter(key_func=get_remote_address)
 
 app = FastAPI(
     title="Email Classifier API",
     description="API para classificação automática de emails usando IA e NLP",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.state.limiter = limiter
@@ -39,9 +127,12 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS if '*' not in CORS_ORIGINS else ['*'],
     allow_credentials=True,
-    allow_methods=['GET', 'POST'],
-    allow_headers=['Content-Type', 'Authorization'],
+    allow_methods=['GET', 'POST', 'DELETE'],
+    allow_headers=['Content-Type', 'Authorization', 'X-Request-ID'],
+    expose_headers=['X-Request-ID'],
 )
+# Por último: envolve os demais, para o request_id valer em toda a requisição (inclusive erros e CORS)
+app.add_middleware(RequestLoggingMiddleware)
 
 
 @app.exception_handler(InvalidFileException)
@@ -97,6 +188,32 @@ async def ai_api_handler(request: Request, exc: AIAPIException):
     )
 
 
+@app.exception_handler(ServerBusyException)
+async def server_busy_handler(request: Request, exc: ServerBusyException):
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "error",
+            "error_code": "SERVER_BUSY",
+            "message": str(exc),
+            "details": {}
+        }
+    )
+
+
+@app.exception_handler(StageTimeoutException)
+async def stage_timeout_handler(request: Request, exc: StageTimeoutException):
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "error",
+            "error_code": "STAGE_TIMEOUT",
+            "message": str(exc),
+            "details": {}
+        }
+    )
+
+
 @app.exception_handler(EmailClassifierException)
 async def email_classifier_handler(request: Request, exc: EmailClassifierException):
     return JSONResponse(
@@ -117,7 +234,57 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # Circuito aberto: a API segue respondendo, mas classificando só por keywords
+    ai_circuit = get_circuit_breaker().snapshot()
+    ai_quota = get_ai_quota()
+    return {
+        "status": "degraded" if ai_circuit['state'] == 'open' else "healthy",
+        "ai_circuit": ai_circuit,
+        "ai_quota": (await asyncio.to_thread(ai_quota.snapshot) if ai_quota.blocking else ai_quota.snapshot())
+                    if ai_quota else None
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    # Só indica que o processo responde; não depende de warm-up nem de serviços externos
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    # 503 até o warm-up terminar, ou se um componente obrigatório falhou (ex.: dados do NLTK ausentes)
+    warm_up_state = get_warm_up_state().snapshot()
+    if warm_up_state['ready']:
+        status = "ready"
+    else:
+        status = "failed" if warm_up_state['finished'] else "warming_up"
+    return JSONResponse(
+        status_code=200 if warm_up_state['ready'] else 503,
+        content={"status": status, "warm_up": warm_up_state}
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+@app.get("/api/v1/cache/stats", response_model=CacheStats)
+async def cache_stats():
+    cache = get_classification_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Cache de classificações desativado")
+    near_duplicate_index = get_near_duplicate_index()
+    thread_store = get_thread_store()
+    reply_library = get_reply_library()
+    return CacheStats(
+        **await cache.stats(),
+        near_duplicates=near_duplicate_index.stats() if near_duplicate_index else None,
+        threads=await thread_store.stats() if thread_store else None,
+        reply_library=reply_library.stats() if reply_library else None
+    )
 
 
 @app.post("/api/v1/process", response_model=ProcessResponse)
@@ -125,82 +292,338 @@ async def health_check():
 async def process_email(
     request: Request,
     file: Union[UploadFile, None] = File(None),
-    text: Union[str, None] = Form(None)
+    text: Union[str, None] = Form(None),
+    defer_reply: bool = Form(False),
+    message_id: Union[str, None] = Form(None),
+    in_reply_to: Union[str, None] = Form(None)
 ):
     try:
-        raw_text = None
-        filename = None
-        
-        if file:
-            filename = file.filename
-            raw_text = await read_file(file)
-        elif text:
-            validate_text(text)
-            raw_text = text
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Forneça um arquivo (campo 'file') ou texto (campo 'text') via multipart/form-data"
-            )
-        
-        if not raw_text or not raw_text.strip():
-            raise HTTPException(status_code=400, detail="Conteúdo não pode estar vazio")
-        
-        logger.info(f"Processando email: {filename or 'texto direto'}")
-        
-        nlp_keywords = extract_keywords(raw_text)
-        logger.info(f"Keywords extraídas: {nlp_keywords[:100]}...")
-        
-        ai_result = analyze_email(raw_text, nlp_keywords)
-        logger.info(f"Email classificado como: {ai_result['category']}")
-        
-        # Determinar método de classificação
-        classification_method = 'ai'
-        if ai_result.get('used_keywords_only'):
-            classification_method = 'keywords_only'
-        elif ai_result.get('used_fallback'):
-            classification_method = 'fallback'
-        
-        # Preparar detalhes de processamento
-        keyword_analysis = ai_result.get('keyword_analysis', {
-            'matched_keywords': [],
-            'produtivo_score': 0,
-            'improdutivo_score': 0,
-            'total_keywords': len(nlp_keywords.split())
-        })
+        async with processing_slot():
+            return await _process_email(file, text, defer_reply, *_client_thread_ids(message_id, in_reply_to))
+    
+    except HTTPException:
+        raise
+    except EmailClassifierException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro inesperado no processamento: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro interno do servidor: {str(e)}"
+        )
+
+
+def _client_thread_ids(message_id: Optional[str], in_reply_to: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ids de conversa enviados pelo cliente, só com THREAD_TRUST_CLIENT_IDS: as chaves do estado das conversas
+    não têm dono, e um in_reply_to arbitrário leria (ou um message_id sobrescreveria) a conversa de outro
+    remetente. Sem eles, a conversa ainda é encontrada pela citação.
+    """
+    if THREAD_TRUST_CLIENT_IDS:
+        return message_id, in_reply_to
+    return None, None
+
+
+async def _read_input(file: Union[UploadFile, None], text: Union[str, None]) -> Tuple[str, Optional[str]]:
+    raw_text = None
+    filename = None
+    
+    if file:
+        filename = file.filename
+        raw_text = await read_file(file)
+    elif text:
+        validate_text(text)
+        raw_text = text
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="Forneça um arquivo (campo 'file') ou texto (campo 'text') via multipart/form-data"
+        )
+    
+    if not raw_text or not raw_text.strip():
+        raise HTTPException(status_code=400, detail="Conteúdo não pode estar vazio")
+    
+    return raw_text, filename
+
+
+async def _process_email(
+    file: Union[UploadFile, None],
+    text: Union[str, None],
+    defer_reply: bool = False,
+    message_id: Optional[str] = None,
+    in_reply_to: Optional[str] = None
+) -> ProcessResponse:
+    start_stage_timings()
+    raw_text, filename = await _read_input(file, text)
+    
+    response_data = {
+        "status": "success",
+        "data": await classify_content(raw_text, filename, defer_reply=defer_reply, message_id=message_id,
+                                       in_reply_to=in_reply_to)
+    }
+    
+    return ProcessResponse(**response_data)
+
+
+@app.post("/api/v1/process/stream")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def process_email_stream(
+    request: Request,
+    file: Union[UploadFile, None] = File(None),
+    text: Union[str, None] = Form(None),
+    message_id: Union[str, None] = Form(None),
+    in_reply_to: Union[str, None] = Form(None)
+):
+    """
+    Mesma entrada de /api/v1/process, com resultados progressivos em Server-Sent Events:
+    keywords, classification, reply_delta (trechos da resposta sugerida) e done (resultado completo).
+    Erros de entrada retornam 400 antes do stream; erros durante o processamento viram um evento `error`.
+    """
+    start_stage_timings()
+    raw_text, filename = await _read_input(file, text)
+    
+    return StreamingResponse(
+        _sse_events(raw_text, filename, *_client_thread_ids(message_id, in_reply_to)),
+        media_type='text/event-stream',
+        # Sem cache nem buffer em proxies (ex.: nginx), para os eventos chegarem assim que produzidos
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_events(raw_text: str, filename: Optional[str], message_id: Optional[str],
+                      in_reply_to: Optional[str]) -> AsyncIterator[str]:
+    try:
+        async with processing_slot():
+            async for event, data in stream_content(raw_text, filename, message_id, in_reply_to):
+                if event == 'done':
+                    data = ProcessResponseData(**data).model_dump()
+                yield _sse(event, data)
+    
+    except Exception as e:
+        if not isinstance(e, EmailClassifierException):
+            logger.error(f"Erro inesperado no processamento (streaming): {str(e)}", exc_info=True)
+        yield _sse('error', {"error_code": error_code_for(e), "message": str(e)})
+
+
+@app.get("/api/v1/reply/{reply_id}", response_model=ReplyResponse)
+async def get_deferred_reply(reply_id: str, wait: bool = True):
+    """
+    Busca a resposta sugerida adiada. Com wait=true aguarda a geração (até GEMINI_TIMEOUT).
+    """
+    reply = await get_reply_store().get(reply_id, timeout=GEMINI_TIMEOUT if wait else 0)
+    if reply is None:
+        raise HTTPException(status_code=404, detail="Resposta não encontrada ou expirada")
+    return ReplyResponse(status="success", data=reply)
+
+
+@app.post("/api/v1/process/batch", response_model=BatchProcessResponse)
+@limiter.limit(f"{BATCH_RATE_LIMIT_PER_MINUTE}/minute")
+async def process_email_batch(
+    request: Request,
+    files: Union[List[UploadFile], None] = File(None),
+    texts: Union[List[str], None] = Form(None)
+):
+    try:
+        files = files or []
+        # Tamanhos vêm do multipart já recebido (em disco): recusa antes de trazer os arquivos para a memória
+        if sum(file.size or 0 for file in files) > MAX_BATCH_TOTAL_SIZE_MB * 1024 * 1024:
+            raise InvalidFileException(f"Arquivos do lote excedem {MAX_BATCH_TOTAL_SIZE_MB}MB no total")
         
-        processing_details = {
-            "classification_method": classification_method,
-            "used_full_text": ai_result.get('used_full_text'),
-            "used_ai": ai_result.get('used_ai', False),
-            "used_fallback": ai_result.get('used_fallback', False),
-            "keyword_analysis": keyword_analysis
-        }
+        items = []
+        total_size = 0
+        for file in files:
+            content = await file.read()
+            total_size += len(content)
+            if total_size > MAX_BATCH_TOTAL_SIZE_MB * 1024 * 1024:
+                raise InvalidFileException(f"Arquivos do lote excedem {MAX_BATCH_TOTAL_SIZE_MB}MB no total")
+            items.extend(await run_cpu_bound(
+                expand_upload, file.filename, content, MAX_BATCH_UPLOAD_SIZE_MB, MAX_BATCH_ITEMS - len(items)
+            ))
+        for index, text in enumerate(texts or []):
+            items.append(BatchItem(source=f"texts[{index}]", text=text))
         
-        response_data = {
-            "status": "success",
-            "data": {
-                "filename": filename,
-                "category": ai_result['category'],
-                "confidence_score": ai_result['confidence_score'],
-                "summary": ai_result['summary'],
-                "reason": ai_result.get('reason', ai_result['summary']),
-                "suggested_response": ai_result['suggested_response'],
-                "nlp_debug": {
-                    "detected_keywords": nlp_keywords,
-                    "keyword_analysis": keyword_analysis
-                },
-                "processing_details": processing_details
+        async with processing_slot():
+            response_data = {
+                "status": "success",
+                "data": await process_batch(items)
             }
-        }
         
-        return ProcessResponse(**response_data)
+        return BatchProcessResponse(**response_data)
     
     except HTTPException:
         raise
+    except EmailClassifierException:
+        raise
     except Exception as e:
-        logger.error(f"Erro inesperado no processamento: {str(e)}", exc_info=True)
+        logger.error(f"Erro inesperado no processamento do lote: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno do servidor: {str(e)}"
         )
+
+
+# Extensões aceitas nos jobs: zip e JSONL são expandidos pelo worker, como no lote
+_JOB_EXTENSIONS = ('.txt', '.pdf', '.zip', '.jsonl')
+
+
+@app.post("/api/v1/jobs", response_model=JobResponse, status_code=202)
+@limiter.limit(f"{JOB_RATE_LIMIT_PER_MINUTE}/minute")
+async def submit_job(
+    request: Request,
+    files: Union[List[UploadFile], None] = File(None),
+    texts: Union[List[str], None] = Form(None),
+    priority: int = Form(0, ge=-100, le=100),
+    webhook_url: Union[str, None] = Form(None)
+):
+    """
+    Enfileira arquivos grandes ou importações em massa (mesma entrada de /api/v1/process/batch) para
+    processamento em segundo plano. Retorna o job_id na hora; o resultado fica em GET /api/v1/jobs/{job_id}
+    e, com webhook_url, é enviado por POST ao terminar.
+    """
+    if webhook_url:
+        # Resolve o host (DNS bloqueante) para recusar endereços internos já na submissão
+        await asyncio.to_thread(validate_webhook_url, webhook_url)
+    
+    files = files or []
+    if len(files) > JOB_MAX_FILES:
+        raise InvalidFileException(f"Job excede o limite de {JOB_MAX_FILES} arquivos")
+    for file in files:
+        if os.path.splitext((file.filename or '').lower())[1] not in _JOB_EXTENSIONS:
+            raise InvalidFileException(f"Formato não suportado em jobs: {file.filename} (use {', '.join(_JOB_EXTENSIONS)})")
+        if file.size is not None and file.size > JOB_MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+            raise InvalidFileException(f"Arquivo excede o tamanho máximo de {JOB_MAX_UPLOAD_SIZE_MB}MB para jobs")
+    # Tamanhos vêm do multipart já recebido (em disco): recusa antes de trazer os arquivos para a memória
+    if sum(file.size or 0 for file in files) > JOB_MAX_TOTAL_SIZE_MB * 1024 * 1024:
+        raise InvalidFileException(f"Arquivos do job excedem {JOB_MAX_TOTAL_SIZE_MB}MB no total")
+    
+    inputs = []
+    total_size = 0
+    for file in files:
+        content = await file.read()
+        if not content:
+            raise InvalidFileException(f"Arquivo está vazio: {file.filename}")
+        if len(content) > JOB_MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+            raise InvalidFileException(f"Arquivo excede o tamanho máximo de {JOB_MAX_UPLOAD_SIZE_MB}MB para jobs")
+        total_size += len(content)
+        if total_size > JOB_MAX_TOTAL_SIZE_MB * 1024 * 1024:
+            raise InvalidFileException(f"Arquivos do job excedem {JOB_MAX_TOTAL_SIZE_MB}MB no total")
+        inputs.append((file.filename, content, None))
+    for text in texts or []:
+        validate_text(text)
+        inputs.append((None, None, text))
+    
+    if not inputs:
+        raise InvalidTextException("Job vazio: forneça arquivos (campo 'files') ou textos (campo 'texts')")
+    
+    queue = get_job_queue()
+    job_id = await asyncio.to_thread(queue.submit, inputs, priority, webhook_url)
+    record_job('submitted')
+    logger.info(f"Job {job_id} enfileirado com {len(inputs)} entrada(s), prioridade {priority}")
+    
+    return JobResponse(status="success", data=await asyncio.to_thread(queue.get, job_id))
+
+
+@app.get("/api/v1/jobs", response_model=JobStats)
+async def job_stats():
+    return JobStats(**await asyncio.to_thread(get_job_queue().stats))
+
+
+@app.get("/api/v1/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return JobResponse(status="success", data=job)
+
+
+@app.post("/api/v1/jobs/{job_id}/retry", response_model=JobResponse)
+async def retry_job(job_id: str):
+    """
+    Reenfileira um job de dead_letter (tentativas zeradas).
+    """
+    queue = get_job_queue()
+    job = await asyncio.to_thread(queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    if job['status'] != DEAD_LETTER or not await asyncio.to_thread(queue.requeue, job_id):
+        raise HTTPException(status_code=409, detail="Só jobs em dead_letter podem ser reenfileirados")
+    return JobResponse(status="success", data=await asyncio.to_thread(queue.get, job_id))
+
+
+def _require_admin(authorization: Union[str, None] = Header(None)) -> None:
+    """
+    Endpoints /api/v1/admin: exige "Authorization: Bearer <ADMIN_API_TOKEN>". Sem token configurado,
+    respondem 404 (como se não existissem).
+    """
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Endpoints administrativos desativados (defina ADMIN_API_TOKEN)")
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode('utf-8'), ADMIN_API_TOKEN.encode('utf-8')):
+        raise HTTPException(status_code=401, detail="Token de administração inválido",
+                            headers={'WWW-Authenticate': 'Bearer'})
+
+
+def _reply_library_or_404():
+    reply_library = get_reply_library()
+    if reply_library is None:
+        raise HTTPException(status_code=404, detail="Biblioteca de respostas desativada")
+    return reply_library
+
+
+@app.get("/api/v1/admin/reply-library", response_model=ReplyLibraryResponse, dependencies=[Depends(_require_admin)])
+async def list_reply_library(
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    order: str = Query('uses', pattern='^(uses|recent|created)$')
+):
+    """
+    Estatísticas e modelos da biblioteca de respostas, por usos, uso mais recente ou criação.
+    """
+    reply_library = _reply_library_or_404()
+    return ReplyLibraryResponse(status="success", data={
+        "stats": reply_library.stats(),
+        "entries": reply_library.entries(limit, offset, order)
+    })
+
+
+@app.get("/api/v1/admin/reply-library/{entry_id}", response_model=ReplyTemplateResponse,
+         dependencies=[Depends(_require_admin)])
+async def get_reply_template(entry_id: str):
+    entry = _reply_library_or_404().get(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Modelo de resposta não encontrado")
+    return ReplyTemplateResponse(status="success", data=entry)
+
+
+@app.delete("/api/v1/admin/reply-library/{entry_id}", response_model=ReplyLibraryPruneResponse,
+            dependencies=[Depends(_require_admin)])
+async def delete_reply_template(entry_id: str):
+    """
+    Remove um modelo (ex.: resposta inadequada); emails parecidos voltam a ter a resposta gerada pela IA.
+    """
+    if not _reply_library_or_404().remove(entry_id):
+        raise HTTPException(status_code=404, detail="Modelo de resposta não encontrado")
+    await asyncio.to_thread(save_reply_library)
+    return ReplyLibraryPruneResponse(status="success", data={"removed": 1, "entry_ids": [entry_id]})
+
+
+@app.post("/api/v1/admin/reply-library/prune", response_model=ReplyLibraryPruneResponse,
+          dependencies=[Depends(_require_admin)])
+async def prune_reply_library(
+    min_uses: Union[int, None] = Form(None, ge=1),
+    unused_days: Union[float, None] = Form(None, gt=0)
+):
+    """
+    Remove os modelos com menos de `min_uses` usos e/ou sem uso há mais de `unused_days` dias
+    (com os dois, só os que atendem a ambos).
+    """
+    if min_uses is None and unused_days is None:
+        raise InvalidTextException("Informe min_uses e/ou unused_days")
+    removed = _reply_library_or_404().prune(min_uses, unused_days)
+    await asyncio.to_thread(save_reply_library)
+    logger.info(f"Biblioteca de respostas: {len(removed)} modelos removidos (min_uses={min_uses}, unused_days={unused_days})")
+    return ReplyLibraryPruneResponse(status="success", data={"removed": len(removed), "entry_ids": removed})
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel, Field
 
 
@@ -6,14 +6,56 @@ class KeywordAnalysis(BaseModel):
     matched_keywords: List[str] = Field(default_factory=list, description="Palavras-chave que foram encontradas e usadas")
     produtivo_score: int = Field(default=0, description="Quantidade de keywords de produtivo encontradas")
     improdutivo_score: int = Field(default=0, description="Quantidade de keywords de improdutivo encontradas")
+    produtivo_weight: Optional[float] = Field(None, description="Soma dos pesos das keywords de produtivo (usada na decisão)")
+    improdutivo_weight: Optional[float] = Field(None, description="Soma dos pesos das keywords de improdutivo (usada na decisão)")
     total_keywords: int = Field(default=0, description="Total de keywords extraídas")
 
 
+class PromptContext(BaseModel):
+    token_budget: int = Field(..., description="Orçamento de tokens do email no prompt (PROMPT_TOKEN_BUDGET; 0 = sem limite)")
+    original_tokens: int = Field(..., description="Tokens estimados do texto e keywords originais")
+    prompt_tokens: int = Field(..., description="Tokens estimados efetivamente enviados")
+    removed: List[str] = Field(default_factory=list, description="Partes removidas: quoted_reply, quoted_lines, forwarded_headers, signature, disclaimer")
+    segments_total: int = Field(0, description="Trechos do email após a limpeza")
+    segments_kept: int = Field(0, description="Trechos enviados (os de maior densidade de keywords, se excedeu o orçamento)")
+    truncated: bool = Field(False, description="Se algum trecho ou keyword ficou de fora por causa do orçamento")
+
+
+class NearDuplicate(BaseModel):
+    similarity: float = Field(..., description="Jaccard estimado (MinHash) entre os stems deste email e os do email já classificado mais parecido")
+    threshold: float = Field(..., description="Similaridade mínima para reaproveitar a classificação (NEAR_DUPLICATE_THRESHOLD)")
+    matched: bool = Field(..., description="Se a classificação foi reaproveitada")
+    reused_reply: bool = Field(False, description="Se a resposta sugerida também foi reaproveitada")
+
+
+class ReplyLibraryInfo(BaseModel):
+    entry_id: str = Field(..., description="Modelo da biblioteca de respostas usado")
+    similarity: float = Field(..., description="Cosseno TF-IDF entre os stems deste email e os do email que originou o modelo")
+    threshold: Optional[float] = Field(None, description="Similaridade mínima para usar o modelo (REPLY_LIBRARY_THRESHOLD)")
+
+
+class ThreadInfo(BaseModel):
+    thread_id: str = Field(..., description="Id da conversa (atribuído na primeira mensagem vista)")
+    position: int = Field(..., description="Mensagens da conversa vistas até esta (inclusive)")
+    matched_by: Optional[str] = Field(None, description="Como a mensagem anterior foi encontrada: 'in_reply_to' ou 'quoted_text' (null se a conversa não era conhecida)")
+    previous_category: Optional[str] = Field(None, description="Classificação da mensagem anterior da conversa")
+    processed_chars: int = Field(..., description="Caracteres que passaram pelo NLP e pela classificação (só o trecho novo, se a conversa era conhecida)")
+    original_chars: int = Field(..., description="Caracteres da mensagem recebida, com a conversa citada")
+
+
 class ProcessingDetails(BaseModel):
-    classification_method: str = Field(..., description="Método usado: 'keywords_only', 'ai', 'fallback'")
+    classification_method: str = Field(..., description="Método usado: 'near_duplicate', 'keywords_only', 'local_model', 'ai', 'fallback'")
     used_full_text: Optional[bool] = Field(None, description="Se enviou texto completo para IA")
     used_ai: Optional[bool] = Field(None, description="Se usou IA na classificação")
     used_fallback: Optional[bool] = Field(None, description="Se usou fallback baseado em keywords")
+    cache_hit: Optional[bool] = Field(None, description="Se o resultado veio do cache de classificações (null se cache desativado)")
+    cache_key: Optional[str] = Field(None, description="Chave que acertou o cache: 'text' ou 'keywords'")
+    stage_timings: Optional[Dict[str, float]] = Field(None, description="Tempo (ms) de cada etapa, quando STAGE_TIMINGS_IN_RESPONSE estiver ativo")
+    prompt_context: Optional[PromptContext] = Field(None, description="Como o email foi reduzido para o prompt da IA (null se a IA não recebeu o texto)")
+    near_duplicate: Optional[NearDuplicate] = Field(None, description="Email já classificado mais parecido no índice de quase-duplicatas (null se não houve candidato)")
+    reply_source: Optional[str] = Field(None, description="Origem da resposta sugerida: 'ai', 'reply_library' ou 'near_duplicate' (null sem resposta)")
+    reply_library: Optional[ReplyLibraryInfo] = Field(None, description="Modelo da biblioteca de respostas usado (null se a resposta não veio dela)")
+    thread: Optional[ThreadInfo] = Field(None, description="Conversa do email (null com THREAD_STORE_BACKEND=none)")
     keyword_analysis: KeywordAnalysis
 
 
@@ -28,6 +70,8 @@ class ProcessResponseData(BaseModel):
     confidence_score: float
     summary: str
     suggested_response: Optional[str] = None
+    reply_id: Optional[str] = Field(None, description="Id para buscar a resposta sugerida adiada em /api/v1/reply/{reply_id}")
+    reply_status: Optional[str] = Field(None, description="'pending' quando a resposta sugerida foi adiada")
     reason: Optional[str] = Field(None, description="Razão detalhada da classificação")
     nlp_debug: NLPDebug
     processing_details: ProcessingDetails
@@ -38,6 +82,140 @@ class ProcessResponse(BaseModel):
     data: ProcessResponseData
 
 
+class ReplyResponseData(BaseModel):
+    reply_id: str
+    status: str = Field(..., description="'ready', 'pending' ou 'failed'")
+    suggested_response: Optional[str] = None
+    message: Optional[str] = None
+
+
+class ReplyResponse(BaseModel):
+    status: str
+    data: ReplyResponseData
+
+
+class BatchItemError(BaseModel):
+    error_code: str
+    message: str
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Posição do item no lote")
+    source: Optional[str] = Field(None, description="Origem do item: arquivo, entrada do zip ou linha do JSONL")
+    status: str
+    data: Optional[ProcessResponseData] = None
+    error: Optional[BatchItemError] = None
+
+
+class BatchProcessResponseData(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    items: List[BatchItemResult]
+
+
+class BatchProcessResponse(BaseModel):
+    status: str
+    data: BatchProcessResponseData
+
+
+class JobData(BaseModel):
+    job_id: str
+    status: str = Field(..., description="'queued', 'running', 'succeeded' ou 'dead_letter'")
+    priority: int = Field(0, description="Prioridade do job (maior primeiro)")
+    attempts: int = Field(0, description="Tentativas já iniciadas")
+    max_attempts: int
+    inputs: int = Field(..., description="Arquivos e textos enviados (zip e JSONL são expandidos na execução)")
+    webhook_url: Optional[str] = None
+    webhook_status: Optional[str] = Field(None, description="'delivered' ou 'failed' após o job terminar")
+    created_at: float = Field(..., description="Timestamp Unix de criação")
+    updated_at: float
+    next_attempt_at: Optional[float] = Field(None, description="Timestamp Unix da próxima tentativa, se aguardando retentativa")
+    result: Optional[BatchProcessResponseData] = Field(None, description="Resultado no mesmo formato de /api/v1/process/batch")
+    error: Optional[BatchItemError] = Field(None, description="Erro da última tentativa")
+
+
+class JobResponse(BaseModel):
+    status: str
+    data: JobData
+
+
+class JobStats(BaseModel):
+    queued: int
+    running: int
+    succeeded: int
+    dead_letter: int
+
+
+class ThreadStoreStats(BaseModel):
+    backend: str
+    entries: int = Field(..., description="Chaves guardadas (Message-ID e conteúdo de cada mensagem)")
+    hits: int = Field(..., description="Respostas cuja conversa era conhecida (só o trecho novo foi processado)")
+    hits_by_key: Dict[str, int] = Field(..., description="Acertos por forma de busca: in_reply_to, quoted_text")
+    misses: int
+    hit_rate: float
+
+
+class ReplyLibraryStats(BaseModel):
+    entries: int
+    max_entries: int
+    threshold: float
+    hits: int = Field(..., description="Emails com modelo parecido preenchido com os dados deles")
+    misses: int
+    unfilled: int = Field(..., description="Modelos parecidos sem algum dado do email (nome, protocolo...) para preencher")
+    rejected: int = Field(..., description="Respostas do Gemini que não viraram modelo (datas, valores ou nomes que não vieram do email)")
+    hit_rate: float
+
+
+class ReplyTemplateData(BaseModel):
+    entry_id: str
+    stems: List[str] = Field(..., description="Stems do email que originou o modelo")
+    template: str = Field(..., description="Resposta com os campos {nome}, {primeiro_nome}, {email}, {valor}, {data}, {numero}")
+    placeholders: List[str]
+    created_at: float = Field(..., description="Timestamp Unix de criação")
+    uses: int
+    last_used_at: Optional[float] = None
+
+
+class ReplyLibraryData(BaseModel):
+    stats: ReplyLibraryStats
+    entries: List[ReplyTemplateData]
+
+
+class ReplyLibraryResponse(BaseModel):
+    status: str
+    data: ReplyLibraryData
+
+
+class ReplyTemplateResponse(BaseModel):
+    status: str
+    data: ReplyTemplateData
+
+
+class ReplyLibraryPruneData(BaseModel):
+    removed: int
+    entry_ids: List[str]
+
+
+class ReplyLibraryPruneResponse(BaseModel):
+    status: str
+    data: ReplyLibraryPruneData
+
+
+class CacheStats(BaseModel):
+    backend: str
+    entries: int
+    hits: int
+    hits_by_key: Dict[str, int]
+    misses: int
+    hit_rate: float
+    ai_calls_saved: int = Field(..., description="Acertos cujo resultado original usou IA (chamadas ao Gemini evitadas)")
+    stores: int
+    near_duplicates: Optional[Dict[str, float]] = Field(None, description="Índice de quase-duplicatas: entries, max_entries, threshold, hits, misses, hit_rate (null se desativado)")
+    threads: Optional[ThreadStoreStats] = Field(None, description="Estado das conversas (null se desativado)")
+    reply_library: Optional[ReplyLibraryStats] = Field(None, description="Biblioteca de respostas (null se desativada)")
+
+
 class ErrorResponse(BaseModel):
     status: str
     error_code: str
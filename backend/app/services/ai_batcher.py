@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class MicroBatcher:
+    """
+    Agrega itens que chegam dentro de uma janela curta (ou até max_size) e os entrega juntos ao handler.
+    
+    O handler recebe a lista de itens e retorna uma lista do mesmo tamanho, na mesma ordem, com o resultado
+    de cada item ou uma exceção daquele item; cada solicitante recebe apenas o seu. Se o handler
+    falhar por inteiro, todos os solicitantes do lote recebem a exceção.
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], Awaitable[List[Any]]], window_seconds: float, max_size: int):
+        self.handler = handler
+        self.window_seconds = window_seconds
+        self.max_size = max(1, max_size)
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        
+        # Se o solicitante for cancelado, o future fica cancelado e o resultado do item é descartado
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch = [(item, future) for item, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+        
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.handler([item for item, _ in batch])
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
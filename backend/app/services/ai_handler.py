@@ -1,10 +1,60 @@
+import asyncio
 import json
 import os
-from typing import Dict, Any, Optional
-from google import genai
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, AsyncIterator, List, Optional, Sequence, Tuple, Union
 
-from app.utils.exceptions import AIAPIException
+from app.config import (
+    AI_BACKEND,
+    GEMINI_TIMEOUT,
+    REPLY_MAX_OUTPUT_TOKENS,
+    KEYWORDS_CONFIG_PATH,
+    KEYWORDS_RELOAD_INTERVAL,
+    AI_MICROBATCH_ENABLED,
+    AI_MICROBATCH_WINDOW_MS,
+    AI_MICROBATCH_MAX_SIZE,
+    AI_CALL_DEADLINE,
+    AI_MAX_RETRIES,
+    AI_RETRY_BASE_DELAY_MS,
+    AI_RETRY_MAX_DELAY_MS,
+    AI_RETRY_BUDGET_RATIO,
+    AI_RETRY_BUDGET_MIN_PER_SECOND,
+    CIRCUIT_BREAKER_ENABLED,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_SLOW_CALL_SECONDS,
+    CIRCUIT_SLOW_CALL_RATE,
+    CIRCUIT_WINDOW_SIZE,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_HALF_OPEN_PROBES,
+    PROMPT_TOKEN_BUDGET,
+    LOCAL_MODEL_THRESHOLD,
+    NEAR_DUPLICATE_REUSE_REPLY
+)
+from app.services.ai_batcher import MicroBatcher
+from app.services.context_builder import PromptContext, build_prompt_context
+from app.services.keyword_matcher import KeywordMatcher, KeywordMatches, ReloadableKeywordMatcher, build_entries
+from app.services.local_model import get_local_model
+from app.services.near_duplicate import get_near_duplicate_index
+from app.services.reply_library import ReplyLibraryMatch, get_reply_library
+from app.services.nlp_engine import KeywordMatrix, extract_keywords_batch
+from app.utils.circuit_breaker import CircuitBreaker, RetryBudget
+from app.services.ai_quota import get_ai_quota
+from app.utils.exceptions import AIAPIException, CircuitOpenException, QuotaExhaustedException
 from app.utils.logger import logger
+from app.utils.metrics import (
+    record_ai_batch,
+    record_circuit_rejection,
+    record_gemini_call,
+    record_gemini_retry,
+    record_quota_rejection,
+    stage_timer
+)
+from app.utils.singleflight import SingleFlight
+from app.utils.text import content_hash
 
 
 _gemini_client = None
@@ -15,15 +65,40 @@ def _get_gemini_client():
     if _gemini_client is not None:
         return _gemini_client
     
+    if AI_BACKEND == 'fake':
+        from app.services.fake_ai import FakeGeminiClient
+        
+        logger.warning("AI_BACKEND=fake: usando IA simulada, sem chamadas ao Gemini")
+        _gemini_client = FakeGeminiClient()
+        return _gemini_client
+    
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
         raise AIAPIException("GEMINI_API_KEY não configurada")
     
+    # google.genai leva ~0,5s para importar: só quando o cliente é criado (no warm-up da API)
+    from google import genai
+    
     _gemini_client = genai.Client(api_key=api_key)
     return _gemini_client
 
 
-# Palavras-chave de alta confiança para classificação
+def warm_up_ai_client() -> None:
+    """
+    Cria o cliente de IA antes da primeira requisição (roda fora do event loop, no warm-up da API).
+    """
+    _get_gemini_client()
+
+
+def _generation_config(max_output_tokens: Optional[int]):
+    if not max_output_tokens:
+        return None
+    from google.genai import types
+    
+    return types.GenerateContentConfig(max_output_tokens=max_output_tokens)
+
+
+# Palavras-chave de alta confiança para classificação (prefixos de stems; frases casam stems consecutivos)
 PRODUTIVO_KEYWORDS = {
     'solicit', 'pedid', 'requer', 'necessit', 'urgent',
     'problema', 'erro', 'suport', 'ajud', 'duvida',
@@ -32,79 +107,249 @@ PRODUTIVO_KEYWORDS = {
 }
 
 IMPRODUTIVO_KEYWORDS = {
-    'feliz', 'natal', 'ano novo', 'parabens', 'agradec',
-    'cumpriment', 'saudacoes', 'obrigad', 'obrigado',
+    'feliz', 'natal', 'ano nov', 'parabens', 'agradec',
+    'cumpriment', 'saudacoes', 'obrigad',
     'felicitacoes', 'comemor', 'celebr'
 }
 
+_keyword_matcher = ReloadableKeywordMatcher(
+    build_entries(PRODUTIVO_KEYWORDS, IMPRODUTIVO_KEYWORDS),
+    config_path=KEYWORDS_CONFIG_PATH,
+    check_interval=KEYWORDS_RELOAD_INTERVAL
+)
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """
+    Matcher atual: termos padrão ou os de KEYWORDS_CONFIG_PATH, recarregados quando o arquivo muda.
+    """
+    return _keyword_matcher.current()
+
+
+def match_keywords(keywords: str) -> KeywordMatches:
+    return get_keyword_matcher().match(keywords.lower().split())
+
+
+def _keyword_analysis(matches: KeywordMatches, matched_keywords: List[str]) -> Dict[str, Any]:
+    return {
+        'matched_keywords': matched_keywords,
+        'produtivo_score': matches.produtivo_score,
+        'improdutivo_score': matches.improdutivo_score,
+        'produtivo_weight': matches.produtivo_weight,
+        'improdutivo_weight': matches.improdutivo_weight,
+        'total_keywords': matches.total_keywords
+    }
+
 
 def pre_classify_with_keywords(keywords: str) -> Optional[Dict[str, Any]]:
     """
     Tenta classificar usando apenas keywords.
     Retorna None se não conseguir (caso ambíguo).
     """
-    keyword_list = set(keywords.lower().split())
-    
-    matched_produtivo = keyword_list & PRODUTIVO_KEYWORDS
-    matched_improdutivo = keyword_list & IMPRODUTIVO_KEYWORDS
-    
-    produtivo_score = len(matched_produtivo)
-    improdutivo_score = len(matched_improdutivo)
+    return _pre_classify_from_matches(match_keywords(keywords))
+
+
+def _pre_classify_from_matches(matches: KeywordMatches) -> Optional[Dict[str, Any]]:
+    produtivo_score = matches.produtivo_score
+    improdutivo_score = matches.improdutivo_score
+    produtivo_weight = matches.produtivo_weight
+    improdutivo_weight = matches.improdutivo_weight
     
     # Se diferença for grande, classificar sem IA
-    if produtivo_score >= 2 and improdutivo_score == 0:
+    if produtivo_weight >= 2 and improdutivo_weight == 0:
+        matched_keywords = sorted(matches.produtivo)
         return {
             'category': 'Produtivo',
-            'reason': f'Identificado como produtivo através de {produtivo_score} palavras-chave relevantes: {", ".join(sorted(matched_produtivo))}',
-            'confidence_score': min(0.75 + (produtivo_score * 0.05), 0.90),
+            'reason': f'Identificado como produtivo através de {produtivo_score} palavras-chave relevantes: {", ".join(matched_keywords)}',
+            'confidence_score': min(0.75 + (produtivo_weight * 0.05), 0.90),
             'summary': f'Email identificado como produtivo por {produtivo_score} palavras-chave relevantes',
             'used_keywords_only': True,
-            'keyword_analysis': {
-                'matched_keywords': sorted(list(matched_produtivo)),
-                'produtivo_score': produtivo_score,
-                'improdutivo_score': improdutivo_score,
-                'total_keywords': len(keyword_list)
-            }
+            'keyword_analysis': _keyword_analysis(matches, matched_keywords)
         }
-    elif improdutivo_score >= 2 and produtivo_score == 0:
+    elif improdutivo_weight >= 2 and produtivo_weight == 0:
+        matched_keywords = sorted(matches.improdutivo)
         return {
             'category': 'Improdutivo',
-            'reason': f'Identificado como improdutivo através de {improdutivo_score} palavras-chave relevantes: {", ".join(sorted(matched_improdutivo))}',
-            'confidence_score': min(0.75 + (improdutivo_score * 0.05), 0.90),
+            'reason': f'Identificado como improdutivo através de {improdutivo_score} palavras-chave relevantes: {", ".join(matched_keywords)}',
+            'confidence_score': min(0.75 + (improdutivo_weight * 0.05), 0.90),
             'summary': f'Email identificado como improdutivo por {improdutivo_score} palavras-chave relevantes',
             'used_keywords_only': True,
-            'keyword_analysis': {
-                'matched_keywords': sorted(list(matched_improdutivo)),
-                'produtivo_score': produtivo_score,
-                'improdutivo_score': improdutivo_score,
-                'total_keywords': len(keyword_list)
-            }
+            'keyword_analysis': _keyword_analysis(matches, matched_keywords)
         }
     
     return None  # Caso ambíguo, precisa de IA
 
 
+def score_keywords_batch(keyword_matrix: KeywordMatrix, matcher: Optional[KeywordMatcher] = None) -> Tuple[Any, Any, Any]:
+    """
+    Pesos de produtivo/improdutivo de todos os emails do lote via produtos de matrizes esparsas.
+    Retorna também a máscara de emails com stems que podem iniciar uma frase: esses precisam
+    da passada sequencial do matcher, pois a matriz não guarda adjacência.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    
+    matcher = matcher or get_keyword_matcher()
+    term_index: Dict[Tuple[str, str], int] = {}
+    weights: Dict[str, List[float]] = {'produtivo': [], 'improdutivo': []}
+    rows: List[int] = []
+    cols: List[int] = []
+    starts_phrase = np.zeros(len(keyword_matrix.terms), dtype=np.int32)
+    
+    # Matriz stem x termo: quais termos (prefixos) casam com cada stem do vocabulário
+    for stem_index, stem in enumerate(keyword_matrix.terms):
+        hits, can_start_phrase = matcher.term_matches(stem)
+        starts_phrase[stem_index] = can_start_phrase
+        for category, term, weight in hits:
+            key = (category, term)
+            if key not in term_index:
+                term_index[key] = len(term_index)
+                for name in weights:
+                    weights[name].append(weight if name == category else 0.0)
+            rows.append(stem_index)
+            cols.append(term_index[key])
+    
+    stem_terms = csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(keyword_matrix.terms), len(term_index))
+    )
+    # Cada termo conta uma vez por email, mesmo que case com vários stems
+    present = (keyword_matrix.matrix @ stem_terms) > 0
+    
+    produtivo_weights = present @ np.asarray(weights['produtivo'], dtype=np.float64)
+    improdutivo_weights = present @ np.asarray(weights['improdutivo'], dtype=np.float64)
+    needs_sequential = (keyword_matrix.matrix @ starts_phrase) > 0
+    
+    return produtivo_weights, improdutivo_weights, needs_sequential
+
+
+def pre_classify_batch(keyword_matrix: KeywordMatrix) -> List[Optional[Dict[str, Any]]]:
+    """
+    Versão em lote de pre_classify_with_keywords: mesmos resultados, email a email.
+    A matriz filtra os candidatos; o resultado final de cada candidato sai do mesmo matcher do caminho por email.
+    """
+    import numpy as np
+    
+    matcher = get_keyword_matcher()
+    produtivo_weights, improdutivo_weights, needs_sequential = score_keywords_batch(keyword_matrix, matcher)
+    # Tolerância cobre arredondamento da soma de pesos fracionários
+    tolerance = 1e-9
+    candidates = np.flatnonzero(
+        ((produtivo_weights >= 2 - tolerance) & (improdutivo_weights <= tolerance)) |
+        ((improdutivo_weights >= 2 - tolerance) & (produtivo_weights <= tolerance)) |
+        needs_sequential
+    )
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * keyword_matrix.matrix.shape[0]
+    for row in candidates:
+        results[row] = _pre_classify_from_matches(matcher.match(keyword_matrix.row_terms(row)))
+    
+    return results
+
+
+@dataclass
+class KeywordHint:
+    """
+    Keywords e pré-classificação de um email calculadas em lote. Só valem para as mesmas keywords:
+    numa conversa conhecida, o trecho novo passa pelo caminho por email.
+    """
+    nlp_keywords: str
+    pre_classification: Optional[Dict[str, Any]]
+
+
+def keyword_hints_batch(texts: Sequence[str]) -> List[KeywordHint]:
+    """
+    extract_keywords_batch + pre_classify_batch sobre textos não vazios: mesmos resultados de extract_keywords
+    e pre_classify_with_keywords, com a pontuação do lote inteiro em operações matriciais.
+    """
+    keyword_matrix = extract_keywords_batch(texts)
+    return [
+        KeywordHint(keyword_matrix.keywords(row), pre_classification)
+        for row, pre_classification in enumerate(pre_classify_batch(keyword_matrix))
+    ]
+
+
+def classify_with_local_model(keywords: str) -> Optional[Dict[str, Any]]:
+    """
+    Classifica com o modelo local treinado (se houver). Retorna None abaixo de LOCAL_MODEL_THRESHOLD
+    ou sem stems conhecidos suficientes: o email segue para a IA.
+    """
+    model = get_local_model()
+    if model is None:
+        return None
+    
+    prediction = model.predict(keywords)
+    if prediction is None or prediction.confidence < LOCAL_MODEL_THRESHOLD:
+        return None
+    
+    matches = match_keywords(keywords)
+    evidence = f": {', '.join(prediction.top_stems)}" if prediction.top_stems else ''
+    reason = f'Classificado como {prediction.category.lower()} pelo modelo local ({prediction.confidence:.0%} de confiança){evidence}'
+    return {
+        'category': prediction.category,
+        'reason': reason,
+        'confidence_score': round(prediction.confidence, 4),
+        'summary': reason,
+        'used_local_model': True,
+        'keyword_analysis': _keyword_analysis(matches, sorted(set(matches.produtivo) | set(matches.improdutivo)))
+    }
+
+
+def find_near_duplicate(keywords: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Procura um email já classificado quase idêntico (mesmo modelo, só nomes, datas ou protocolos diferentes).
+    Retorna (classificação reaproveitada ou None, detalhes da similaridade para processing_details ou None).
+    """
+    index = get_near_duplicate_index()
+    match = index.lookup(keywords) if index else None
+    if match is None:
+        return None, None
+    
+    details = {'similarity': match.similarity, 'threshold': index.threshold, 'matched': match.result is not None,
+               'reused_reply': False}
+    if match.result is None:
+        return None, details
+    
+    stored = match.result
+    matches = match_keywords(keywords)
+    reason = f"Quase idêntico ({match.similarity:.0%}) a um email já classificado como {stored['category'].lower()}: {stored['reason']}"
+    classification = {
+        'category': stored['category'],
+        'reason': reason,
+        'confidence_score': round(stored['confidence_score'] * match.similarity, 4),
+        'summary': stored.get('summary') or reason,
+        'used_near_duplicate': True,
+        'suggested_response': None,
+        'keyword_analysis': _keyword_analysis(matches, sorted(set(matches.produtivo) | set(matches.improdutivo)))
+    }
+    # A resposta do outro email pode citar nomes e dados dele: só reaproveitar se configurado
+    if NEAR_DUPLICATE_REUSE_REPLY and stored.get('suggested_response'):
+        classification['suggested_response'] = stored['suggested_response']
+        classification['reply_source'] = 'near_duplicate'
+        details['reused_reply'] = True
+    return classification, details
+
+
 def analyze_with_keywords_fallback(keywords: str, raw_text: str) -> Dict[str, Any]:
     """
     Fallback: classifica usando apenas keywords quando IA falha.
     """
-    keyword_list = set(keywords.lower().split())
+    matches = match_keywords(keywords)
     
-    matched_produtivo = keyword_list & PRODUTIVO_KEYWORDS
-    matched_improdutivo = keyword_list & IMPRODUTIVO_KEYWORDS
+    produtivo_score = matches.produtivo_score
+    improdutivo_score = matches.improdutivo_score
+    produtivo_weight = matches.produtivo_weight
+    improdutivo_weight = matches.improdutivo_weight
     
-    produtivo_score = len(matched_produtivo)
-    improdutivo_score = len(matched_improdutivo)
-    
-    if produtivo_score > improdutivo_score:
+    if produtivo_weight > improdutivo_weight:
         category = 'Produtivo'
-        confidence = min(0.60 + (produtivo_score * 0.05), 0.80)
-        matched_keywords = sorted(list(matched_produtivo))
+        confidence = min(0.60 + (produtivo_weight * 0.05), 0.80)
+        matched_keywords = sorted(matches.produtivo)
         reason = f'Classificado como produtivo baseado em {produtivo_score} palavras-chave (fallback): {", ".join(matched_keywords)}'
-    elif improdutivo_score > produtivo_score:
+    elif improdutivo_weight > produtivo_weight:
         category = 'Improdutivo'
-        confidence = min(0.60 + (improdutivo_score * 0.05), 0.80)
-        matched_keywords = sorted(list(matched_improdutivo))
+        confidence = min(0.60 + (improdutivo_weight * 0.05), 0.80)
+        matched_keywords = sorted(matches.improdutivo)
         reason = f'Classificado como improdutivo baseado em {improdutivo_score} palavras-chave (fallback): {", ".join(matched_keywords)}'
     else:
         # Empate ou nenhuma keyword relevante - usar heurística do texto
@@ -126,12 +371,7 @@ def analyze_with_keywords_fallback(keywords: str, raw_text: str) -> Dict[str, An
         'confidence_score': confidence,
         'summary': reason,
         'used_fallback': True,
-        'keyword_analysis': {
-            'matched_keywords': matched_keywords,
-            'produtivo_score': produtivo_score,
-            'improdutivo_score': improdutivo_score,
-            'total_keywords': len(keyword_list)
-        }
+        'keyword_analysis': _keyword_analysis(matches, matched_keywords)
     }
 
 
@@ -151,140 +391,695 @@ def should_use_full_text(raw_text: str, keywords: str) -> bool:
     return True  # Precisa texto completo
 
 
-def _analyze_with_ai(raw_text: str, nlp_keywords: str, use_full_text: bool = True) -> Dict[str, Any]:
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+_circuit_breaker = CircuitBreaker(
+    'gemini',
+    failure_rate_threshold=CIRCUIT_FAILURE_RATE,
+    slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+    slow_call_rate_threshold=CIRCUIT_SLOW_CALL_RATE,
+    window_size=CIRCUIT_WINDOW_SIZE,
+    min_calls=CIRCUIT_MIN_CALLS,
+    open_seconds=CIRCUIT_OPEN_SECONDS,
+    half_open_probes=CIRCUIT_HALF_OPEN_PROBES,
+    enabled=CIRCUIT_BREAKER_ENABLED
+)
+_retry_budget = RetryBudget(AI_RETRY_BUDGET_RATIO, AI_RETRY_BUDGET_MIN_PER_SECOND)
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    return _circuit_breaker
+
+
+def _is_retryable(e: Exception) -> bool:
     """
-    Análise usando IA (Gemini).
+    Timeouts, cota e erros 5xx são transitórios; chave inválida ou requisição inválida não.
+    """
+    if isinstance(e, asyncio.TimeoutError):
+        return True
+    
+    code = getattr(e, 'code', None)
+    if not isinstance(code, int):
+        match = re.match(r'\s*(\d{3})\b', str(e))
+        code = int(match.group(1)) if match else None
+    return code in _RETRYABLE_STATUS
+
+
+async def _acquire_quota(call: str) -> bool:
+    """
+    Consome uma ficha da cota global (GEMINI_QUOTA_PER_MINUTE) por chamada de saída, incluindo retentativas.
+    Com SQLite ou Redis a consulta roda numa thread, sem travar o event loop.
+    """
+    quota = get_ai_quota()
+    if quota is None:
+        return True
+    if await asyncio.to_thread(quota.try_acquire) if quota.blocking else quota.try_acquire():
+        return True
+    record_quota_rejection(call)
+    return False
+
+
+async def _reserve_retry(call: str) -> bool:
+    """
+    Reserva o que uma retentativa consome: orçamento, vaga no disjuntor (de teste, em half_open) e
+    ficha da cota. Se algo faltar, devolve o que já foi reservado.
     """
+    if not _retry_budget.try_acquire():
+        return False
+    if not _circuit_breaker.allow():
+        _retry_budget.refund()
+        return False
+    if not await _acquire_quota(call):
+        _circuit_breaker.release()
+        _retry_budget.refund()
+        return False
+    return True
+
+
+def _retry_delay(attempt: int) -> float:
+    # Backoff exponencial com jitter total: espalha as retentativas de requisições simultâneas
+    ceiling = min(AI_RETRY_MAX_DELAY_MS, AI_RETRY_BASE_DELAY_MS * (2 ** attempt))
+    return random.uniform(0, ceiling) / 1000
+
+
+async def _generate_once(prompt: str, config, call: str, timeout: float):
     client = _get_gemini_client()
     model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
     
-    # Otimizar prompt: usar texto completo ou apenas keywords
-    if use_full_text:
-        text_context = f"TEXTO ORIGINAL:\n{raw_text}\n\nCONTEXTO NLP (PALAVRAS-CHAVE PROCESSADAS):\n{nlp_keywords}"
-    else:
-        text_context = f"PALAVRAS-CHAVE EXTRAÍDAS DO EMAIL:\n{nlp_keywords}\n\n(Texto completo não disponível - use as palavras-chave para análise)"
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            client.aio.models.generate_content(
+                model=model_name,
+                contents=prompt,
+                config=config
+            ),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        record_gemini_call(call, 'timeout', time.perf_counter() - start)
+        raise
+    except Exception:
+        record_gemini_call(call, 'error', time.perf_counter() - start)
+        raise
+    
+    record_gemini_call(call, 'success', time.perf_counter() - start, getattr(response, 'usage_metadata', None))
+    return response.text
+
+
+async def _generate_content(prompt: str, max_output_tokens: Optional[int] = None, call: str = 'classify') -> str:
+    """
+    Chama o Gemini pelo cliente assíncrono.
+    `call` identifica a chamada nas métricas ('classify', 'classify_batch' ou 'reply').
+    
+    Com o disjuntor aberto, falha na hora com CircuitOpenException (e o chamador cai no fallback).
+    Erros transitórios são repetidos com backoff e jitter, limitados por AI_MAX_RETRIES, pelo
+    orçamento global de retentativas e pelo prazo total AI_CALL_DEADLINE; cada tentativa
+    respeita GEMINI_TIMEOUT.
+    """
+    config = _generation_config(max_output_tokens)
+    
+    if not _circuit_breaker.allow():
+        record_circuit_rejection(call)
+        raise CircuitOpenException("API de IA indisponível no momento (circuito aberto)")
+    
+    if not await _acquire_quota(call):
+        _circuit_breaker.release()
+        raise QuotaExhaustedException("Cota de chamadas à API de IA esgotada no momento")
+    
+    _retry_budget.record_request()
+    deadline = time.monotonic() + AI_CALL_DEADLINE
+    attempt = 0
+    
+    while True:
+        start = time.monotonic()
+        try:
+            text = await _generate_once(prompt, config, call, timeout=max(0.0, min(GEMINI_TIMEOUT, deadline - start)))
+        except asyncio.CancelledError:
+            _circuit_breaker.release()
+            raise
+        except Exception as e:
+            _circuit_breaker.record_failure(time.monotonic() - start)
+            
+            delay = _retry_delay(attempt)
+            can_retry = (
+                attempt < AI_MAX_RETRIES
+                and _is_retryable(e)
+                and time.monotonic() + delay < deadline
+                and await _reserve_retry(call)
+            )
+            if not can_retry:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise AIAPIException("Timeout na comunicação com a API de IA. Tente novamente.")
+                raise
+            
+            attempt += 1
+            record_gemini_retry(call)
+            logger.warning(f"Chamada ao Gemini falhou ({str(e) or type(e).__name__}), tentativa {attempt + 1} em {delay:.2f}s")
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                _circuit_breaker.release()
+                raise
+            continue
+        
+        _circuit_breaker.record_success(time.monotonic() - start)
+        return text
+
+
+async def _generate_stream(prompt: str, max_output_tokens: Optional[int] = None,
+                           call: str = 'reply_stream') -> AsyncIterator[str]:
+    """
+    Chama o Gemini em modo streaming e produz os trechos de texto conforme chegam.
+    
+    Mesmo disjuntor e cota de _generate_content, mas sem retentativas (trechos já enviados ao
+    cliente não podem ser repetidos). A espera por cada trecho respeita GEMINI_TIMEOUT e o prazo
+    total AI_CALL_DEADLINE; o disjuntor avalia o tempo até o primeiro trecho.
+    """
+    config = _generation_config(max_output_tokens)
+    
+    if not _circuit_breaker.allow():
+        record_circuit_rejection(call)
+        raise CircuitOpenException("API de IA indisponível no momento (circuito aberto)")
+    
+    if not await _acquire_quota(call):
+        _circuit_breaker.release()
+        raise QuotaExhaustedException("Cota de chamadas à API de IA esgotada no momento")
+    
+    _retry_budget.record_request()
+    client = _get_gemini_client()
+    model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    start = time.monotonic()
+    deadline = start + AI_CALL_DEADLINE
+    first_chunk_at: Optional[float] = None
+    usage_metadata = None
+
+    def timeout() -> float:
+        return max(0.0, min(GEMINI_TIMEOUT, deadline - time.monotonic()))
+    
+    try:
+        stream = await asyncio.wait_for(
+            client.aio.models.generate_content_stream(model=model_name, contents=prompt, config=config),
+            timeout=timeout()
+        )
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout())
+            except StopAsyncIteration:
+                break
+            
+            if first_chunk_at is None:
+                first_chunk_at = time.monotonic()
+                _circuit_breaker.record_success(first_chunk_at - start)
+            usage_metadata = getattr(chunk, 'usage_metadata', None) or usage_metadata
+            if chunk.text:
+                yield chunk.text
+    
+    except (asyncio.CancelledError, GeneratorExit):
+        # Cliente desconectou ou o consumidor parou de ler
+        if first_chunk_at is None:
+            _circuit_breaker.release()
+        raise
+    
+    except asyncio.TimeoutError:
+        record_gemini_call(call, 'timeout', time.monotonic() - start)
+        if first_chunk_at is None:
+            _circuit_breaker.record_failure(time.monotonic() - start)
+        raise AIAPIException("Timeout na comunicação com a API de IA. Tente novamente.")
+    
+    except Exception as e:
+        record_gemini_call(call, 'error', time.monotonic() - start)
+        if first_chunk_at is None:
+            _circuit_breaker.record_failure(time.monotonic() - start)
+        raise _to_ai_exception(e)
+    
+    record_gemini_call(call, 'success', time.monotonic() - start, usage_metadata)
+
+
+_CLASSIFICATION_GUIDE = """Classificações:
+- Produtivo: Emails que requerem ação ou resposta específica (solicitações de suporte, atualizações sobre casos, dúvidas sobre sistema, pedidos de documentos, etc.)
+- Improdutivo: Emails que não necessitam ação imediata (mensagens de felicitações, agradecimentos genéricos, spam, etc.)"""
+
+
+# Campo da resposta sugerida no JSON de classificação (omitido quando a resposta é gerada à parte)
+_REPLY_FIELD = (',\n    "sugestao_resposta": "Se Produtivo, escreva uma resposta formal e profissional '
+                'em português brasileiro. Se Improdutivo, retorne null"')
+
+
+def _prompt_context(raw_text: str, nlp_keywords: str, use_full_text: bool) -> Optional[PromptContext]:
+    if not use_full_text:
+        return None
+    return build_prompt_context(raw_text, nlp_keywords, PROMPT_TOKEN_BUDGET, get_keyword_matcher())
+
+
+def _email_context(nlp_keywords: str, context: Optional[PromptContext], thread_context: Optional[str] = None) -> str:
+    # Resposta numa conversa conhecida: o email é só o trecho novo, e as mensagens anteriores entram resumidas
+    thread = f"CONVERSA ANTERIOR (já classificada):\n{thread_context}\n\nNOVA MENSAGEM DA CONVERSA:\n" if thread_context else ''
+    # Otimizar prompt: usar o texto (limpo e dentro do orçamento) ou apenas keywords
+    if context is not None:
+        return f"{thread}TEXTO ORIGINAL:\n{context.text}\n\nCONTEXTO NLP (PALAVRAS-CHAVE PROCESSADAS):\n{context.keywords}"
+    return f"{thread}PALAVRAS-CHAVE EXTRAÍDAS DO EMAIL:\n{nlp_keywords}\n\n(Texto completo não disponível - use as palavras-chave para análise)"
+
+
+def _strip_markdown(content: str) -> str:
+    # Limpar markdown se presente
+    content = content.strip()
+    if content.startswith('```json'):
+        content = content[7:]
+    if content.startswith('```'):
+        content = content[3:]
+    if content.endswith('```'):
+        content = content[:-3]
+    return content.strip()
+
+
+def _build_ai_result(result: Dict[str, Any], nlp_keywords: str, use_full_text: bool,
+                     context: Optional[PromptContext] = None) -> Dict[str, Any]:
+    """
+    Valida o objeto JSON retornado pela IA e monta o resultado da classificação.
+    """
+    if not isinstance(result, dict):
+        raise AIAPIException("Resposta inválida da API de IA")
+    
+    categoria = str(result.get('categoria') or '').strip()
+    razao = str(result.get('razao') or '').strip()
+    sugestao_resposta = result.get('sugestao_resposta')
+    
+    if categoria not in ['Produtivo', 'Improdutivo']:
+        raise AIAPIException("Categoria inválida retornada pela API")
+    
+    confidence_score = _calculate_confidence_score(categoria, razao)
+    
+    summary = razao if razao else f"Email classificado como {categoria}"
+    
+    # Analisar keywords para incluir nos detalhes
+    matches = match_keywords(nlp_keywords)
+    
+    return {
+        'category': categoria,
+        'reason': razao,
+        'suggested_response': sugestao_resposta if sugestao_resposta else None,
+        'reply_source': 'ai' if sugestao_resposta else None,
+        'confidence_score': confidence_score,
+        'summary': summary,
+        'used_ai': True,
+        'used_full_text': use_full_text,
+        'prompt_context': context.report() if context is not None else None,
+        'keyword_analysis': _keyword_analysis(matches, sorted(set(matches.produtivo) | set(matches.improdutivo)))
+    }
+
+
+async def _analyze_with_ai(raw_text: str, nlp_keywords: str, use_full_text: bool = True,
+                           with_reply: bool = True, thread_context: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Análise usando IA (Gemini).
+    Com with_reply=False pede só categoria e razão (resposta menor e mais rápida; usado no streaming
+    e quando a biblioteca de respostas já tem a resposta).
+    """
+    context = _prompt_context(raw_text, nlp_keywords, use_full_text)
+    text_context = _email_context(nlp_keywords, context, thread_context)
+    reply_field = _REPLY_FIELD if with_reply else ''
     
     prompt = f"""Atue como um sistema de triagem de emails corporativos para uma empresa financeira.
 Analise o seguinte email e retorne um JSON.
 
 {text_context}
 
-Classificações:
-- Produtivo: Emails que requerem ação ou resposta específica (solicitações de suporte, atualizações sobre casos, dúvidas sobre sistema, pedidos de documentos, etc.)
-- Improdutivo: Emails que não necessitam ação imediata (mensagens de felicitações, agradecimentos genéricos, spam, etc.)
+{_CLASSIFICATION_GUIDE}
 
 Responda EXCLUSIVAMENTE neste formato JSON:
 {{
     "categoria": "Produtivo" ou "Improdutivo",
-    "razao": "Breve explicação em uma frase sobre por que foi classificado assim",
-    "sugestao_resposta": "Se Produtivo, escreva uma resposta formal e profissional em português brasileiro. Se Improdutivo, retorne null"
+    "razao": "Breve explicação em uma frase sobre por que foi classificado assim"{reply_field}
 }}
 
 IMPORTANTE: Responda APENAS em JSON válido, sem markdown, sem explicações adicionais."""
-    
+
     try:
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
-        )
-        
-        content = response.text.strip()
-        
-        # Limpar markdown se presente
-        if content.startswith('```json'):
-            content = content[7:]
-        if content.startswith('```'):
-            content = content[3:]
-        if content.endswith('```'):
-            content = content[:-3]
-        content = content.strip()
-        
-        result = json.loads(content)
-        
-        categoria = result.get('categoria', '').strip()
-        razao = result.get('razao', '').strip()
-        sugestao_resposta = result.get('sugestao_resposta')
-        
-        if categoria not in ['Produtivo', 'Improdutivo']:
-            raise AIAPIException("Categoria inválida retornada pela API")
-        
-        confidence_score = _calculate_confidence_score(categoria, razao)
-        
-        summary = razao if razao else f"Email classificado como {categoria}"
-        
-        # Analisar keywords para incluir nos detalhes
-        keyword_list = set(nlp_keywords.lower().split())
-        matched_produtivo = keyword_list & PRODUTIVO_KEYWORDS
-        matched_improdutivo = keyword_list & IMPRODUTIVO_KEYWORDS
-        
-        return {
-            'category': categoria,
-            'reason': razao,
-            'suggested_response': sugestao_resposta if sugestao_resposta else None,
-            'confidence_score': confidence_score,
-            'summary': summary,
-            'used_ai': True,
-            'used_full_text': use_full_text,
-            'keyword_analysis': {
-                'matched_keywords': sorted(list(matched_produtivo | matched_improdutivo)),
-                'produtivo_score': len(matched_produtivo),
-                'improdutivo_score': len(matched_improdutivo),
-                'total_keywords': len(keyword_list)
-            }
-        }
+        content = _strip_markdown(await _generate_content(prompt))
+        return _build_ai_result(json.loads(content), nlp_keywords, use_full_text, context)
     
     except json.JSONDecodeError as e:
         logger.error(f"Erro ao parsear JSON da resposta do Gemini: {str(e)}")
         raise AIAPIException("Resposta inválida da API de IA")
     
+    except AIAPIException:
+        raise
+    
     except Exception as e:
-        error_message = str(e).lower()
-        logger.error(f"Erro na API Gemini: {str(e)}")
-        
-        if 'timeout' in error_message or 'deadline' in error_message:
-            raise AIAPIException("Timeout na comunicação com a API de IA. Tente novamente.")
-        
-        if 'rate limit' in error_message or 'quota' in error_message:
-            raise AIAPIException("Limite de requisições excedido. Tente novamente em alguns instantes.")
+        raise _to_ai_exception(e)
+
+
+async def _analyze_batch_with_ai(items: List[Tuple[str, str, bool, Optional[str]]]) -> List[Union[Dict[str, Any], AIAPIException]]:
+    """
+    Classifica vários emails (raw_text, nlp_keywords, use_full_text, thread_context) em uma única chamada, com as
+    instruções uma vez só e resposta em array JSON. Itens ausentes ou malformados na resposta voltam
+    como AIAPIException, e cada requisição cai no fallback por keywords individualmente.
+    """
+    if len(items) == 1:
+        raw_text, nlp_keywords, use_full_text, thread_context = items[0]
+        try:
+            return [await _analyze_with_ai(raw_text, nlp_keywords, use_full_text, thread_context=thread_context)]
+        except AIAPIException as e:
+            return [e]
+    
+    record_ai_batch(len(items))
+    contexts = [_prompt_context(raw_text, nlp_keywords, use_full_text) for raw_text, nlp_keywords, use_full_text, _ in items]
+    blocks = '\n\n'.join(
+        f"=== EMAIL {index} ===\n{_email_context(nlp_keywords, context, thread_context)}"
+        for index, ((_, nlp_keywords, _, thread_context), context) in enumerate(zip(items, contexts), start=1)
+    )
+    
+    prompt = f"""Atue como um sistema de triagem de emails corporativos para uma empresa financeira.
+Analise cada um dos {len(items)} emails abaixo e retorne um array JSON com um objeto por email.
+
+{blocks}
+
+{_CLASSIFICATION_GUIDE}
+
+Responda EXCLUSIVAMENTE com um array JSON neste formato, um objeto por email:
+[
+    {{
+        "id": número do email (1 a {len(items)}),
+        "categoria": "Produtivo" ou "Improdutivo",
+        "razao": "Breve explicação em uma frase sobre por que foi classificado assim",
+        "sugestao_resposta": "Se Produtivo, escreva uma resposta formal e profissional em português brasileiro. Se Improdutivo, retorne null"
+    }}
+]
+
+IMPORTANTE: Responda APENAS em JSON válido, sem markdown, sem explicações adicionais."""
+
+    try:
+        entries = json.loads(_strip_markdown(await _generate_content(prompt, call='classify_batch')))
+    except json.JSONDecodeError as e:
+        logger.error(f"Erro ao parsear JSON da resposta em lote do Gemini: {str(e)}")
+        raise AIAPIException("Resposta inválida da API de IA")
+    except AIAPIException:
+        raise
+    except Exception as e:
+        raise _to_ai_exception(e)
+    
+    if not isinstance(entries, list):
+        raise AIAPIException("Resposta inválida da API de IA")
+    
+    by_id: Dict[int, Any] = {}
+    for entry in entries:
+        if isinstance(entry, dict) and isinstance(entry.get('id'), int):
+            by_id.setdefault(entry['id'], entry)
+    
+    results: List[Union[Dict[str, Any], AIAPIException]] = []
+    for index, ((_, nlp_keywords, use_full_text, _), context) in enumerate(zip(items, contexts), start=1):
+        try:
+            if index not in by_id:
+                raise AIAPIException("Email ausente na resposta em lote da API de IA")
+            results.append(_build_ai_result(by_id[index], nlp_keywords, use_full_text, context))
+        except AIAPIException as e:
+            logger.warning(f"Item {index} do lote da IA inválido: {str(e)}")
+            results.append(e)
+    
+    return results
+
+
+_ai_batcher = MicroBatcher(_analyze_batch_with_ai, AI_MICROBATCH_WINDOW_MS / 1000, AI_MICROBATCH_MAX_SIZE)
+
+
+async def _classify_with_ai(raw_text: str, nlp_keywords: str, use_full_text: bool,
+                           thread_context: Optional[str] = None, with_reply: bool = True) -> Dict[str, Any]:
+    """
+    Com AI_MICROBATCH_ENABLED, agrupa com outros emails que chegarem na mesma janela. Sem a resposta
+    (with_reply=False) a chamada é curta e vai direto, fora do lote (o prompt do lote pede a resposta).
+    """
+    if not AI_MICROBATCH_ENABLED or not with_reply:
+        return await _analyze_with_ai(raw_text, nlp_keywords, use_full_text=use_full_text, with_reply=with_reply,
+                                      thread_context=thread_context)
+    return await _ai_batcher.submit((raw_text, nlp_keywords, use_full_text, thread_context))
+
+
+def _to_ai_exception(e: Exception) -> AIAPIException:
+    """
+    Traduz erros do SDK do Gemini para AIAPIException com mensagem amigável.
+    """
+    error_message = str(e).lower()
+    logger.error(f"Erro na API Gemini: {str(e)}")
+    
+    if 'timeout' in error_message or 'deadline' in error_message:
+        return AIAPIException("Timeout na comunicação com a API de IA. Tente novamente.")
+    
+    if 'rate limit' in error_message or 'quota' in error_message:
+        return AIAPIException("Limite de requisições excedido. Tente novamente em alguns instantes.")
+    
+    if 'api key' in error_message or 'authentication' in error_message:
+        return AIAPIException("Chave da API inválida ou não configurada")
+    
+    return AIAPIException(f"Erro na API de IA: {str(e)}")
+
+
+def _reply_prompt(raw_text: str) -> str:
+    # Mesma limpeza e orçamento da classificação: a resposta é à mensagem atual, não à conversa citada
+    email_text = build_prompt_context(raw_text, '', PROMPT_TOKEN_BUDGET, get_keyword_matcher()).text
+    return f"""Escreva uma resposta formal e profissional em português brasileiro para o email abaixo, recebido por uma empresa financeira.
+Responda APENAS com o texto da resposta, sem JSON e sem markdown.
+
+EMAIL:
+{email_text}"""
+
+
+async def generate_reply_with_ai(raw_text: str) -> Optional[str]:
+    """
+    Gera apenas a resposta sugerida (classificação já conhecida).
+    Prompt curto e limite de tokens de saída menor que o da classificação completa.
+    """
+    try:
+        reply = (await _generate_content(_reply_prompt(raw_text), max_output_tokens=REPLY_MAX_OUTPUT_TOKENS, call='reply')).strip()
+    except AIAPIException:
+        raise
+    except Exception as e:
+        raise _to_ai_exception(e)
+    
+    return reply or None
+
+
+async def stream_reply_with_ai(raw_text: str) -> AsyncIterator[str]:
+    """
+    Versão em streaming de generate_reply_with_ai: produz a resposta sugerida em trechos.
+    """
+    async for text in _generate_stream(_reply_prompt(raw_text), max_output_tokens=REPLY_MAX_OUTPUT_TOKENS):
+        yield text
+
+
+def match_reply_library(raw_text: str, nlp_keywords: str) -> Optional[ReplyLibraryMatch]:
+    """
+    Resposta da biblioteca (modelo de um email parecido, preenchido com os dados deste), ou None.
+    """
+    library = get_reply_library()
+    if library is None:
+        return None
+    with stage_timer('reply_library'):
+        return library.match(raw_text, nlp_keywords)
+
+
+def _use_library_reply(result: Dict[str, Any], match: ReplyLibraryMatch) -> Dict[str, Any]:
+    library = get_reply_library()
+    if library is not None:
+        library.mark_used(match.entry_id)
+    logger.info("Resposta sugerida da biblioteca (modelo %s, similaridade %s)", match.entry_id, match.similarity)
+    result['suggested_response'] = match.reply
+    result['reply_source'] = 'reply_library'
+    result['reply_library'] = {
+        'entry_id': match.entry_id,
+        'similarity': match.similarity,
+        'threshold': library.threshold if library is not None else None
+    }
+    return result
+
+
+_analysis_flight = SingleFlight('analyze_email')
+
+
+async def analyze_email(raw_text: str, nlp_keywords: str, defer_reply: bool = False,
+                        thread_context: Optional[str] = None, keyword_hint: Optional[KeywordHint] = None) -> Dict[str, Any]:
+    """
+    Classifica o email. Requisições simultâneas com o mesmo conteúdo normalizado (ex.: disparo em massa)
+    compartilham uma única classificação em andamento, em qualquer ponto de entrada (texto, arquivo, lote).
+    Com thread_context (resumo da conversa), raw_text é só o trecho novo de uma resposta. Com keyword_hint
+    (lote), a pré-classificação já calculada é reaproveitada.
+    """
+    key = f"{content_hash(raw_text)}:{int(defer_reply)}"
+    if thread_context:
+        key = f"{key}:{content_hash(thread_context)}"
+    return await _analysis_flight.do(
+        key, lambda: _analyze_email(raw_text, nlp_keywords, defer_reply, thread_context, keyword_hint)
+    )
+
+
+async def _complete_local_classification(classification: Dict[str, Any], raw_text: str, nlp_keywords: str,
+                                         defer_reply: bool) -> Dict[str, Any]:
+    """
+    Classificação feita sem a IA (keywords ou modelo local): a IA só gera a resposta sugerida, se produtivo
+    e se a biblioteca de respostas não tiver uma.
+    """
+    classification['suggested_response'] = None
+    
+    # Ainda precisamos da IA para gerar resposta se for produtivo
+    if classification['category'] == 'Produtivo':
+        library_match = match_reply_library(raw_text, nlp_keywords)
+        if library_match:
+            return _use_library_reply(classification, library_match)
         
-        if 'api key' in error_message or 'authentication' in error_message:
-            raise AIAPIException("Chave da API inválida ou não configurada")
+        if defer_reply:
+            classification['reply_pending'] = True
+            return classification
         
-        raise AIAPIException(f"Erro na API de IA: {str(e)}")
+        try:
+            # Usar IA apenas para gerar resposta (prompt curto, sem reclassificar)
+            with stage_timer('ai_reply'):
+                classification['suggested_response'] = await generate_reply_with_ai(raw_text)
+            classification['reply_source'] = 'ai' if classification['suggested_response'] else None
+            classification['used_ai'] = True
+            # Manter keyword_analysis da pré-classificação
+        except Exception as e:
+            logger.warning(f"IA falhou ao gerar resposta, mas classificação já feita: {str(e)}")
+            classification['used_ai'] = False
+    
+    return classification
 
 
-def analyze_email(raw_text: str, nlp_keywords: str) -> Dict[str, Any]:
-    # Passo 1: Tentar pré-classificação com keywords
-    pre_classification = pre_classify_with_keywords(nlp_keywords)
+async def _analyze_email(raw_text: str, nlp_keywords: str, defer_reply: bool = False,
+                         thread_context: Optional[str] = None, keyword_hint: Optional[KeywordHint] = None) -> Dict[str, Any]:
+    """
+    Com defer_reply=True, emails produtivos classificados por keywords retornam sem
+    resposta sugerida (reply_pending=True); a resposta é gerada depois, fora do caminho crítico.
+    """
+    # Passo 0: Email quase idêntico a um já classificado
+    with stage_timer('near_duplicate'):
+        near_classification, near_duplicate = find_near_duplicate(nlp_keywords)
+    
+    if near_classification:
+        logger.info("Classificação reaproveitada de email quase idêntico (similaridade %s)", near_duplicate['similarity'])
+        result = near_classification
+        if not result['suggested_response']:
+            result = await _complete_local_classification(result, raw_text, nlp_keywords, defer_reply)
+    else:
+        result = await _classify_email(raw_text, nlp_keywords, defer_reply, thread_context, keyword_hint)
+    
+    result['near_duplicate'] = near_duplicate
+    return result
+
+
+async def _classify_email(raw_text: str, nlp_keywords: str, defer_reply: bool,
+                          thread_context: Optional[str] = None, keyword_hint: Optional[KeywordHint] = None) -> Dict[str, Any]:
+    # Passo 1: Tentar pré-classificação com keywords (já calculada no lote, se as keywords forem as mesmas)
+    with stage_timer('pre_classify'):
+        if keyword_hint is not None and keyword_hint.nlp_keywords == nlp_keywords:
+            pre_classification = keyword_hint.pre_classification
+        else:
+            pre_classification = pre_classify_with_keywords(nlp_keywords)
     
     if pre_classification and pre_classification.get('confidence_score', 0) > 0.85:
         logger.info("Classificação feita apenas com keywords (alta confiança)")
-        # Ainda precisamos da IA para gerar resposta se for produtivo
-        if pre_classification['category'] == 'Produtivo':
-            try:
-                # Usar IA apenas para gerar resposta
-                ai_result = _analyze_with_ai(raw_text, nlp_keywords, use_full_text=True)
-                pre_classification['suggested_response'] = ai_result.get('suggested_response')
-                pre_classification['used_ai'] = True
-                # Manter keyword_analysis da pré-classificação
-            except Exception as e:
-                logger.warning(f"IA falhou ao gerar resposta, mas classificação já feita: {str(e)}")
-                pre_classification['suggested_response'] = None
-                pre_classification['used_ai'] = False
-        
-        return pre_classification
+        return await _complete_local_classification(pre_classification, raw_text, nlp_keywords, defer_reply)
     
-    # Passo 2: Usar IA para classificação
+    # Passo 2: Modelo local treinado (só os casos em que ele tem confiança suficiente)
+    with stage_timer('local_model'):
+        local_classification = classify_with_local_model(nlp_keywords)
+    
+    if local_classification:
+        logger.info("Classificação feita pelo modelo local (confiança %s)", local_classification['confidence_score'])
+        return await _complete_local_classification(local_classification, raw_text, nlp_keywords, defer_reply)
+    
+    # Passo 3: Usar IA para classificação; com resposta na biblioteca, a IA só classifica
+    library_match = match_reply_library(raw_text, nlp_keywords)
     try:
         use_full_text = should_use_full_text(raw_text, nlp_keywords)
-        result = _analyze_with_ai(raw_text, nlp_keywords, use_full_text=use_full_text)
-        logger.info(f"Classificação feita com IA (usou texto completo: {use_full_text})")
+        with stage_timer('ai_analyze'):
+            result = await _classify_with_ai(raw_text, nlp_keywords, use_full_text, thread_context,
+                                             with_reply=library_match is None)
+        logger.info("Classificação feita com IA (usou texto completo: %s)", use_full_text)
+        if library_match and result['category'] == 'Produtivo':
+            _use_library_reply(result, library_match)
         return result
     
     except AIAPIException as e:
         logger.warning(f"IA falhou, usando fallback baseado em keywords: {str(e)}")
-        # Passo 3: Fallback baseado em keywords
-        return analyze_with_keywords_fallback(nlp_keywords, raw_text)
+        # Passo 4: Fallback baseado em keywords
+        with stage_timer('fallback'):
+            return analyze_with_keywords_fallback(nlp_keywords, raw_text)
+
+
+async def analyze_email_stream(raw_text: str, nlp_keywords: str,
+                               thread_context: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Mesmas etapas de analyze_email, produzindo eventos (tipo, dados) assim que cada parte fica pronta:
+    'keywords' (análise de keywords), 'classification' (resultado sem a resposta),
+    'reply_delta' (trecho da resposta sugerida) e 'result' (resultado completo).
+    
+    A classificação pela IA usa o prompt sem a resposta sugerida; a resposta de emails produtivos
+    é gerada em seguida em streaming, para o cliente ver o texto enquanto é escrito.
+    """
+    with stage_timer('pre_classify'):
+        matches = match_keywords(nlp_keywords)
+        pre_classification = _pre_classify_from_matches(matches)
+    
+    yield 'keywords', _keyword_analysis(matches, sorted(set(matches.produtivo) | set(matches.improdutivo)))
+    
+    with stage_timer('near_duplicate'):
+        near_classification, near_duplicate = find_near_duplicate(nlp_keywords)
+    keywords_confident = bool(pre_classification) and pre_classification.get('confidence_score', 0) > 0.85
+    local_classification = None
+    if not near_classification and not keywords_confident:
+        with stage_timer('local_model'):
+            local_classification = classify_with_local_model(nlp_keywords)
+    
+    if near_classification:
+        logger.info("Classificação reaproveitada de email quase idêntico (similaridade %s)", near_duplicate['similarity'])
+        result = near_classification
+    elif keywords_confident:
+        logger.info("Classificação feita apenas com keywords (alta confiança)")
+        result = pre_classification
+        result['suggested_response'] = None
+    elif local_classification:
+        logger.info("Classificação feita pelo modelo local (confiança %s)", local_classification['confidence_score'])
+        result = local_classification
+        result['suggested_response'] = None
+    else:
+        try:
+            use_full_text = should_use_full_text(raw_text, nlp_keywords)
+            with stage_timer('ai_analyze'):
+                result = await _analyze_with_ai(raw_text, nlp_keywords, use_full_text, with_reply=False,
+                                                thread_context=thread_context)
+            logger.info("Classificação feita com IA (usou texto completo: %s)", use_full_text)
+        except AIAPIException as e:
+            logger.warning(f"IA falhou, usando fallback baseado em keywords: {str(e)}")
+            with stage_timer('fallback'):
+                result = analyze_with_keywords_fallback(nlp_keywords, raw_text)
+    
+    yield 'classification', result
+    
+    # Fallback não gera resposta (a IA acabou de falhar); resposta reaproveitada ou da biblioteca sai de uma vez
+    if not result.get('suggested_response') and result['category'] == 'Produtivo' and not result.get('used_fallback'):
+        library_match = match_reply_library(raw_text, nlp_keywords)
+        if library_match:
+            _use_library_reply(result, library_match)
+    
+    if result.get('suggested_response'):
+        yield 'reply_delta', result['suggested_response']
+    elif result['category'] == 'Produtivo' and not result.get('used_fallback'):
+        parts: List[str] = []
+        try:
+            with stage_timer('ai_reply'):
+                async for text in stream_reply_with_ai(raw_text):
+                    parts.append(text)
+                    yield 'reply_delta', text
+            result['suggested_response'] = ''.join(parts).strip() or None
+            result['reply_source'] = 'ai' if result['suggested_response'] else None
+            result['used_ai'] = True
+        except AIAPIException as e:
+            logger.warning(f"IA falhou ao gerar resposta, mas classificação já feita: {str(e)}")
+            result['suggested_response'] = None
+    
+    result['near_duplicate'] = near_duplicate
+    yield 'result', result
 
 
 def _calculate_confidence_score(categoria: str, razao: str) -> float:
@@ -0,0 +1,221 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.config import GEMINI_QUOTA_PER_MINUTE, GEMINI_QUOTA_BURST, GEMINI_QUOTA_STORAGE_URI
+from app.utils.logger import logger
+
+
+class TokenBucket:
+    """
+    Balde de fichas para chamadas de saída ao Gemini: `rate` fichas por segundo, até `capacity` acumuladas.
+    Falhas do armazenamento liberam a chamada (a cota não deve derrubar a classificação).
+    """
+    backend = 'base'
+    # Backends com I/O (SQLite, Redis) são chamados numa thread, fora do event loop
+    blocking = False
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, capacity)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        raise NotImplementedError
+
+    def available(self) -> Optional[float]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        available = self.available()
+        return {
+            'backend': self.backend,
+            'per_minute': round(self.rate * 60, 3),
+            'capacity': self.capacity,
+            'available': round(available, 2) if available is not None else None
+        }
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+
+
+class MemoryTokenBucket(TokenBucket):
+    """
+    Balde local ao processo (cada worker tem o seu).
+    """
+    backend = 'memory'
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        super().__init__(rate_per_second, capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = self._refill(self._tokens, self._updated_at, now)
+            self._updated_at = now
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def available(self) -> Optional[float]:
+        with self._lock:
+            return self._refill(self._tokens, self._updated_at, time.monotonic())
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Balde compartilhado pelos workers do mesmo host, atualizado em transação exclusiva no SQLite.
+    Com o arquivo travado por mais de BUSY_TIMEOUT segundos, a chamada é liberada em vez de esperar.
+    """
+    backend = 'sqlite'
+    blocking = True
+    
+    BUSY_TIMEOUT = 0.25
+
+    def __init__(self, path: str, rate_per_second: float, capacity: float, name: str = 'gemini'):
+        super().__init__(rate_per_second, capacity)
+        self.name = name
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    now = time.time()
+                    row = self._conn.execute(
+                        'SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (self.name,)
+                    ).fetchone()
+                    available = self._refill(*row, now) if row else self.capacity
+                    
+                    acquired = available >= tokens
+                    if acquired:
+                        available -= tokens
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                        (self.name, available, now)
+                    )
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+            return acquired
+        except sqlite3.Error as e:
+            logger.warning(f"Falha no controle de cota do Gemini (sqlite), liberando a chamada: {str(e)}")
+            return True
+
+    def available(self) -> Optional[float]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (self.name,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return self._refill(*row, time.time()) if row else self.capacity
+
+
+# Recarga e consumo atômicos no Redis, com o relógio do próprio Redis (sem depender do relógio dos workers)
+_REDIS_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local acquired = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    acquired = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return {acquired, tostring(tokens)}
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """
+    Balde global (todos os workers e réplicas) no Redis. Requer o pacote `redis`.
+    """
+    backend = 'redis'
+    blocking = True
+
+    def __init__(self, url: str, rate_per_second: float, capacity: float, name: str = 'gemini', client=None):
+        super().__init__(rate_per_second, capacity)
+        if client is None:
+            import redis
+            
+            # Timeouts curtos: a verificação roda no caminho da requisição (numa thread, mas a requisição espera)
+            client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.key = f"email_classifier:token_bucket:{name}"
+        self._client = client
+        self._script = client.register_script(_REDIS_TOKEN_BUCKET_SCRIPT)
+
+    def _run(self, tokens: float):
+        acquired, available = self._script(keys=[self.key], args=[self.rate, self.capacity, tokens])
+        return bool(acquired), float(available)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        try:
+            return self._run(tokens)[0]
+        except Exception as e:
+            logger.warning(f"Falha no controle de cota do Gemini (redis), liberando a chamada: {str(e)}")
+            return True
+
+    def available(self) -> Optional[float]:
+        try:
+            return self._run(0)[1]
+        except Exception:
+            return None
+
+
+_ai_quota: Optional[TokenBucket] = None
+_ai_quota_lock = threading.Lock()
+
+
+def get_ai_quota() -> Optional[TokenBucket]:
+    """
+    Balde de chamadas ao Gemini configurado por GEMINI_QUOTA_STORAGE_URI
+    (memory://, sqlite:///caminho ou redis://...). None se GEMINI_QUOTA_PER_MINUTE for 0.
+    """
+    global _ai_quota
+    if _ai_quota is not None or GEMINI_QUOTA_PER_MINUTE <= 0:
+        return _ai_quota
+    
+    with _ai_quota_lock:
+        if _ai_quota is not None:
+            return _ai_quota
+        
+        rate = GEMINI_QUOTA_PER_MINUTE / 60
+        burst = GEMINI_QUOTA_BURST or GEMINI_QUOTA_PER_MINUTE
+        scheme, _, location = GEMINI_QUOTA_STORAGE_URI.partition('://')
+        
+        if scheme == 'sqlite':
+            _ai_quota = SQLiteTokenBucket(location[1:] or 'data/gemini_quota.sqlite3', rate, burst)
+        elif scheme in ('redis', 'rediss'):
+            _ai_quota = RedisTokenBucket(GEMINI_QUOTA_STORAGE_URI, rate, burst)
+        else:
+            if scheme != 'memory':
+                logger.warning(f"GEMINI_QUOTA_STORAGE_URI desconhecido '{GEMINI_QUOTA_STORAGE_URI}', usando memória")
+            _ai_quota = MemoryTokenBucket(rate, burst)
+        
+        return _ai_quota
@@ -0,0 +1,232 @@
+import asyncio
+import io
+import json
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+from app.config import MAX_BATCH_ITEMS, MAX_BATCH_UPLOAD_SIZE_MB, MAX_BATCH_UNCOMPRESSED_SIZE_MB, BATCH_CONCURRENCY
+from app.services.ai_handler import KeywordHint, keyword_hints_batch
+from app.services.file_reader import read_content
+from app.services.pipeline import classify_content
+from app.utils.concurrency import run_cpu_bound
+from app.utils.exceptions import EmailClassifierException, InvalidFileException, InvalidTextException, error_code_for
+from app.utils.logger import logger
+from app.utils.metrics import stage_timer, start_stage_timings
+from app.utils.validators import MAX_FILE_SIZE, validate_text
+
+
+# Textos por tarefa do pool de CPU na extração de keywords em lote
+_KEYWORD_CHUNK_SIZE = 256
+
+
+@dataclass
+class BatchItem:
+    source: str
+    filename: Optional[str] = None
+    content: Optional[bytes] = None
+    text: Optional[str] = None
+    error: Optional[EmailClassifierException] = None
+
+
+def _expand_zip(filename: str, content: bytes, max_items: int, max_uncompressed_mb: int) -> List[BatchItem]:
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        raise InvalidFileException(f"Arquivo zip inválido: {filename}")
+    
+    items = []
+    with archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir() and os.path.basename(info.filename) and not info.filename.startswith('__MACOSX/')
+        ]
+        # Limites checados pelo cabeçalho, antes de descompactar qualquer entrada (evita zip bombs).
+        # O tamanho declarado é respeitado na leitura: zipfile não lê além de file_size.
+        if len(entries) > max_items:
+            raise InvalidFileException(f"Arquivo zip {filename} excede o limite de {max_items} itens do lote")
+        uncompressed = sum(info.file_size for info in entries if info.file_size <= MAX_FILE_SIZE)
+        if uncompressed > max_uncompressed_mb * 1024 * 1024:
+            raise InvalidFileException(
+                f"Arquivo zip {filename} excede {max_uncompressed_mb}MB descompactado"
+            )
+        
+        for info in entries:
+            entry_name = os.path.basename(info.filename)
+            source = f"{filename}/{info.filename}"
+            if info.file_size > MAX_FILE_SIZE:
+                items.append(BatchItem(
+                    source=source,
+                    filename=entry_name,
+                    error=InvalidFileException("Arquivo excede o tamanho máximo de 10MB")
+                ))
+                continue
+            
+            items.append(BatchItem(source=source, filename=entry_name, content=archive.read(info)))
+    
+    return items
+
+
+def _expand_jsonl(filename: str, content: bytes) -> List[BatchItem]:
+    try:
+        lines = content.decode('utf-8').splitlines()
+    except UnicodeDecodeError:
+        raise InvalidFileException(f"Arquivo JSONL deve estar em UTF-8: {filename}")
+    
+    items = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        
+        source = f"{filename}:{line_number}"
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            items.append(BatchItem(source=source, error=InvalidTextException("Linha JSONL inválida")))
+            continue
+        
+        if isinstance(entry, dict):
+            text = entry.get('text')
+            source = str(entry.get('id', source))
+        else:
+            text = entry
+        
+        if not isinstance(text, str):
+            items.append(BatchItem(source=source, error=InvalidTextException("Campo 'text' ausente ou inválido")))
+            continue
+        
+        items.append(BatchItem(source=source, text=text))
+    
+    return items
+
+
+def expand_upload(
+    filename: str,
+    content: bytes,
+    max_size_mb: int = MAX_BATCH_UPLOAD_SIZE_MB,
+    max_items: int = MAX_BATCH_ITEMS,
+    max_uncompressed_mb: int = MAX_BATCH_UNCOMPRESSED_SIZE_MB
+) -> List[BatchItem]:
+    """
+    Converte um upload do lote em itens: .zip e .jsonl são expandidos, demais arquivos viram um item.
+    `max_items` são os itens que ainda cabem no lote: um .zip com mais entradas é recusado sem descompactar.
+    """
+    if len(content) > max_size_mb * 1024 * 1024:
+        raise InvalidFileException(f"Arquivo excede o tamanho máximo de {max_size_mb}MB para lotes")
+    
+    file_extension = os.path.splitext((filename or '').lower())[1]
+    if file_extension == '.zip':
+        return _expand_zip(filename, content, max_items, max_uncompressed_mb)
+    if file_extension == '.jsonl':
+        return _expand_jsonl(filename, content)
+    
+    return [BatchItem(source=filename, filename=filename, content=content)]
+
+
+@dataclass
+class _ReadItem:
+    # Tempos por etapa do item, continuados na classificação
+    timings: Dict[str, float]
+    raw_text: Optional[str] = None
+    # Resultado de erro, se a leitura ou a validação falhou
+    failure: Optional[Dict[str, Any]] = None
+
+
+def _error_result(index: int, item: BatchItem, e: Exception) -> Dict[str, Any]:
+    if not isinstance(e, EmailClassifierException):
+        logger.error(f"Erro inesperado no item {item.source} do lote: {str(e)}", exc_info=True)
+    
+    return {
+        "index": index,
+        "source": item.source,
+        "status": "error",
+        "data": None,
+        "error": {"error_code": error_code_for(e), "message": str(e)}
+    }
+
+
+async def _read_item(index: int, item: BatchItem, semaphore: asyncio.Semaphore) -> _ReadItem:
+    async with semaphore:
+        # Cada item roda na própria task: tempos por etapa separados por item
+        timings = start_stage_timings()
+        try:
+            if item.error:
+                raise item.error
+            
+            if item.content is not None:
+                with stage_timer('read_file'):
+                    raw_text = await run_cpu_bound(read_content, item.filename, item.content)
+            else:
+                validate_text(item.text)
+                raw_text = item.text
+            return _ReadItem(timings, raw_text=raw_text)
+        
+        except Exception as e:
+            return _ReadItem(timings, failure=_error_result(index, item, e))
+
+
+async def _keyword_hints(texts: List[str]) -> Optional[List[KeywordHint]]:
+    """
+    Keywords e pré-classificação do lote inteiro pela matriz esparsa, em blocos de _KEYWORD_CHUNK_SIZE textos
+    (cada bloco é uma tarefa do pool de CPU). Se falhar, cada item extrai as próprias keywords e reporta o erro.
+    """
+    chunks = [texts[start:start + _KEYWORD_CHUNK_SIZE] for start in range(0, len(texts), _KEYWORD_CHUNK_SIZE)]
+    try:
+        with stage_timer('extract_keywords'):
+            results = await asyncio.gather(*(run_cpu_bound(keyword_hints_batch, chunk) for chunk in chunks))
+    except Exception as e:
+        logger.warning(f"Extração de keywords em lote falhou, extraindo item a item: {str(e)}")
+        return None
+    return [hint for chunk in results for hint in chunk]
+
+
+async def _classify_item(index: int, item: BatchItem, read: _ReadItem, keyword_hint: Optional[KeywordHint],
+                         semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    async with semaphore:
+        start_stage_timings(read.timings)
+        try:
+            data = await classify_content(read.raw_text, item.filename, keyword_hint=keyword_hint)
+            return {"index": index, "source": item.source, "status": "success", "data": data, "error": None}
+        except Exception as e:
+            return _error_result(index, item, e)
+
+
+async def process_batch(items: List[BatchItem], max_items: int = MAX_BATCH_ITEMS) -> Dict[str, Any]:
+    """
+    Processa os itens concorrentemente (no máximo BATCH_CONCURRENCY por vez): lê todos, extrai as keywords e
+    pré-classifica os textos lidos de uma vez (matriz esparsa) e classifica cada item.
+    Falhas são reportadas por item, sem derrubar o lote inteiro.
+    """
+    if not items:
+        raise InvalidTextException("Lote vazio: forneça arquivos (campo 'files') ou textos (campo 'texts')")
+    
+    if len(items) > max_items:
+        raise InvalidTextException(f"Lote excede o limite de {max_items} itens")
+    
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    reads = await asyncio.gather(*(_read_item(index, item, semaphore) for index, item in enumerate(items)))
+    
+    pending = [index for index, read in enumerate(reads) if read.failure is None]
+    
+    # Keywords e pré-classificação de todos os textos lidos de uma vez (resultados iguais aos do caminho por email)
+    readable = [index for index in pending if reads[index].raw_text.strip()]
+    hints = await _keyword_hints([reads[index].raw_text for index in readable]) if readable else None
+    hint_by_index = dict(zip(readable, hints)) if hints else {}
+    
+    classified = await asyncio.gather(*(
+        _classify_item(index, items[index], reads[index], hint_by_index.get(index), semaphore) for index in pending
+    ))
+    results = [read.failure for read in reads]
+    for index, result in zip(pending, classified):
+        results[index] = result
+    
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    logger.info(f"Lote processado: {succeeded}/{len(results)} itens com sucesso")
+    
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "items": results
+    }
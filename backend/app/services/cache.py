@@ -0,0 +1,316 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import (
+    CACHE_BACKEND,
+    CACHE_TTL_SECONDS,
+    CACHE_MAX_ENTRIES,
+    CACHE_MAX_MEMORY_MB,
+    CACHE_SQLITE_PATH,
+    CACHE_KEYWORD_KEY
+)
+from app.utils.logger import logger
+from app.utils.text import content_hash
+
+
+class CacheBackend:
+    """
+    Interface dos backends de cache. Valores são strings JSON.
+    """
+    name = 'base'
+    # Backends com I/O em disco são chamados numa thread, fora do event loop
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Cache em memória com despejo LRU, TTL e orçamento de memória (tamanho aproximado dos valores).
+    """
+    name = 'memory'
+
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self.total_bytes += size
+            
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self.total_bytes -= len(key) + len(value)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache persistente em SQLite (sobrevive a reinícios). Despejo por TTL e LRU por último acesso.
+    
+    Para não escrever no disco a cada leitura, o último acesso dos acertos é gravado em lote (a cada
+    TOUCH_BATCH_SIZE acertos ou TOUCH_INTERVAL segundos). O despejo roda quando as entradas passam de
+    max_entries em 10% ou a cada EVICTION_INTERVAL segundos (expiradas), não a cada gravação: entre
+    despejos a tabela pode ter um pouco mais que max_entries, e entradas expiradas são ignoradas na leitura.
+    """
+    name = 'sqlite'
+    blocking = True
+    
+    TOUCH_BATCH_SIZE = 256
+    TOUCH_INTERVAL = 5.0
+    EVICTION_INTERVAL = 60.0
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int, table: str = 'classification_cache'):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+        self._eviction_watermark = max_entries + max(1, max_entries // 10)
+        self._touched: Dict[str, float] = {}
+        self._last_touch_flush = time.monotonic()
+        self._last_eviction = time.monotonic()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            f'CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table} (accessed_at)'
+        )
+        self._conn.commit()
+        self._entries = self._conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            # Expirada: removida no próximo despejo
+            if row is None or row[1] < now:
+                return None
+            
+            self._touched[key] = now
+            if (len(self._touched) >= self.TOUCH_BATCH_SIZE
+                    or time.monotonic() - self._last_touch_flush >= self.TOUCH_INTERVAL):
+                self._flush_touched()
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now + self.ttl_seconds, now)
+            )
+            self._touched.pop(key, None)
+            # Contagem aproximada (uma substituição também conta); corrigida a cada despejo
+            self._entries += 1
+            if (self._entries > self._eviction_watermark
+                    or time.monotonic() - self._last_eviction >= self.EVICTION_INTERVAL):
+                self._evict(now)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+            self._conn.commit()
+            self._touched.clear()
+            self._entries = 0
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?',
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+        self._last_touch_flush = time.monotonic()
+
+    def _evict(self, now: float) -> None:
+        # Acessos pendentes primeiro, para o LRU não despejar entradas lidas há pouco
+        self._flush_touched()
+        self._conn.execute(f'DELETE FROM {self.table} WHERE expires_at < ?', (now,))
+        self._conn.execute(
+            f'DELETE FROM {self.table} WHERE key IN ('
+            f'SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+        self._entries = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        self._last_eviction = time.monotonic()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class ClassificationCache:
+    """
+    Cache de resultados de classificação endereçado por conteúdo.
+    Chave primária: hash do texto normalizado. Chave secundária (opcional): hash das keywords stemizadas.
+    Métodos assíncronos: com backend em disco, as operações rodam numa thread.
+    """
+
+    def __init__(self, backend: CacheBackend, use_keyword_key: bool = False):
+        self.backend = backend
+        self.use_keyword_key = use_keyword_key
+        self.hits = {'text': 0, 'keywords': 0}
+        self.misses = 0
+        self.ai_calls_saved = 0
+        self.stores = 0
+
+    @staticmethod
+    def _text_key(raw_text: str) -> str:
+        return f"text:{content_hash(raw_text)}"
+
+    @staticmethod
+    def _keywords_key(nlp_keywords: str) -> str:
+        stems = ' '.join(sorted(set(nlp_keywords.split())))
+        return f"kw:{hashlib.sha256(stems.encode('utf-8')).hexdigest()}"
+
+    async def _call(self, func, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def _lookup(self, key: str, key_type: str) -> Optional[Dict[str, Any]]:
+        value = await self._call(self.backend.get, key)
+        if value is None:
+            return None
+        
+        entry = json.loads(value)
+        self.hits[key_type] += 1
+        if entry['ai_result'].get('used_ai'):
+            self.ai_calls_saved += 1
+        return entry
+
+    async def get_by_text(self, raw_text: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca pelo texto. Em caso de acerto, evita também a extração de keywords.
+        """
+        entry = await self._lookup(self._text_key(raw_text), 'text')
+        if entry is None and not self.use_keyword_key:
+            self.misses += 1
+        return entry
+
+    async def get_by_keywords(self, nlp_keywords: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca pelas keywords stemizadas (só quando CACHE_KEYWORD_KEY estiver ativo).
+        """
+        if not self.use_keyword_key:
+            return None
+        
+        entry = await self._lookup(self._keywords_key(nlp_keywords), 'keywords')
+        if entry is None:
+            self.misses += 1
+        return entry
+
+    async def store(self, raw_text: str, nlp_keywords: str, ai_result: Dict[str, Any]) -> None:
+        # Resultados degradados (fallback ou produtivo sem resposta) não são cacheados
+        if ai_result.get('used_fallback'):
+            return
+        if ai_result['category'] == 'Produtivo' and not ai_result.get('suggested_response'):
+            return
+        
+        value = json.dumps({'nlp_keywords': nlp_keywords, 'ai_result': ai_result}, ensure_ascii=False)
+        await self._call(self.backend.set, self._text_key(raw_text), value)
+        if self.use_keyword_key:
+            await self._call(self.backend.set, self._keywords_key(nlp_keywords), value)
+        self.stores += 1
+
+    async def stats(self) -> Dict[str, Any]:
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'entries': await self._call(len, self.backend),
+            'hits': total_hits,
+            'hits_by_key': dict(self.hits),
+            'misses': self.misses,
+            'hit_rate': round(total_hits / lookups, 4) if lookups else 0.0,
+            'ai_calls_saved': self.ai_calls_saved,
+            'stores': self.stores
+        }
+
+
+_classification_cache: Optional[ClassificationCache] = None
+
+
+def get_classification_cache() -> Optional[ClassificationCache]:
+    """
+    Retorna o cache configurado por CACHE_BACKEND ('memory', 'sqlite' ou 'none').
+    """
+    global _classification_cache
+    if _classification_cache is not None or CACHE_BACKEND == 'none':
+        return _classification_cache
+    
+    if CACHE_BACKEND == 'sqlite':
+        backend = SQLiteCacheBackend(CACHE_SQLITE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES)
+    elif CACHE_BACKEND == 'memory':
+        backend = MemoryCacheBackend(CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, CACHE_MAX_MEMORY_MB * 1024 * 1024)
+    else:
+        logger.warning(f"CACHE_BACKEND desconhecido '{CACHE_BACKEND}', cache desativado")
+        return None
+    
+    _classification_cache = ClassificationCache(backend, use_keyword_key=CACHE_KEYWORD_KEY)
+    return _classification_cache
@@ -0,0 +1,391 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.keyword_matcher import KeywordMatcher
+
+
+# Estimativa de tokens do Gemini para português: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+# Fração do orçamento reservada às keywords processadas (o resto vai para o texto)
+KEYWORDS_BUDGET_SHARE = 0.2
+
+# Menos que isso de texto útil após a limpeza: a limpeza descartou demais, usar o texto original
+_MIN_CLEAN_CHARS = 40
+
+_GAP_MARKER = '[...]'
+
+# Início da cadeia citada: "Em seg., 3 de jun. de 2024 às 10:00, Fulano <x@y> escreveu:", "On ... wrote:",
+# "-----Mensagem original-----", "-----Original Message-----". O cabeçalho tem data (algum dígito), depois
+# uma vírgula ou o endereço do remetente, e termina em ":"; uma frase como "Em março o gerente escreveu" não corta o email
+_QUOTE_HEADER_RE = re.compile(
+    r'^\s*(?:(?:em|on)\s[^\n]{0,150}?\d[^\n]{0,150}?[,<][^\n]{0,300}\b(?:escreveu|wrote)\s*:\s*$'
+    r'|-{2,}\s*(?:mensagem original|original message)\s*-{2,}\s*$)',
+    re.IGNORECASE
+)
+_FORWARD_MARKER_RE = re.compile(
+    r'^\s*(?:-{2,}\s*(?:forwarded message|mensagem encaminhada)\s*-{2,}'
+    r'|(?:begin forwarded message|in[ií]cio da mensagem encaminhada)\s*:?)\s*$',
+    re.IGNORECASE
+)
+# Cabeçalhos de email encaminhado/citado (o assunto é mantido: costuma resumir o pedido)
+_HEADER_LINE_RE = re.compile(r'^\s*(?:de|from|para|to|cc|cco|bcc|data|date|enviad[oa](?: em)?|sent)\s*:', re.IGNORECASE)
+_SUBJECT_LINE_RE = re.compile(r'^\s*(?:assunto|subject)\s*:', re.IGNORECASE)
+_QUOTE_PREFIX_RE = re.compile(r'^\s*> ?')
+_SIGNATURE_DELIMITER_RE = re.compile(r'^--\s*$')
+_MOBILE_SIGNATURE_RE = re.compile(r'^\s*(?:enviado d[oe] meu|sent from my)\b', re.IGNORECASE)
+_CLOSING_RE = re.compile(
+    r'^\s*(?:att|atte|atenciosamente|cordialmente|abra[çc]os?|grat[oa]|(?:muito )?obrigad[oa]|saudações|respeitosamente'
+    r'|regards|best regards|best|thanks)\b[\s,.!]*$',
+    re.IGNORECASE
+)
+# Nome próprio na assinatura: 1 a 4 palavras capitalizadas, com "da", "de", "do", "dos" entre elas
+_NAME_LINE_RE = re.compile(r'^\s*([A-ZÀ-Ý][a-zà-ÿ]+(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ý][a-zà-ÿ]+){0,3})\s*[.,]?\s*$')
+# Contato na assinatura: telefone, email ou site
+_CONTACT_LINE_RE = re.compile(r'(?:\+?\d[\d\s().-]{7,}\d|[\w.+-]+@[\w-]+\.[\w.]+|https?://|\bwww\.)', re.IGNORECASE)
+# Pergunta ou pedido: a linha é conteúdo, nunca assinatura (mesmo depois de um "Obrigado!")
+_REQUEST_LINE_RE = re.compile(
+    r'\?|\b(?:preciso|precisamos|gostaria|gostaríamos|poderia[m]?|podem|pode|solicit\w*|favor|pe[çc]o|aguard\w*'
+    r'|envi\w*|reenvi\w*|mand\w*|verifi\w*|resolv\w*|recebi|urgente|please|could|can you|need)\b',
+    re.IGNORECASE
+)
+_DISCLAIMER_MARKERS = (
+    'confidencial', 'confidential', 'sigilos', 'privileged', 'destinatário', 'intended recipient',
+    'aviso legal', 'disclaimer', 'proibida', 'prohibited', 'lgpd'
+)
+_SENTENCE_RE = re.compile(r'(?<=[.!?;])\s+')
+_WORD_RE = re.compile(r'[a-záéíóúâêîôûãõçà]{3,}')
+
+# Parágrafos curtos consecutivos (saudação, linhas de PDF) são agrupados até este tamanho para o ranking
+_MIN_SEGMENT_CHARS = 200
+
+# Linhas após o fecho que ainda contam como assinatura (nome, cargo, empresa, telefone)
+_SIGNATURE_MAX_LINES = 8
+_SIGNATURE_MAX_LINE_CHARS = 80
+# Cargo/empresa sem nome nem contato: só linhas curtas assim
+_SIGNATURE_MAX_LINE_WORDS = 6
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class PromptContext:
+    """
+    Texto e keywords do email prontos para o prompt, com o relatório das decisões tomadas.
+    """
+    text: str
+    keywords: str
+    token_budget: int
+    original_tokens: int
+    removed: List[str] = field(default_factory=list)
+    segments_total: int = 0
+    segments_kept: int = 0
+    truncated: bool = False
+
+    @property
+    def prompt_tokens(self) -> int:
+        return estimate_tokens(self.text) + estimate_tokens(self.keywords)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'token_budget': self.token_budget,
+            'original_tokens': self.original_tokens,
+            'prompt_tokens': self.prompt_tokens,
+            'removed': self.removed,
+            'segments_total': self.segments_total,
+            'segments_kept': self.segments_kept,
+            'truncated': self.truncated
+        }
+
+
+def _strip_quoted_and_forwarded(lines: List[str], removed: List[str]) -> List[str]:
+    kept: List[str] = []
+    in_forward_headers = False
+    
+    for line in lines:
+        if _QUOTE_HEADER_RE.match(line):
+            # Daqui em diante é a conversa anterior, já respondida
+            removed.append('quoted_reply')
+            break
+        
+        if _FORWARD_MARKER_RE.match(line):
+            removed.append('forwarded_headers')
+            in_forward_headers = True
+            continue
+        
+        if in_forward_headers:
+            if _HEADER_LINE_RE.match(line):
+                continue
+            if line.strip():
+                in_forward_headers = False
+            else:
+                continue
+        
+        if line.lstrip().startswith('>'):
+            if 'quoted_lines' not in removed:
+                removed.append('quoted_lines')
+            continue
+        
+        kept.append(line)
+    
+    return kept
+
+
+def split_quoted_history(raw_text: str) -> Tuple[str, Optional[str]]:
+    """
+    Separa a mensagem nova da conversa citada abaixo dela (após "Em ..., Fulano escreveu:" ou
+    "-----Mensagem original-----", ou linhas com ">"). Retorna (texto novo, texto citado sem um nível
+    de ">" e sem o bloco de cabeçalhos inicial), com None se não houver citação.
+    """
+    lines = raw_text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    
+    for index, line in enumerate(lines):
+        if _QUOTE_HEADER_RE.match(line):
+            new, quoted = lines[:index], lines[index + 1:]
+            break
+    else:
+        new = [line for line in lines if not line.lstrip().startswith('>')]
+        quoted = [line for line in lines if line.lstrip().startswith('>')]
+    
+    quoted = [_QUOTE_PREFIX_RE.sub('', line, count=1) for line in quoted]
+    # Cabeçalhos da mensagem citada (estilo Outlook: De, Enviado em, Para, Assunto) não fazem parte dela
+    while quoted and (not quoted[0].strip() or _HEADER_LINE_RE.match(quoted[0]) or _SUBJECT_LINE_RE.match(quoted[0])):
+        quoted.pop(0)
+    
+    if not quoted:
+        return raw_text, None
+    return '\n'.join(new).strip(), '\n'.join(quoted).strip()
+
+
+def _is_signature_tail(tail: List[str]) -> bool:
+    """
+    Bloco depois do fecho com cara de assinatura: começa por um nome ou contato, e nenhuma linha é
+    pergunta, pedido ou frase longa ("Obrigado!\nAinda não recebi o boleto." não é assinatura).
+    """
+    if not tail or not (_NAME_LINE_RE.match(tail[0]) or _CONTACT_LINE_RE.search(tail[0])):
+        return False
+    for line in tail:
+        stripped = line.strip()
+        if len(stripped) > _SIGNATURE_MAX_LINE_CHARS or _REQUEST_LINE_RE.search(stripped):
+            return False
+        identifies = _NAME_LINE_RE.match(stripped) or _CONTACT_LINE_RE.search(stripped)
+        if not identifies and len(stripped.split()) > _SIGNATURE_MAX_LINE_WORDS:
+            return False
+    return True
+
+
+def _strip_signature(lines: List[str], removed: List[str]) -> List[str]:
+    for index, line in enumerate(lines):
+        if _SIGNATURE_DELIMITER_RE.match(line):
+            removed.append('signature')
+            return lines[:index]
+    
+    lines = [line for line in lines if not _MOBILE_SIGNATURE_RE.match(line)]
+    
+    # Fecho ("Atenciosamente,") perto do fim seguido de nome/contato: mantém o fecho, remove o bloco
+    content = [index for index, line in enumerate(lines) if line.strip()]
+    for index in reversed(content[-(_SIGNATURE_MAX_LINES + 1):]):
+        if _CLOSING_RE.match(lines[index]):
+            if _is_signature_tail([line for line in lines[index + 1:] if line.strip()]):
+                removed.append('signature')
+                return lines[:index + 1]
+            break
+    
+    return lines
+
+
+def signature_name(text: str) -> Optional[str]:
+    """
+    Nome do remetente na assinatura: a primeira linha depois do fecho ("Atenciosamente,"), se parecer
+    um nome próprio ("Carla Souza", "João da Silva"). None se não houver fecho ou a linha não for um nome.
+    """
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    content = [index for index, line in enumerate(lines) if line.strip()]
+    for position in reversed(range(max(0, len(content) - _SIGNATURE_MAX_LINES - 1), len(content))):
+        if _CLOSING_RE.match(lines[content[position]]):
+            if position + 1 < len(content):
+                match = _NAME_LINE_RE.match(lines[content[position + 1]])
+                return match.group(1) if match else None
+            return None
+    return None
+
+
+def _paragraphs(lines: List[str]) -> List[str]:
+    paragraphs: List[str] = []
+    current: List[str] = []
+    for line in lines + ['']:
+        if line.strip():
+            current.append(line.rstrip())
+        elif current:
+            paragraphs.append('\n'.join(current))
+            current = []
+    return paragraphs
+
+
+def _is_disclaimer(paragraph: str) -> bool:
+    lowered = paragraph.lower()
+    return sum(1 for marker in _DISCLAIMER_MARKERS if marker in lowered) >= 2
+
+
+def clean_email_text(raw_text: str) -> Tuple[List[str], List[str]]:
+    """
+    Remove cadeia de respostas citadas, cabeçalhos de encaminhamento, assinatura e avisos legais.
+    Retorna (parágrafos restantes, o que foi removido). Se sobrar quase nada, mantém o texto original.
+    """
+    removed: List[str] = []
+    lines = raw_text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    
+    lines = _strip_quoted_and_forwarded(lines, removed)
+    
+    # Avisos legais antes da assinatura: costumam vir depois dela e esconderiam o fim do email
+    paragraphs = []
+    for paragraph in _paragraphs(lines):
+        if _is_disclaimer(paragraph):
+            if 'disclaimer' not in removed:
+                removed.append('disclaimer')
+            continue
+        paragraphs.append(paragraph)
+    
+    lines = [line for paragraph in paragraphs for line in paragraph.split('\n') + ['']]
+    paragraphs = _paragraphs(_strip_signature(lines, removed))
+    
+    if sum(len(paragraph) for paragraph in paragraphs) < _MIN_CLEAN_CHARS:
+        return _paragraphs(raw_text.replace('\r\n', '\n').split('\n')), []
+    
+    return paragraphs, removed
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """
+    Quebra parágrafos maiores que `max_chars` em grupos de frases (e frases enormes em pedaços fixos).
+    """
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    
+    segments: List[str] = []
+    current = ''
+    for sentence in _SENTENCE_RE.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                segments.append(current)
+                current = ''
+            segments.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _segments(paragraphs: List[str], max_chars: int) -> List[str]:
+    segments: List[str] = []
+    current = ''
+    for paragraph in paragraphs:
+        for piece in _split_long(paragraph, max_chars):
+            if current and len(current) < _MIN_SEGMENT_CHARS and len(current) + 1 + len(piece) <= max_chars:
+                current = f"{current}\n{piece}"
+            else:
+                if current:
+                    segments.append(current)
+                current = piece
+    
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _density(segment: str, stems: frozenset, matcher: Optional[KeywordMatcher]) -> float:
+    """
+    Densidade de informação do trecho: palavras com stem entre as keywords do email (peso 1)
+    e palavras que casam termos de classificação (mais o peso do termo), por palavra do trecho.
+    """
+    words = _WORD_RE.findall(segment.lower())
+    if not words:
+        return 0.0
+    
+    score = 0.0
+    for word in words:
+        if any(word[:length] in stems for length in range(3, len(word) + 1)):
+            score += 1.0
+        if matcher is not None:
+            hits, _ = matcher.term_matches(word)
+            score += sum(weight for _, _, weight in hits)
+    return score / len(words)
+
+
+def _cap_keywords(nlp_keywords: str, max_tokens: int) -> Tuple[str, bool]:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(nlp_keywords) <= max_chars:
+        return nlp_keywords, False
+    return nlp_keywords[:max_chars].rsplit(' ', 1)[0], True
+
+
+def build_prompt_context(raw_text: str, nlp_keywords: str, token_budget: int,
+                         matcher: Optional[KeywordMatcher] = None) -> PromptContext:
+    """
+    Monta o texto do email para o prompt dentro de `token_budget` tokens (estimados):
+    limpa citações, encaminhamentos, assinatura e avisos legais e, se ainda exceder o orçamento,
+    mantém os trechos de maior densidade de keywords, na ordem original e marcando as lacunas.
+    O primeiro trecho (assunto/abertura) tem prioridade. token_budget <= 0 desativa a montagem.
+    """
+    original_tokens = estimate_tokens(raw_text) + estimate_tokens(nlp_keywords)
+    if token_budget <= 0:
+        return PromptContext(raw_text, nlp_keywords, token_budget, original_tokens)
+    
+    keywords, keywords_truncated = _cap_keywords(nlp_keywords, int(token_budget * KEYWORDS_BUDGET_SHARE))
+    text_budget_chars = (token_budget - estimate_tokens(keywords)) * CHARS_PER_TOKEN
+    
+    paragraphs, removed = clean_email_text(raw_text)
+    segments = _segments(paragraphs, max(1, text_budget_chars // 4))
+    context = PromptContext(
+        text='\n\n'.join(segments),
+        keywords=keywords,
+        token_budget=token_budget,
+        original_tokens=original_tokens,
+        removed=removed,
+        segments_total=len(segments),
+        segments_kept=len(segments),
+        truncated=keywords_truncated
+    )
+    
+    if len(context.text) <= text_budget_chars:
+        return context
+    
+    stems = frozenset(nlp_keywords.split())
+    ranked = sorted(
+        range(len(segments)),
+        key=lambda index: (index != 0, -_density(segments[index], stems, matcher), index)
+    )
+    
+    selected = set()
+    used = 0
+    separator = len(_GAP_MARKER) + 4
+    for index in ranked:
+        cost = len(segments[index]) + separator
+        if used + cost <= text_budget_chars:
+            selected.add(index)
+            used += cost
+    
+    parts: List[str] = []
+    previous = -1
+    for index in sorted(selected):
+        if index != previous + 1:
+            parts.append(_GAP_MARKER)
+        parts.append(segments[index])
+        previous = index
+    if previous != len(segments) - 1:
+        parts.append(_GAP_MARKER)
+    
+    context.text = '\n\n'.join(parts)
+    context.segments_kept = len(selected)
+    context.truncated = True
+    return context
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Optional
+
+from app.config import (
+    FAKE_AI_LATENCY_MS,
+    FAKE_AI_LATENCY_JITTER_MS,
+    FAKE_AI_ERROR_RATE,
+    FAKE_AI_QUOTA_ERROR_RATE,
+    FAKE_AI_SEED
+)
+
+
+# Marcadores de email improdutivo usados pela simulação para decidir a categoria
+_IMPRODUTIVO_MARKERS = ('feliz', 'natal', 'ano novo', 'parab', 'agradec', 'obrigad', 'felicit', 'comemor', 'cumpriment')
+
+# Marcadores dos prompts de classificação (o prompt de resposta não pede JSON)
+_CLASSIFY_MARKER = 'Responda EXCLUSIVAMENTE neste formato JSON'
+_CLASSIFY_BATCH_MARKER = 'Responda EXCLUSIVAMENTE com um array JSON'
+_BATCH_EMAIL_RE = re.compile(r'=== EMAIL (\d+) ===\n(.*?)(?==== EMAIL \d+ ===|\nClassificações:)', re.DOTALL)
+
+# Intervalo entre os trechos simulados de uma resposta em streaming
+_STREAM_CHUNK_DELAY_SECONDS = 0.005
+
+
+class FakeAIError(Exception):
+    """
+    Erro simulado; a mensagem segue o formato do SDK para passar pelo mesmo tratamento de erros.
+    """
+
+
+class _FakeModels:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, quota_error_rate: float,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_error_rate = quota_error_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    async def _simulate_call(self) -> None:
+        self.calls += 1
+        latency_ms = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(latency_ms / 1000)
+        
+        roll = self._random.random()
+        if roll < self.quota_error_rate:
+            raise FakeAIError("429 RESOURCE_EXHAUSTED: quota exceeded (fake)")
+        if roll < self.quota_error_rate + self.error_rate:
+            raise FakeAIError("503 UNAVAILABLE: the model is overloaded (fake)")
+
+    async def generate_content(self, model: str, contents: str, config=None):
+        await self._simulate_call()
+        
+        if _CLASSIFY_BATCH_MARKER in contents:
+            text = self._classify_batch(contents)
+        elif _CLASSIFY_MARKER in contents:
+            text = self._classify(contents)
+        else:
+            text = self._reply(config)
+        return SimpleNamespace(text=text, usage_metadata=self._usage(contents, text))
+
+    async def generate_content_stream(self, model: str, contents: str, config=None):
+        """
+        A latência simulada vale até o primeiro trecho; os demais chegam palavra a palavra.
+        """
+        await self._simulate_call()
+        text = self._reply(config)
+
+        async def chunks():
+            words = text.split(' ')
+            for index, word in enumerate(words):
+                if index:
+                    await asyncio.sleep(_STREAM_CHUNK_DELAY_SECONDS)
+                last = index == len(words) - 1
+                yield SimpleNamespace(
+                    text=word if last else f"{word} ",
+                    usage_metadata=self._usage(contents, text) if last else None
+                )
+        
+        return chunks()
+
+    @staticmethod
+    def _usage(contents: str, text: str) -> SimpleNamespace:
+        return SimpleNamespace(prompt_token_count=len(contents) // 4, candidates_token_count=len(text) // 4)
+
+    @staticmethod
+    def _classification(email: str) -> dict:
+        improdutivo = any(marker in email.lower() for marker in _IMPRODUTIVO_MARKERS)
+        return {
+            'categoria': 'Improdutivo' if improdutivo else 'Produtivo',
+            'razao': 'Mensagem de cortesia, sem ação necessária' if improdutivo
+            else 'Email solicita uma ação ou resposta da equipe',
+            'sugestao_resposta': None if improdutivo
+            else 'Prezado(a), recebemos sua mensagem e retornaremos em breve. Atenciosamente, Equipe de Atendimento.'
+        }
+
+    @classmethod
+    def _classify(cls, contents: str) -> str:
+        # Só o trecho do email: as instruções do prompt citam exemplos das duas categorias
+        result = cls._classification(contents.split('Classificações:')[0])
+        if '"sugestao_resposta"' not in contents:
+            del result['sugestao_resposta']
+        return json.dumps(result, ensure_ascii=False)
+
+    @classmethod
+    def _classify_batch(cls, contents: str) -> str:
+        return json.dumps([
+            {'id': int(email_id), **cls._classification(email)}
+            for email_id, email in _BATCH_EMAIL_RE.findall(contents)
+        ], ensure_ascii=False)
+
+    @staticmethod
+    def _reply(config) -> str:
+        reply = 'Prezado(a), recebemos sua solicitação e nossa equipe retornará em breve. Atenciosamente, Equipe de Atendimento.'
+        max_output_tokens = getattr(config, 'max_output_tokens', None)
+        return reply[:max_output_tokens * 4] if max_output_tokens else reply
+
+
+class FakeGeminiClient:
+    """
+    Substituto local do genai.Client (AI_BACKEND=fake): mesma interface usada pelo ai_handler,
+    com latência, taxa de erros e erros de cota configuráveis. Para testes de carga sem custo nem rate limit.
+    """
+
+    def __init__(self, latency_ms: float = FAKE_AI_LATENCY_MS, jitter_ms: float = FAKE_AI_LATENCY_JITTER_MS,
+                 error_rate: float = FAKE_AI_ERROR_RATE, quota_error_rate: float = FAKE_AI_QUOTA_ERROR_RATE,
+                 seed: Optional[int] = FAKE_AI_SEED):
+        self.aio = SimpleNamespace(models=_FakeModels(latency_ms, jitter_ms, error_rate, quota_error_rate, seed))
@@ -1,14 +1,49 @@
 import io
+import os
+from typing import BinaryIO, Iterator, Union
 from fastapi import UploadFile
 
+from app.config import PDF_MAX_PAGES, PDF_MAX_CHARS
+from app.utils.concurrency import run_cpu_bound
 from app.utils.exceptions import InvalidFileException
-from app.utils.validators import validate_file
+from app.utils.metrics import stage_timer
+from app.utils.validators import MAX_FILE_SIZE, validate_file, validate_filename
 
 
 async def read_file(file: UploadFile) -> str:
+    with stage_timer('read_file'):
+        return await _read_upload(file)
+
+
+async def _read_upload(file: UploadFile) -> str:
     validate_file(file)
     
-    content = await file.read()
+    # Tamanho pelo arquivo temporário do upload, sem carregá-lo em memória
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    
+    if size == 0:
+        raise InvalidFileException("Arquivo está vazio")
+    
+    if size > MAX_FILE_SIZE:
+        raise InvalidFileException("Arquivo excede o tamanho máximo de 10MB")
+    
+    file_extension = file.filename.lower().split('.')[-1]
+    
+    if file_extension == 'pdf':
+        # O worker recebe os bytes, nunca o arquivo do upload: a tarefa pode continuar rodando depois
+        # de um timeout, quando a requisição já terminou e fechou o arquivo temporário
+        return await run_cpu_bound(_read_pdf, await file.read())
+    
+    return read_content(file.filename, await file.read())
+
+
+def read_content(filename: str, content: bytes) -> str:
+    """
+    Extrai o texto de um arquivo já carregado em memória (upload, entrada de zip, etc.).
+    """
+    validate_filename(filename)
     
     if len(content) == 0:
         raise InvalidFileException("Arquivo está vazio")
@@ -16,7 +51,7 @@ async def read_file(file: UploadFile) -> str:
     if len(content) > 10 * 1024 * 1024:
         raise InvalidFileException("Arquivo excede o tamanho máximo de 10MB")
     
-    file_extension = file.filename.lower().split('.')[-1] if file.filename else ''
+    file_extension = filename.lower().split('.')[-1]
     
     try:
         if file_extension == 'pdf':
@@ -31,16 +66,39 @@ async def read_file(file: UploadFile) -> str:
         raise InvalidFileException(f"Erro ao ler arquivo: {str(e)}")
 
 
-def _read_pdf(content: bytes) -> str:
+def _iter_pdf_pages(source: BinaryIO, max_pages: int) -> Iterator[str]:
+    from pypdf import PdfReader
+    
+    reader = PdfReader(source)
+    for page_number, page in enumerate(reader.pages):
+        if max_pages and page_number >= max_pages:
+            return
+        yield page.extract_text() or ""
+
+
+def _read_pdf(
+    content: Union[bytes, BinaryIO],
+    max_pages: int = PDF_MAX_PAGES,
+    max_chars: int = PDF_MAX_CHARS
+) -> str:
+    """
+    Extrai o texto página a página, parando ao atingir max_pages ou max_chars (0 = sem limite).
+    O classificador só precisa do início do documento.
+    """
     try:
-        from pypdf import PdfReader
+        source = io.BytesIO(content) if isinstance(content, bytes) else content
         
-        pdf_file = io.BytesIO(content)
-        reader = PdfReader(pdf_file)
+        pages = []
+        total_chars = 0
+        for page_text in _iter_pdf_pages(source, max_pages):
+            pages.append(page_text)
+            total_chars += len(page_text) + 1
+            if max_chars and total_chars >= max_chars:
+                break
         
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
+        text = "\n".join(pages)
+        if max_chars:
+            text = text[:max_chars]
         
         if not text.strip():
             raise InvalidFileException("Arquivo PDF não contém texto legível")
@@ -0,0 +1,297 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.config import BATCH_CONCURRENCY
+from app.services.mailbox_reader import MailboxMessage, iter_messages, read_message
+from app.services.pipeline import classify_content
+from app.utils.concurrency import run_cpu_bound
+from app.utils.exceptions import EmailClassifierException, InvalidFileException, error_code_for
+from app.utils.logger import logger
+from app.utils.metrics import stage_timer
+from app.utils.validators import validate_text
+
+
+OUTPUT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+# Colunas da saída (iguais nos três formatos)
+OUTPUT_FIELDS = (
+    'source', 'status', 'category', 'confidence_score', 'classification_method', 'summary', 'reason',
+    'suggested_response', 'subject', 'message_id', 'sender', 'date', 'attachments', 'error_code', 'error_message'
+)
+
+CHECKPOINT_VERSION = 1
+
+
+class _JsonlWriter:
+    """
+    Uma linha por mensagem. O estado é o tamanho do arquivo: ao retomar, o que veio depois
+    do último checkpoint é truncado (e reprocessado), então nenhuma linha sai duplicada.
+    """
+
+    def __init__(self, path: str, state: Optional[Dict[str, Any]]):
+        if state and (not os.path.exists(path) or os.path.getsize(path) < state['bytes']):
+            raise InvalidFileException(f"Saída {path} não corresponde ao checkpoint (apagada ou truncada); use --restart")
+        
+        self.path = path
+        self._file = open(path, 'ab' if state else 'wb')
+        if state:
+            self._file.truncate(state['bytes'])
+            self._file.seek(state['bytes'])
+
+    def _encode(self, row: Dict[str, Any]) -> bytes:
+        return (json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8')
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._file.write(self._encode(row))
+
+    def flush(self) -> Dict[str, Any]:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return {'bytes': self._file.tell()}
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _CsvWriter(_JsonlWriter):
+
+    def __init__(self, path: str, state: Optional[Dict[str, Any]]):
+        super().__init__(path, state)
+        if not state:
+            self._file.write(self._encode(dict(zip(OUTPUT_FIELDS, OUTPUT_FIELDS))))
+
+    def _encode(self, row: Dict[str, Any]) -> bytes:
+        buffer = io.StringIO()
+        values = dict(row, attachments='; '.join(row.get('attachments') or []))
+        csv.DictWriter(buffer, fieldnames=OUTPUT_FIELDS, extrasaction='ignore').writerow(values)
+        return buffer.getvalue().encode('utf-8')
+
+
+class _ParquetWriter:
+    """
+    Parquet não aceita anexar a um arquivo fechado: a saída é um diretório de partes
+    (part-00000.parquet, ...), uma por checkpoint. Requer o pacote `pyarrow`.
+    """
+
+    def __init__(self, path: str, state: Optional[Dict[str, Any]]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise InvalidFileException("Saída parquet requer o pacote pyarrow (pip install pyarrow)")
+        
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        # Esquema fixo: partes só com nulos numa coluna não podem divergir das demais
+        self._schema = pyarrow.schema([
+            (field, pyarrow.float64() if field == 'confidence_score'
+             else pyarrow.list_(pyarrow.string()) if field == 'attachments' else pyarrow.string())
+            for field in OUTPUT_FIELDS
+        ])
+        self.path = path
+        self.parts = state['parts'] if state else 0
+        self._rows: List[Dict[str, Any]] = []
+        
+        os.makedirs(path, exist_ok=True)
+        # Partes escritas depois do último checkpoint serão refeitas
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+
+    def flush(self) -> Dict[str, Any]:
+        if self._rows:
+            part_path = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+            self._pq.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema), part_path)
+            self.parts += 1
+            self._rows = []
+        return {'parts': self.parts}
+
+    def close(self) -> None:
+        self.flush()
+
+
+_WRITERS = {'jsonl': _JsonlWriter, 'csv': _CsvWriter, 'parquet': _ParquetWriter}
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    # Escrita atômica: um crash no meio deixa o checkpoint anterior intacto
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(checkpoint, file, ensure_ascii=False, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def _iter_sources(sources: List[str], source_index: int, position: int) -> Iterator[Tuple[int, MailboxMessage]]:
+    for index in range(source_index, len(sources)):
+        for message in iter_messages(sources[index], position if index == source_index else 0):
+            yield index, message
+
+
+def _row(message: MailboxMessage, parsed: Optional[Dict[str, Any]], data: Optional[Dict[str, Any]],
+         error: Optional[Exception]) -> Dict[str, Any]:
+    parsed = parsed or {}
+    data = data or {}
+    return {
+        'source': message.source,
+        'status': 'error' if error else 'success',
+        'category': data.get('category'),
+        'confidence_score': data.get('confidence_score'),
+        'classification_method': (data.get('processing_details') or {}).get('classification_method'),
+        'summary': data.get('summary'),
+        'reason': data.get('reason'),
+        'suggested_response': data.get('suggested_response'),
+        'subject': parsed.get('subject'),
+        'message_id': parsed.get('message_id'),
+        'sender': parsed.get('sender'),
+        'date': parsed.get('date'),
+        'attachments': parsed.get('attachments') or [],
+        'error_code': error_code_for(error) if error else None,
+        'error_message': str(error) if error else None
+    }
+
+
+async def _classify_message(message: MailboxMessage, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    async with semaphore:
+        parsed = None
+        try:
+            if message.error:
+                raise message.error
+            
+            with stage_timer('read_file'):
+                parsed = await run_cpu_bound(read_message, message)
+            # O conteúdo bruto não é mais necessário (a tarefa fica na janela até ser escrita)
+            message.content = None
+            
+            validate_text(parsed['text'])
+            data = await classify_content(parsed['text'], message.filename, message_id=parsed['message_id'],
+                                          in_reply_to=parsed['in_reply_to'])
+            return _row(message, parsed, data, None)
+        
+        except Exception as e:
+            if not isinstance(e, EmailClassifierException):
+                logger.error(f"Erro inesperado na mensagem {message.source}: {str(e)}", exc_info=True)
+            return _row(message, parsed, None, e)
+
+
+async def ingest(
+    sources: List[str],
+    output: str,
+    output_format: str,
+    checkpoint_path: str,
+    concurrency: int = BATCH_CONCURRENCY,
+    checkpoint_every: int = 500,
+    resume: bool = True,
+    limit: Optional[int] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Classifica as mensagens das fontes, na ordem, gravando uma linha por mensagem em `output`.
+    
+    Até `concurrency` mensagens são classificadas ao mesmo tempo, numa janela limitada: os resultados
+    são gravados na ordem de leitura e a memória não cresce com o tamanho da caixa.
+    A cada `checkpoint_every` linhas, a saída é sincronizada em disco e a posição da última mensagem
+    gravada (fonte + offset no mbox ou índice no diretório) vai para o checkpoint; com `resume`, uma
+    nova execução continua dali. Retorna o checkpoint final.
+    """
+    sources = [os.path.abspath(source) for source in sources]
+    for source in sources:
+        if not os.path.exists(source):
+            raise InvalidFileException(f"Fonte não encontrada: {source}")
+    
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    
+    if checkpoint:
+        if checkpoint.get('sources') != sources or checkpoint.get('format') != output_format:
+            raise InvalidFileException(
+                f"Checkpoint {checkpoint_path} é de outra execução (fontes ou formato diferentes); use --restart"
+            )
+        logger.info(f"Retomando a partir de {checkpoint['written']} mensagens já gravadas")
+    else:
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'sources': sources,
+            'format': output_format,
+            'output': os.path.abspath(output),
+            'source_index': 0,
+            'position': 0,
+            'written': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'output_state': None,
+            'completed': False
+        }
+    
+    writer = _WRITERS[output_format](output, checkpoint['output_state'])
+    messages = _iter_sources(sources, checkpoint['source_index'], checkpoint['position'])
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    window: Deque[Tuple[int, MailboxMessage, asyncio.Task]] = deque()
+    state = dict(checkpoint)
+    processed = 0
+    started = time.monotonic()
+
+    def save() -> None:
+        state['output_state'] = writer.flush()
+        state['updated_at'] = time.time()
+        _save_checkpoint(checkpoint_path, state)
+        if progress:
+            elapsed = time.monotonic() - started
+            progress(dict(state, processed=processed, rate=round(processed / elapsed, 2) if elapsed else None))
+
+    async def write_oldest() -> None:
+        nonlocal processed
+        source_index, message, task = window.popleft()
+        row = await task
+        writer.write(row)
+        
+        processed += 1
+        state['written'] += 1
+        state['succeeded' if row['status'] == 'success' else 'failed'] += 1
+        state['source_index'] = source_index
+        state['position'] = message.position
+        if processed % max(1, checkpoint_every) == 0:
+            save()
+    
+    try:
+        while limit is None or processed + len(window) < limit:
+            # A leitura do disco sai do event loop; a janela de 2x a concorrência mantém o pool ocupado
+            next_message = await asyncio.to_thread(next, messages, None)
+            if next_message is None:
+                break
+            
+            source_index, message = next_message
+            window.append((source_index, message, asyncio.create_task(_classify_message(message, semaphore))))
+            if len(window) >= max(1, concurrency) * 2:
+                await write_oldest()
+        
+        while window:
+            await write_oldest()
+        
+        state['completed'] = limit is None or processed < limit
+    finally:
+        # Interrompido (Ctrl+C, erro): o que já foi gravado em ordem entra no checkpoint; o resto é refeito
+        for _, _, task in window:
+            task.cancel()
+        save()
+        writer.close()
+    
+    logger.info(f"Ingestão: {processed} mensagens processadas, {state['written']} no total em {output}")
+    return state
@@ -0,0 +1,281 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import (
+    JOB_QUEUE_PATH,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BASE_SECONDS,
+    JOB_LEASE_SECONDS,
+    JOB_RESULT_TTL_SECONDS
+)
+from app.utils.logger import logger
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+DEAD_LETTER = 'dead_letter'
+
+STATUSES = (QUEUED, RUNNING, SUCCEEDED, DEAD_LETTER)
+
+# (nome do arquivo, conteúdo, texto): uploads têm filename/content, textos diretos só text
+JobInput = Tuple[Optional[str], Optional[bytes], Optional[str]]
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS jobs ('
+    'id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, '
+    'attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, inputs INTEGER NOT NULL, '
+    'webhook_url TEXT, webhook_status TEXT, worker TEXT, result TEXT, error TEXT, '
+    'created_at REAL NOT NULL, updated_at REAL NOT NULL, available_at REAL NOT NULL, lease_expires_at REAL)',
+    'CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)',
+    'CREATE TABLE IF NOT EXISTS job_inputs ('
+    'job_id TEXT NOT NULL, position INTEGER NOT NULL, filename TEXT, content BLOB, text TEXT, '
+    'PRIMARY KEY (job_id, position))'
+)
+
+
+class JobQueue:
+    """
+    Fila persistente de jobs em SQLite, compartilhada pela API (que enfileira) e pelos workers
+    (que consomem), inclusive em processos diferentes.
+    
+    - Prioridade: maior primeiro; empate pela ordem de chegada.
+    - Lease: um job em execução cujo worker parou de renovar o lease volta a ser elegível.
+    - Retentativas com backoff exponencial; esgotadas (ou erro permanente), o job vai para dead_letter
+      com as entradas preservadas, e pode ser reenfileirado com requeue().
+    """
+
+    def __init__(self, path: str, max_attempts: int = JOB_MAX_ATTEMPTS, retry_base_seconds: float = JOB_RETRY_BASE_SECONDS,
+                 lease_seconds: float = JOB_LEASE_SECONDS):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # isolation_level=None: transações explícitas (BEGIN IMMEDIATE) para o claim atômico entre processos
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def _transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def submit(self, inputs: List[JobInput], priority: int = 0, webhook_url: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, priority, max_attempts, inputs, webhook_url, created_at, updated_at, available_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, QUEUED, priority, self.max_attempts, len(inputs), webhook_url, now, now, now)
+            )
+            conn.executemany(
+                'INSERT INTO job_inputs (job_id, position, filename, content, text) VALUES (?, ?, ?, ?, ?)',
+                [(job_id, position, filename, content, text) for position, (filename, content, text) in enumerate(inputs)]
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserva o próximo job elegível para o worker: na fila e disponível, ou em execução com lease vencido.
+        Jobs de lease vencido que já esgotaram as tentativas vão para dead_letter.
+        """
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                row = conn.execute(
+                    'SELECT id, attempts, max_attempts, status FROM jobs '
+                    'WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ?) '
+                    'ORDER BY priority DESC, created_at LIMIT 1',
+                    (QUEUED, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                
+                job_id, attempts, max_attempts, status = row
+                if status == RUNNING and attempts >= max_attempts:
+                    error = {'error_code': 'WORKER_LOST', 'message': 'Worker interrompido durante o processamento'}
+                    conn.execute(
+                        'UPDATE jobs SET status = ?, error = ?, worker = NULL, updated_at = ? WHERE id = ?',
+                        (DEAD_LETTER, json.dumps(error), now, job_id)
+                    )
+                    logger.warning(f"Job {job_id} movido para dead_letter: worker perdido na última tentativa")
+                    continue
+                
+                conn.execute(
+                    'UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, lease_expires_at = ?, updated_at = ? '
+                    'WHERE id = ?',
+                    (RUNNING, worker, now + self.lease_seconds, now, job_id)
+                )
+            return self.get(job_id)
+
+    def inputs(self, job_id: str) -> List[JobInput]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT filename, content, text FROM job_inputs WHERE job_id = ? ORDER BY position', (job_id,)
+            ).fetchall()
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """
+        Renova o lease; False se o job não pertence mais a este worker.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = ? AND worker = ?',
+                (now + self.lease_seconds, now, job_id, RUNNING, worker)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = NULL, worker = NULL, lease_expires_at = NULL, updated_at = ? '
+                'WHERE id = ? AND status = ? AND worker = ?',
+                (SUCCEEDED, json.dumps(result, ensure_ascii=False), now, job_id, RUNNING, worker)
+            )
+            if cursor.rowcount != 1:
+                return False
+            # Entradas só servem para reprocessar; resultado salvo, liberar o espaço
+            conn.execute('DELETE FROM job_inputs WHERE job_id = ?', (job_id,))
+        return True
+
+    def fail(self, job_id: str, worker: str, error: Dict[str, str], retryable: bool = True) -> Optional[str]:
+        """
+        Registra a falha da tentativa: reagenda com backoff ou move para dead_letter.
+        Retorna o novo status (None se o job não pertence mais ao worker).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND worker = ?',
+                (job_id, RUNNING, worker)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            attempts, max_attempts = row
+            if retryable and attempts < max_attempts:
+                status = QUEUED
+                available_at = now + self.retry_base_seconds * (2 ** (attempts - 1))
+            else:
+                status = DEAD_LETTER
+                available_at = now
+            
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, worker = NULL, lease_expires_at = NULL, available_at = ?, updated_at = ? '
+                'WHERE id = ?',
+                (status, json.dumps(error, ensure_ascii=False), available_at, now, job_id)
+            )
+        return status
+
+    def requeue(self, job_id: str) -> bool:
+        """
+        Devolve um job de dead_letter à fila, com as tentativas zeradas.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET status = ?, attempts = 0, error = NULL, webhook_status = NULL, available_at = ?, updated_at = ? '
+                'WHERE id = ? AND status = ?',
+                (QUEUED, now, now, job_id, DEAD_LETTER)
+            )
+        return cursor.rowcount == 1
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET webhook_status = ? WHERE id = ?', (webhook_status, job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, status, priority, attempts, max_attempts, inputs, webhook_url, webhook_status, '
+                'result, error, created_at, updated_at, available_at FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        (job_id, status, priority, attempts, max_attempts, inputs, webhook_url, webhook_status,
+         result, error, created_at, updated_at, available_at) = row
+        return {
+            'job_id': job_id,
+            'status': status,
+            'priority': priority,
+            'attempts': attempts,
+            'max_attempts': max_attempts,
+            'inputs': inputs,
+            'webhook_url': webhook_url,
+            'webhook_status': webhook_status,
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'next_attempt_at': available_at if status == QUEUED and attempts else None,
+            'result': json.loads(result) if result else None,
+            'error': json.loads(error) if error else None
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in STATUSES}
+
+    def purge(self, ttl_seconds: float = JOB_RESULT_TTL_SECONDS) -> int:
+        """
+        Remove jobs concluídos (e os de dead_letter) mais antigos que `ttl_seconds`.
+        """
+        cutoff = time.time() - ttl_seconds
+        with self._transaction() as conn:
+            conn.execute(
+                'DELETE FROM job_inputs WHERE job_id IN (SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?)',
+                (SUCCEEDED, DEAD_LETTER, cutoff)
+            )
+            cursor = conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?', (SUCCEEDED, DEAD_LETTER, cutoff)
+            )
+        return cursor.rowcount
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._conn.execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            self._conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self._lock.release()
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(JOB_QUEUE_PATH)
+    return _job_queue
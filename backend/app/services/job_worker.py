@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import socket
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    JOB_WORKERS,
+    JOB_WORKER_NICE,
+    JOB_POLL_INTERVAL,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ITEMS,
+    JOB_MAX_UPLOAD_SIZE_MB,
+    JOB_WEBHOOK_TIMEOUT,
+    JOB_WEBHOOK_MAX_ATTEMPTS,
+    JOB_WEBHOOK_SECRET,
+    NEAR_DUPLICATE_SAVE_INTERVAL,
+    REPLY_LIBRARY_SAVE_INTERVAL
+)
+from app.services.batch_processor import BatchItem, expand_upload, process_batch
+from app.services.job_queue import DEAD_LETTER, SUCCEEDED, JobQueue, get_job_queue
+from app.services.near_duplicate import save_near_duplicate_index
+from app.services.reply_library import save_reply_library
+from app.utils.concurrency import run_cpu_bound, save_periodically, shutdown_executors, warm_up_cpu_executor
+from app.utils.exceptions import InvalidFileException, InvalidTextException, error_code_for
+from app.utils.logger import logger
+from app.utils.metrics import record_job
+from app.utils.webhook import post_webhook
+
+
+# Erros de entrada não mudam ao repetir: vão direto para dead_letter
+_PERMANENT_ERRORS = (InvalidFileException, InvalidTextException)
+
+# Limpeza de jobs antigos a cada N ciclos ociosos
+_PURGE_EVERY_IDLE_POLLS = 600
+
+
+async def _expand_inputs(queue: JobQueue, job_id: str) -> List[BatchItem]:
+    items: List[BatchItem] = []
+    for index, (filename, content, text) in enumerate(await asyncio.to_thread(queue.inputs, job_id)):
+        if content is not None:
+            items.extend(await run_cpu_bound(
+                expand_upload, filename, content, JOB_MAX_UPLOAD_SIZE_MB, JOB_MAX_ITEMS - len(items)
+            ))
+        else:
+            items.append(BatchItem(source=f"texts[{index}]", text=text))
+    return items
+
+
+async def _keep_lease(queue: JobQueue, job_id: str, worker: str) -> None:
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        if not await asyncio.to_thread(queue.heartbeat, job_id, worker):
+            logger.warning(f"Job {job_id} não pertence mais ao worker {worker}")
+            return
+
+
+def _post_webhook(url: str, body: bytes) -> int:
+    headers = {'Content-Type': 'application/json', 'User-Agent': 'email-classifier-jobs'}
+    if JOB_WEBHOOK_SECRET:
+        signature = hmac.new(JOB_WEBHOOK_SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        headers['X-Signature-SHA256'] = signature
+    
+    return post_webhook(url, body, headers, timeout=JOB_WEBHOOK_TIMEOUT)
+
+
+async def deliver_webhook(queue: JobQueue, job: Dict[str, Any]) -> bool:
+    """
+    Envia o job finalizado (status, resultado ou erro) ao webhook_url, com retentativas e backoff.
+    Com JOB_WEBHOOK_SECRET, o corpo vai assinado em X-Signature-SHA256 (HMAC-SHA256 em hex).
+    """
+    payload = {key: job[key] for key in ('job_id', 'status', 'attempts', 'result', 'error')}
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    
+    for attempt in range(1, JOB_WEBHOOK_MAX_ATTEMPTS + 1):
+        try:
+            await asyncio.to_thread(_post_webhook, job['webhook_url'], body)
+        except Exception as e:
+            logger.warning(f"Webhook do job {job['job_id']} falhou (tentativa {attempt}): {str(e)}")
+            if attempt < JOB_WEBHOOK_MAX_ATTEMPTS:
+                await asyncio.sleep(2 ** (attempt - 1))
+            continue
+        
+        await asyncio.to_thread(queue.set_webhook_status, job['job_id'], 'delivered')
+        record_job('webhook_delivered')
+        return True
+    
+    await asyncio.to_thread(queue.set_webhook_status, job['job_id'], 'failed')
+    record_job('webhook_failed')
+    return False
+
+
+async def run_job(queue: JobQueue, job: Dict[str, Any], worker: str) -> Optional[str]:
+    """
+    Executa o pipeline de lote sobre as entradas do job e registra o resultado ou a falha.
+    Retorna o status final da tentativa.
+    """
+    job_id = job['job_id']
+    lease = asyncio.create_task(_keep_lease(queue, job_id, worker))
+    try:
+        items = await _expand_inputs(queue, job_id)
+        result = await process_batch(items, max_items=JOB_MAX_ITEMS)
+    except Exception as e:
+        permanent = isinstance(e, _PERMANENT_ERRORS)
+        if not permanent:
+            logger.error(f"Job {job_id} falhou na tentativa {job['attempts']}: {str(e)}", exc_info=True)
+        
+        error = {'error_code': error_code_for(e), 'message': str(e)}
+        status = await asyncio.to_thread(queue.fail, job_id, worker, error, not permanent)
+        if status:
+            record_job(DEAD_LETTER if status == DEAD_LETTER else 'retried')
+    else:
+        completed = await asyncio.to_thread(queue.complete, job_id, worker, result)
+        status = SUCCEEDED if completed else None
+        if completed:
+            record_job(SUCCEEDED)
+            logger.info(f"Job {job_id} concluído: {result['succeeded']}/{result['total']} itens com sucesso")
+    finally:
+        lease.cancel()
+    
+    if status in (SUCCEEDED, DEAD_LETTER) and job.get('webhook_url'):
+        await deliver_webhook(queue, await asyncio.to_thread(queue.get, job_id))
+    
+    return status
+
+
+async def run_worker(worker: str, stop_event=None) -> None:
+    """
+    Consome a fila até `stop_event` (multiprocessing.Event) ser sinalizado, um job por vez.
+    O índice de quase-duplicatas e a biblioteca de respostas aprendidos nos jobs são salvos como na API:
+    periodicamente e ao encerrar.
+    """
+    queue = get_job_queue()
+    await warm_up_cpu_executor()
+    logger.info(f"Worker de jobs {worker} iniciado")
+    savers = [
+        asyncio.create_task(save_periodically(NEAR_DUPLICATE_SAVE_INTERVAL, save_near_duplicate_index)),
+        asyncio.create_task(save_periodically(REPLY_LIBRARY_SAVE_INTERVAL, save_reply_library))
+    ]
+    
+    idle_polls = 0
+    try:
+        while stop_event is None or not stop_event.is_set():
+            job = await asyncio.to_thread(queue.claim, worker)
+            if job is None:
+                idle_polls += 1
+                if idle_polls % _PURGE_EVERY_IDLE_POLLS == 1:
+                    await asyncio.to_thread(queue.purge)
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            
+            idle_polls = 0
+            logger.info(f"Worker {worker} executando job {job['job_id']} (tentativa {job['attempts']}, prioridade {job['priority']})")
+            await run_job(queue, job, worker)
+    finally:
+        for saver in savers:
+            saver.cancel()
+        save_near_duplicate_index()
+        save_reply_library()
+    
+    shutdown_executors()
+    logger.info(f"Worker de jobs {worker} encerrado")
+
+
+def _worker_main(worker: str, stop_event) -> None:
+    # Prioridade menor no SO: o processamento em segundo plano não disputa CPU com as requisições interativas
+    if JOB_WORKER_NICE:
+        try:
+            os.nice(JOB_WORKER_NICE)
+        except (AttributeError, OSError):
+            pass
+    
+    try:
+        asyncio.run(run_worker(worker, stop_event))
+    except KeyboardInterrupt:
+        pass
+
+
+class JobWorkerPool:
+    """
+    Processos worker iniciados junto com a API (JOB_WORKERS > 0). Cada worker do uvicorn inicia o próprio
+    pool; com vários workers, prefira JOB_WORKERS=0 e `python -m app.worker` à parte.
+    Jobs interrompidos no encerramento voltam à fila quando o lease vence.
+    """
+
+    def __init__(self, size: int = JOB_WORKERS):
+        self.size = size
+        self._context = multiprocessing.get_context('spawn')
+        self._stop_event = self._context.Event()
+        self._processes: List[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for index in range(self.size):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(f"{prefix}:{index}", self._stop_event),
+                name=f"job-worker-{index}"
+            )
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop_event.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+
+
+def main() -> None:
+    """
+    Worker avulso, fora da API (ex.: com JOB_WORKERS=0 na API): python -m app.worker
+    """
+    _worker_main(f"{socket.gethostname()}:{os.getpid()}", None)
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils.logger import logger
+
+
+CATEGORIES = ('produtivo', 'improdutivo')
+
+# (categoria, termo, peso)
+TermHit = Tuple[str, str, float]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'terminals')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.terminals: List[TermHit] = []
+
+
+class KeywordMatches:
+    """
+    Termos encontrados em um email, por categoria, com seus pesos.
+    """
+    __slots__ = ('produtivo', 'improdutivo', 'total_keywords')
+
+    def __init__(self, produtivo: Dict[str, float], improdutivo: Dict[str, float], total_keywords: int):
+        self.produtivo = produtivo
+        self.improdutivo = improdutivo
+        self.total_keywords = total_keywords
+
+    @property
+    def produtivo_score(self) -> int:
+        return len(self.produtivo)
+
+    @property
+    def improdutivo_score(self) -> int:
+        return len(self.improdutivo)
+
+    @property
+    def produtivo_weight(self) -> float:
+        return sum(self.produtivo.values())
+
+    @property
+    def improdutivo_weight(self) -> float:
+        return sum(self.improdutivo.values())
+
+
+def _best_per_category(hits: List[TermHit]) -> List[TermHit]:
+    """
+    Um termo por categoria para cada stem: o de maior peso (no empate, o mais longo). Termos que são
+    prefixo um do outro ('obrigad' e 'obrigado') não somam duas vezes a mesma palavra.
+    """
+    best: Dict[str, TermHit] = {}
+    for hit in hits:
+        current = best.get(hit[0])
+        if current is None or (hit[2], len(hit[1])) > (current[2], len(current[1])):
+            best[hit[0]] = hit
+    return list(best.values())
+
+
+class KeywordMatcher:
+    """
+    Trie de prefixos sobre o fluxo de stems, compilada uma vez.
+    
+    Cada termo casa quando é prefixo de um stem ('fatur' casa 'faturament'). Termos com várias
+    palavras ('ano nov') casam com stems consecutivos, cada palavra como prefixo. Tudo em uma
+    única passada pelos stems do email. Cada stem conta no máximo um termo por categoria.
+    """
+
+    def __init__(self, entries: Dict[str, Dict[str, float]]):
+        self.entries = entries
+        self.has_phrases = False
+        self._root = _TrieNode()
+        
+        for category, terms in entries.items():
+            for term, weight in terms.items():
+                tokens = term.lower().split()
+                if not tokens:
+                    continue
+                
+                node = self._root
+                for position, token in enumerate(tokens):
+                    if position:
+                        node = node.children.setdefault(' ', _TrieNode())
+                    for char in token:
+                        node = node.children.setdefault(char, _TrieNode())
+                node.terminals.append((category, term, weight))
+                
+                if len(tokens) > 1:
+                    self.has_phrases = True
+
+    def _walk(self, start: _TrieNode, stem: str, hits: List[TermHit], continuations: List[_TrieNode]) -> None:
+        node = start
+        for char in stem:
+            node = node.children.get(char)
+            if node is None:
+                return
+            
+            hits.extend(node.terminals)
+            # Fim de uma palavra de frase: a próxima palavra continua no stem seguinte
+            separator = node.children.get(' ')
+            if separator is not None:
+                continuations.append(separator)
+
+    def match(self, stems: Sequence[str]) -> KeywordMatches:
+        found: Dict[str, Dict[str, float]] = {category: {} for category in CATEGORIES}
+        pending: List[_TrieNode] = []
+        
+        for stem in stems:
+            hits: List[TermHit] = []
+            continuations: List[_TrieNode] = []
+            for start in [self._root] + pending:
+                self._walk(start, stem, hits, continuations)
+            
+            for category, term, weight in _best_per_category(hits):
+                found[category][term] = weight
+            pending = continuations
+        
+        return KeywordMatches(found['produtivo'], found['improdutivo'], len(set(stems)))
+
+    def term_matches(self, stem: str) -> Tuple[List[TermHit], bool]:
+        """
+        Termos de uma palavra que casam com o stem isolado e se o stem pode iniciar uma frase.
+        Usado pelo caminho em lote para montar a matriz stem x termo.
+        """
+        hits: List[TermHit] = []
+        continuations: List[_TrieNode] = []
+        self._walk(self._root, stem, hits, continuations)
+        return _best_per_category(hits), bool(continuations)
+
+
+def _parse_terms(terms) -> Dict[str, float]:
+    if isinstance(terms, (list, tuple, set, frozenset)):
+        terms = {term: 1.0 for term in terms}
+    
+    parsed = {}
+    for term, weight in terms.items():
+        weight = float(weight)
+        if weight <= 0:
+            raise ValueError(f"Peso deve ser positivo: '{term}'")
+        parsed[str(term).strip().lower()] = weight
+    return parsed
+
+
+def build_entries(produtivo: Iterable[str], improdutivo: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    return {'produtivo': _parse_terms(list(produtivo)), 'improdutivo': _parse_terms(list(improdutivo))}
+
+
+def load_keyword_config(path: str) -> Dict[str, Dict[str, float]]:
+    """
+    Lê um JSON no formato {"produtivo": {"termo": peso, ...} | ["termo", ...], "improdutivo": ...}.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    
+    return {category: _parse_terms(data.get(category, {})) for category in CATEGORIES}
+
+
+class ReloadableKeywordMatcher:
+    """
+    Mantém o KeywordMatcher atual e o recompila quando o arquivo de configuração muda (sem reiniciar a API).
+    Sem arquivo, ou com arquivo inválido, usa os termos padrão / a última versão válida.
+    """
+
+    def __init__(self, default_entries: Dict[str, Dict[str, float]], config_path: Optional[str] = None,
+                 check_interval: float = 5.0):
+        self.config_path = config_path
+        self.check_interval = check_interval
+        self.version = 0
+        self._default_matcher = KeywordMatcher(default_entries)
+        self._matcher = self._default_matcher
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> KeywordMatcher:
+        if self.config_path and time.monotonic() >= self._next_check:
+            with self._lock:
+                if time.monotonic() >= self._next_check:
+                    self._next_check = time.monotonic() + self.check_interval
+                    self._reload_if_changed()
+        return self._matcher
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            mtime = None
+        
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        
+        if mtime is None:
+            logger.warning(f"Arquivo de keywords não encontrado ({self.config_path}), usando termos padrão")
+            self._matcher = self._default_matcher
+            self.version += 1
+            return
+        
+        try:
+            self._matcher = KeywordMatcher(load_keyword_config(self.config_path))
+            self.version += 1
+            logger.info(f"Keywords recarregadas de {self.config_path} (versão {self.version})")
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.error(f"Configuração de keywords inválida em {self.config_path}, mantendo a anterior: {str(e)}")
@@ -0,0 +1,191 @@
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    LOCAL_MODEL_PATH,
+    LOCAL_MODEL_MIN_STEMS,
+    LOCAL_MODEL_RELOAD_INTERVAL,
+    AI_DECISION_LOG_PATH
+)
+from app.utils.logger import logger
+from app.utils.text import content_hash
+
+
+MODEL_VERSION = 1
+
+CATEGORIES = ('Produtivo', 'Improdutivo')
+
+
+@dataclass
+class LocalPrediction:
+    category: str
+    confidence: float
+    known_stems: int
+    # Stems que mais pesaram a favor da categoria prevista (explicação da decisão)
+    top_stems: List[str]
+
+
+@dataclass
+class LocalModel:
+    """
+    Regressão logística binária sobre a presença dos stems de extract_keywords (Produtivo = classe positiva).
+    A inferência é uma soma de pesos num dicionário: microssegundos por email, sem numpy.
+    """
+    weights: Dict[str, float]
+    bias: float
+    trained_at: float = 0.0
+    examples: int = 0
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+    def predict(self, nlp_keywords: str, min_stems: int = LOCAL_MODEL_MIN_STEMS) -> Optional[LocalPrediction]:
+        """
+        None se o email tiver menos de `min_stems` stems conhecidos pelo modelo (a decisão sairia só do viés).
+        """
+        contributions = [(self.weights[stem], stem) for stem in set(nlp_keywords.split()) if stem in self.weights]
+        if len(contributions) < max(1, min_stems):
+            return None
+        
+        z = self.bias + sum(weight for weight, _ in contributions)
+        probability = 1.0 / (1.0 + math.exp(-z)) if z >= 0 else math.exp(z) / (1.0 + math.exp(z))
+        produtivo = probability >= 0.5
+        
+        contributions.sort(reverse=produtivo)
+        top_stems = [stem for weight, stem in contributions[:3] if (weight > 0) == produtivo and weight != 0]
+        return LocalPrediction(
+            category='Produtivo' if produtivo else 'Improdutivo',
+            confidence=probability if produtivo else 1.0 - probability,
+            known_stems=len(contributions),
+            top_stems=top_stems
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': MODEL_VERSION,
+            'kind': 'logistic_regression',
+            'trained_at': self.trained_at,
+            'examples': self.examples,
+            'metrics': self.metrics,
+            'bias': self.bias,
+            'weights': self.weights
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LocalModel':
+        if data.get('version') != MODEL_VERSION:
+            raise ValueError(f"Versão de modelo não suportada: {data.get('version')}")
+        return cls(
+            weights={str(stem): float(weight) for stem, weight in data['weights'].items()},
+            bias=float(data['bias']),
+            trained_at=float(data.get('trained_at', 0.0)),
+            examples=int(data.get('examples', 0)),
+            metrics=data.get('metrics') or {}
+        )
+
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # Escrita atômica: a API pode recarregar o arquivo a qualquer momento. O temporário é único por
+        # gravação, para que dois treinos simultâneos não misturem conteúdo
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory or '.',
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as file:
+            try:
+                json.dump(self.to_dict(), file, ensure_ascii=False)
+            except BaseException:
+                file.close()
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'LocalModel':
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+
+class ReloadableLocalModel:
+    """
+    Mantém o modelo local atual e o recarrega quando o arquivo muda (ex.: após `python -m app.cli train`).
+    Sem arquivo, o modelo fica desativado; com arquivo inválido, mantém a última versão válida.
+    """
+
+    def __init__(self, path: Optional[str], check_interval: float = 30.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._model: Optional[LocalModel] = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[LocalModel]:
+        if self.path and time.monotonic() >= self._next_check:
+            with self._lock:
+                if time.monotonic() >= self._next_check:
+                    self._next_check = time.monotonic() + self.check_interval
+                    self._reload_if_changed()
+        return self._model
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        
+        if mtime is None:
+            if self._model is not None:
+                logger.warning(f"Modelo local removido ({self.path}), desativando o modelo local")
+            self._model = None
+            return
+        
+        try:
+            self._model = LocalModel.load(self.path)
+            logger.info(f"Modelo local carregado de {self.path} ({len(self._model.weights)} stems, {self._model.examples} exemplos)")
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"Modelo local inválido em {self.path}, mantendo o anterior: {str(e)}")
+
+
+_local_model = ReloadableLocalModel(LOCAL_MODEL_PATH, check_interval=LOCAL_MODEL_RELOAD_INTERVAL)
+
+
+def get_local_model() -> Optional[LocalModel]:
+    return _local_model.current()
+
+
+_decision_log_lock = threading.Lock()
+
+
+def log_ai_decision(raw_text: str, nlp_keywords: str, category: str) -> None:
+    """
+    Grava a classificação feita pelo Gemini (stems + categoria, sem o texto) em AI_DECISION_LOG_PATH,
+    como exemplo de treino do modelo local. O hash do texto permite descartar repetições no treino.
+    """
+    if not AI_DECISION_LOG_PATH:
+        return
+    
+    line = json.dumps({
+        'hash': content_hash(raw_text),
+        'keywords': nlp_keywords,
+        'category': category,
+        'source': 'gemini',
+        'created_at': round(time.time(), 3)
+    }, ensure_ascii=False)
+    try:
+        with _decision_log_lock:
+            directory = os.path.dirname(AI_DECISION_LOG_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(AI_DECISION_LOG_PATH, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+    except OSError as e:
+        logger.warning(f"Falha ao gravar decisão da IA em {AI_DECISION_LOG_PATH}: {str(e)}")
@@ -0,0 +1,257 @@
+import html
+import os
+import re
+from dataclasses import dataclass
+from email import policy
+from email.parser import BytesParser
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.services.file_reader import _read_pdf, _read_text, read_content
+from app.utils.exceptions import EmailClassifierException, InvalidFileException
+from app.utils.validators import MAX_TEXT_LENGTH
+
+
+# Mensagens maiores são reportadas como erro sem serem lidas (anexos enormes não ajudam a classificar)
+MAX_MESSAGE_SIZE = 25 * 1024 * 1024
+
+MBOX_EXTENSIONS = ('.mbox', '.mbx')
+_FILE_KINDS = {'.eml': 'mime', '.txt': 'txt', '.pdf': 'pdf'}
+_MAILDIR_SUBDIRS = ('cur', 'new')
+
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_BLOCK_TAG_RE = re.compile(r'<\s*(?:br|/p|/div|/li|/tr|/h[1-6])\b[^>]*>', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n+')
+
+
+@dataclass
+class MailboxMessage:
+    """
+    Mensagem ainda não lida: o conteúdo bruto só é interpretado (MIME, PDF) na hora de classificar.
+    `position` é o ponto da fonte logo após esta mensagem, usado para retomar a leitura.
+    """
+    source: str
+    kind: str
+    position: int
+    filename: Optional[str] = None
+    content: Optional[bytes] = None
+    error: Optional[EmailClassifierException] = None
+
+
+def _is_maildir(path: str) -> bool:
+    return all(os.path.isdir(os.path.join(path, subdir)) for subdir in _MAILDIR_SUBDIRS)
+
+
+def _file_kind(path: str) -> Optional[str]:
+    kind = _FILE_KINDS.get(os.path.splitext(path.lower())[1])
+    if kind:
+        return kind
+    
+    # Arquivos do Maildir (cur/, new/) não têm extensão: "1718000000.M1P2.host:2,S"
+    parent = os.path.dirname(path)
+    if os.path.basename(parent) in _MAILDIR_SUBDIRS and _is_maildir(os.path.dirname(parent)):
+        return 'mime'
+    return None
+
+
+def _iter_files(root: str) -> Iterator[str]:
+    """
+    Percorre o diretório em ordem determinística (necessária para retomar pela posição),
+    sem listar a árvore inteira de uma vez.
+    """
+    for directory, dirnames, filenames in os.walk(root):
+        if _is_maildir(directory):
+            dirnames[:] = [name for name in dirnames if name != 'tmp']
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            if _file_kind(path):
+                yield path
+
+
+def _read_file_message(path: str, kind: str, position: int) -> MailboxMessage:
+    message = MailboxMessage(source=path, kind=kind, position=position, filename=os.path.basename(path))
+    try:
+        if os.path.getsize(path) > MAX_MESSAGE_SIZE:
+            message.error = InvalidFileException(f"Mensagem excede o tamanho máximo de {MAX_MESSAGE_SIZE // (1024 * 1024)}MB")
+            return message
+        with open(path, 'rb') as file:
+            message.content = file.read()
+    except OSError as e:
+        message.error = InvalidFileException(f"Erro ao ler arquivo: {str(e)}")
+    return message
+
+
+def _iter_directory(root: str, start: int) -> Iterator[MailboxMessage]:
+    for position, path in enumerate(_iter_files(root), start=1):
+        # Já processados numa execução anterior: pular sem ler o arquivo
+        if position <= start:
+            continue
+        yield _read_file_message(path, _file_kind(path), position)
+
+
+def _iter_mbox(path: str, start: int) -> Iterator[MailboxMessage]:
+    """
+    Lê o mbox em streaming, uma mensagem por vez (o módulo `mailbox` indexaria o arquivo inteiro antes).
+    A posição é o offset em bytes, então retomar é só um seek.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        offset = start
+        message_start = start
+        lines: List[bytes] = []
+        size = 0
+        previous_blank = True
+        
+        for line in file:
+            line_start = offset
+            offset += len(line)
+            
+            if line.startswith(b'From ') and previous_blank:
+                if line_start > message_start:
+                    yield _mbox_message(path, message_start, line_start, lines, size)
+                # A linha separadora "From " não faz parte da mensagem
+                message_start = line_start
+                lines = []
+                size = 0
+                previous_blank = False
+                continue
+            
+            previous_blank = not line.strip()
+            size += len(line)
+            # Acima do limite, só avança até a próxima mensagem, sem acumular
+            if size <= MAX_MESSAGE_SIZE:
+                # mboxrd: ">From " no corpo é um "From " escapado
+                lines.append(line[1:] if line.startswith(b'>') and line.lstrip(b'>').startswith(b'From ') else line)
+        
+        if offset > message_start:
+            yield _mbox_message(path, message_start, offset, lines, size)
+
+
+def _mbox_message(path: str, start: int, end: int, lines: List[bytes], size: int) -> MailboxMessage:
+    message = MailboxMessage(source=f"{path}@{start}", kind='mime', position=end)
+    if size > MAX_MESSAGE_SIZE:
+        message.error = InvalidFileException(f"Mensagem excede o tamanho máximo de {MAX_MESSAGE_SIZE // (1024 * 1024)}MB")
+    else:
+        message.content = b''.join(lines)
+    return message
+
+
+def _is_mbox(path: str) -> bool:
+    if path.lower().endswith(MBOX_EXTENSIONS):
+        return True
+    with open(path, 'rb') as file:
+        return file.read(5) == b'From '
+
+
+def iter_messages(path: str, start: int = 0) -> Iterator[MailboxMessage]:
+    """
+    Mensagens de uma fonte: arquivo mbox, Maildir, diretório (.eml, .txt, .pdf, recursivo) ou um único arquivo.
+    `start` é a `position` da última mensagem já processada (0 = do início).
+    """
+    if os.path.isdir(path):
+        yield from _iter_directory(path, start)
+    elif not os.path.isfile(path):
+        raise InvalidFileException(f"Fonte não encontrada: {path}")
+    elif _is_mbox(path):
+        yield from _iter_mbox(path, start)
+    elif _file_kind(path):
+        if start < 1:
+            yield _read_file_message(path, _file_kind(path), 1)
+    else:
+        raise InvalidFileException(f"Fonte não suportada: {path} (use mbox, Maildir, diretório, .eml, .txt ou .pdf)")
+
+
+def _html_to_text(markup: str) -> str:
+    markup = _SCRIPT_STYLE_RE.sub(' ', markup)
+    markup = _BLOCK_TAG_RE.sub('\n', markup)
+    text = html.unescape(_TAG_RE.sub(' ', markup))
+    return _BLANK_LINES_RE.sub('\n\n', text)
+
+
+def _part_text(part) -> str:
+    try:
+        content = part.get_content()
+    except (LookupError, UnicodeDecodeError, AssertionError):
+        # Charset desconhecido ou declarado errado
+        content = (part.get_payload(decode=True) or b'').decode('utf-8', errors='replace')
+    if isinstance(content, bytes):
+        content = _read_text(content)
+    return _html_to_text(content) if part.get_content_type() == 'text/html' else content
+
+
+def _attachment_text(part) -> Optional[str]:
+    """
+    Texto de anexos PDF e .txt; os demais nem são decodificados.
+    """
+    filename = part.get_filename() or ''
+    content_type = part.get_content_type()
+    if content_type == 'application/pdf' or filename.lower().endswith('.pdf'):
+        return _read_pdf(part.get_payload(decode=True) or b'')
+    if content_type == 'text/plain' or filename.lower().endswith('.txt'):
+        return _read_text(part.get_payload(decode=True) or b'')
+    return None
+
+
+def parse_mime(content: bytes, max_chars: int = MAX_TEXT_LENGTH) -> Dict[str, Any]:
+    """
+    Extrai assunto, corpo (text/plain, ou text/html convertido) e o texto dos anexos PDF/.txt,
+    parando de ler anexos quando o texto atinge `max_chars`.
+    """
+    message = BytesParser(policy=policy.default).parsebytes(content)
+    subject = str(message.get('Subject', '') or '').strip()
+    
+    parts: List[str] = []
+    if subject:
+        parts.append(f"Assunto: {subject}")
+    
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is not None:
+        parts.append(_part_text(body).strip())
+    
+    attachments: List[str] = []
+    for part in message.iter_attachments():
+        if sum(len(text) for text in parts) >= max_chars:
+            break
+        filename = part.get_filename() or part.get_content_type()
+        try:
+            text = _attachment_text(part)
+        except EmailClassifierException:
+            # Anexo ilegível não impede classificar o corpo
+            continue
+        if text:
+            attachments.append(filename)
+            parts.append(f"[Anexo: {filename}]\n{text}")
+    
+    # Mensagem respondida: In-Reply-To ou, na falta dele, a última de References
+    references = str(message.get('References', '') or '').split()
+    in_reply_to = str(message.get('In-Reply-To', '') or '').strip() or (references[-1] if references else None)
+    
+    return {
+        "text": '\n\n'.join(part for part in parts if part)[:max_chars],
+        "subject": subject or None,
+        "message_id": str(message.get('Message-ID', '') or '').strip() or None,
+        "in_reply_to": in_reply_to,
+        "sender": str(message.get('From', '') or '').strip() or None,
+        "date": str(message.get('Date', '') or '').strip() or None,
+        "attachments": attachments
+    }
+
+
+def read_message(message: MailboxMessage) -> Dict[str, Any]:
+    """
+    Interpreta a mensagem (roda no pool de CPU). Arquivos .txt e .pdf avulsos passam por read_content.
+    """
+    if message.kind == 'mime':
+        return parse_mime(message.content)
+    
+    text = read_content(message.filename, message.content)
+    return {
+        "text": text[:MAX_TEXT_LENGTH],
+        "subject": None,
+        "message_id": None,
+        "in_reply_to": None,
+        "sender": None,
+        "date": None,
+        "attachments": []
+    }
@@ -0,0 +1,246 @@
+import json
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import LOCAL_MODEL_THRESHOLD, LOCAL_MODEL_MIN_STEMS
+from app.services.local_model import CATEGORIES, LocalModel
+from app.utils.exceptions import EmailClassifierException, InvalidFileException
+from app.utils.logger import logger
+
+
+# (keywords stemizadas, categoria)
+Example = Tuple[str, str]
+
+# Limiares comparados no relatório de avaliação
+THRESHOLD_SWEEP = (0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99)
+
+# Pesos menores que isso são descartados do arquivo do modelo (não mudam a decisão)
+_MIN_ABS_WEIGHT = 1e-4
+
+
+def _normalize_category(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    for category in CATEGORIES:
+        if value.strip().lower() == category.lower():
+            return category
+    return None
+
+
+def _category_from_path(path: str) -> Optional[str]:
+    # Rótulo pelo diretório, como em mock_emails/produtivo e mock_emails/improdutivo
+    for part in reversed(os.path.normpath(path).split(os.sep)):
+        category = _normalize_category(part)
+        if category:
+            return category
+    return None
+
+
+def _iter_jsonl(path: str) -> Iterator[Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]]:
+    """
+    (keywords, texto, categoria, hash) por linha. Aceita o log de decisões da IA (keywords + category)
+    e exemplos rotulados com texto ({"text": ..., "category": ...}).
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Linha {line_number} de {path} inválida, ignorada")
+                continue
+            if not isinstance(entry, dict):
+                continue
+            yield (
+                entry.get('keywords'),
+                entry.get('text'),
+                _normalize_category(entry.get('category') or entry.get('categoria') or entry.get('label')),
+                entry.get('hash')
+            )
+
+
+def _iter_directory(path: str) -> Iterator[Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]]:
+    from app.services.mailbox_reader import iter_messages, read_message
+    
+    for message in iter_messages(path):
+        category = _category_from_path(message.source)
+        if category is None or message.error:
+            continue
+        try:
+            text = read_message(message)['text']
+        except EmailClassifierException as e:
+            logger.warning(f"Exemplo {message.source} ignorado: {str(e)}")
+            continue
+        yield None, text, category, None
+
+
+def load_examples(paths: Iterable[str]) -> List[Example]:
+    """
+    Exemplos rotulados de arquivos JSONL (log de decisões da IA ou {"text", "category"}) e de diretórios
+    com subpastas produtivo/ e improdutivo/. Textos passam por extract_keywords; repetições
+    (mesmo hash de texto no log de decisões) contam uma vez.
+    """
+    from app.services.nlp_engine import extract_keywords
+    
+    examples: List[Example] = []
+    seen_hashes = set()
+    skipped = 0
+    
+    for path in paths:
+        if os.path.isdir(path):
+            entries = _iter_directory(path)
+        elif os.path.isfile(path):
+            entries = _iter_jsonl(path)
+        else:
+            raise InvalidFileException(f"Dados de treino não encontrados: {path}")
+        
+        for keywords, text, category, text_hash in entries:
+            if category is None or not (keywords or text):
+                skipped += 1
+                continue
+            if text_hash:
+                if text_hash in seen_hashes:
+                    continue
+                seen_hashes.add(text_hash)
+            if not keywords:
+                keywords = extract_keywords(text)
+            examples.append((keywords, category))
+    
+    if skipped:
+        logger.warning(f"{skipped} exemplos sem categoria ou sem texto/keywords foram ignorados")
+    return examples
+
+
+def split_examples(examples: Sequence[Example], holdout: float, seed: int = 42) -> Tuple[List[Example], List[Example]]:
+    shuffled = list(examples)
+    random.Random(seed).shuffle(shuffled)
+    size = int(len(shuffled) * holdout)
+    return shuffled[size:], shuffled[:size]
+
+
+def train_model(examples: Sequence[Example], l2: float = 1.0, min_df: int = 2, max_features: int = 50000) -> LocalModel:
+    """
+    Regressão logística com regularização L2 (L-BFGS) sobre a matriz binária email x stem.
+    Classes com pesos balanceados, para o modelo não aprender só a proporção do tráfego.
+    Stems em menos de `min_df` exemplos ficam de fora (ruído, nomes, números de protocolo).
+    """
+    import numpy as np
+    from scipy.optimize import minimize
+    from scipy.sparse import csr_matrix
+    from scipy.special import expit
+    
+    labels = [category for _, category in examples]
+    if len(set(labels)) < 2:
+        raise InvalidFileException("Treino requer exemplos das duas categorias (Produtivo e Improdutivo)")
+    
+    documents = [set(keywords.split()) for keywords, _ in examples]
+    document_frequency = Counter(stem for document in documents for stem in document)
+    vocabulary = [stem for stem, count in document_frequency.most_common(max_features) if count >= min_df]
+    index = {stem: position for position, stem in enumerate(vocabulary)}
+    if not vocabulary:
+        raise InvalidFileException(f"Nenhum stem aparece em pelo menos {min_df} exemplos; reduza --min-df")
+    
+    rows: List[int] = []
+    cols: List[int] = []
+    for row, document in enumerate(documents):
+        for stem in document:
+            if stem in index:
+                rows.append(row)
+                cols.append(index[stem])
+    matrix = csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(documents), len(vocabulary)))
+    
+    y = np.array([1.0 if category == 'Produtivo' else 0.0 for category in labels])
+    positives = y.sum()
+    sample_weight = np.where(y == 1.0, len(y) / (2 * positives), len(y) / (2 * (len(y) - positives)))
+    n = len(y)
+
+    def objective(params):
+        weights, bias = params[:-1], params[-1]
+        z = matrix @ weights + bias
+        loss = (sample_weight * (np.logaddexp(0.0, z) - y * z)).sum() / n + 0.5 * l2 * (weights @ weights) / n
+        residual = sample_weight * (expit(z) - y) / n
+        gradient = np.empty_like(params)
+        gradient[:-1] = matrix.T @ residual + l2 * weights / n
+        gradient[-1] = residual.sum()
+        return loss, gradient
+    
+    result = minimize(objective, np.zeros(len(vocabulary) + 1), jac=True, method='L-BFGS-B', options={'maxiter': 1000})
+    weights, bias = result.x[:-1], float(result.x[-1])
+    
+    return LocalModel(
+        weights={stem: round(float(weight), 6) for stem, weight in zip(vocabulary, weights) if abs(weight) >= _MIN_ABS_WEIGHT},
+        bias=round(bias, 6),
+        trained_at=time.time(),
+        examples=n
+    )
+
+
+def _ratio(part: int, total: int) -> Optional[float]:
+    return round(part / total, 4) if total else None
+
+
+def evaluate(model: LocalModel, examples: Sequence[Example], threshold: float = LOCAL_MODEL_THRESHOLD,
+             min_stems: int = LOCAL_MODEL_MIN_STEMS) -> Dict[str, Any]:
+    """
+    Simula a cascata da API sobre exemplos rotulados: keywords de alta confiança, depois o modelo local
+    (confiança >= threshold) e o resto para o Gemini. Reporta a acurácia de cada camada local, a fração
+    do tráfego que não iria ao Gemini e a cobertura/acurácia do modelo local em outros limiares.
+    """
+    from app.services.ai_handler import pre_classify_with_keywords
+    
+    total = len(examples)
+    keyword_decided = keyword_correct = 0
+    model_total = model_correct = 0
+    # Emails que chegariam ao modelo local (não resolvidos pelas keywords): (confiança, acertou).
+    # Sem stems suficientes, o modelo não decide: confiança 0
+    candidates: List[Tuple[float, bool]] = []
+    predict_seconds = 0.0
+    
+    for keywords, category in examples:
+        pre_classification = pre_classify_with_keywords(keywords)
+        
+        start = time.perf_counter()
+        prediction = model.predict(keywords, min_stems)
+        predict_seconds += time.perf_counter() - start
+        
+        if prediction is not None:
+            model_total += 1
+            model_correct += prediction.category == category
+        
+        if pre_classification and pre_classification.get('confidence_score', 0) > 0.85:
+            keyword_decided += 1
+            keyword_correct += pre_classification['category'] == category
+        elif prediction is not None:
+            candidates.append((prediction.confidence, prediction.category == category))
+        else:
+            candidates.append((0.0, False))
+
+    def tier(limit: float) -> Dict[str, Any]:
+        kept = [correct for confidence, correct in candidates if confidence >= limit]
+        return {
+            'threshold': limit,
+            'local_model': len(kept),
+            'local_model_accuracy': _ratio(sum(kept), len(kept)),
+            'gemini': len(candidates) - len(kept),
+            'kept_off_gemini': _ratio(keyword_decided + len(kept), total)
+        }
+    
+    current = tier(threshold)
+    return {
+        'examples': total,
+        'threshold': threshold,
+        'model_accuracy': _ratio(model_correct, model_total),
+        'model_coverage': _ratio(model_total, total),
+        'keywords': keyword_decided,
+        'keywords_accuracy': _ratio(keyword_correct, keyword_decided),
+        'local_model': current['local_model'],
+        'local_model_accuracy': current['local_model_accuracy'],
+        'gemini': current['gemini'],
+        'kept_off_gemini': current['kept_off_gemini'],
+        'predict_microseconds': round(predict_seconds / total * 1e6, 2) if total else None,
+        'sweep': [tier(limit) for limit in THRESHOLD_SWEEP]
+    }
@@ -0,0 +1,264 @@
+import base64
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import (
+    NEAR_DUPLICATE_ENABLED,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_MAX_ENTRIES,
+    NEAR_DUPLICATE_PATH
+)
+from app.utils.logger import logger
+
+
+INDEX_VERSION = 1
+
+# 16 bandas x 4 linhas: pares com Jaccard >= 0,8 caem numa mesma banda com probabilidade > 99,9%,
+# e pares abaixo de ~0,5 raramente viram candidatos
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+
+# Emails com poucos stems (ex.: "ok, obrigado") ficam de fora: com conjuntos pequenos, quase tudo
+# parece duplicata
+MIN_STEMS = 5
+
+# Campos do resultado guardados para reaproveitar
+_STORED_FIELDS = ('category', 'confidence_score', 'summary', 'reason', 'suggested_response')
+
+
+@functools.lru_cache(maxsize=100000)
+def _stem_hash(stem: str) -> int:
+    # Hash estável entre processos (o hash() do Python muda a cada execução e o índice é persistido)
+    return int.from_bytes(hashlib.blake2b(stem.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+@functools.lru_cache(maxsize=1)
+def _permutations():
+    import numpy as np
+    
+    # Hashing multiply-shift: (a * h + b) mod 2^64, 32 bits mais altos. Semente fixa: assinaturas
+    # salvas em disco continuam comparáveis depois de reiniciar
+    rng = np.random.default_rng(20240601)
+    a = rng.integers(1, 2 ** 63, size=PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(nlp_keywords: str) -> Optional[bytes]:
+    """
+    Assinatura MinHash (PERMUTATIONS x uint32) do conjunto de stems; None com menos de MIN_STEMS stems.
+    """
+    import numpy as np
+    
+    stems = set(nlp_keywords.split())
+    if len(stems) < MIN_STEMS:
+        return None
+    
+    a, b = _permutations()
+    hashes = np.fromiter((_stem_hash(stem) for stem in stems), dtype=np.uint64, count=len(stems))
+    with np.errstate(over='ignore'):
+        permuted = (hashes[:, None] * a + b) >> np.uint64(32)
+    return permuted.min(axis=0).astype(np.uint32).tobytes()
+
+
+def signature_similarity(first: bytes, second: bytes) -> float:
+    """
+    Jaccard estimado entre os conjuntos de stems: fração de posições iguais nas assinaturas.
+    """
+    import numpy as np
+    
+    equal = np.count_nonzero(np.frombuffer(first, dtype=np.uint32) == np.frombuffer(second, dtype=np.uint32))
+    return equal / PERMUTATIONS
+
+
+def _band_keys(signature: bytes) -> List[bytes]:
+    width = ROWS * 4
+    return [signature[band * width:(band + 1) * width] for band in range(BANDS)]
+
+
+@dataclass
+class NearDuplicateMatch:
+    similarity: float
+    # Só presente quando similarity >= threshold
+    result: Optional[Dict[str, Any]]
+
+
+class NearDuplicateIndex:
+    """
+    Índice LSH de emails já classificados, pela assinatura MinHash dos stems.
+    Cada banda da assinatura aponta para o último email visto com ela; uma consulta compara só
+    esses candidatos (no máximo BANDS), então o custo não cresce com o tamanho do índice.
+    Limitado a `max_entries` emails, com despejo LRU.
+    """
+
+    def __init__(self, threshold: float, max_entries: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self._entries: 'OrderedDict[int, Tuple[bytes, Dict[str, Any]]]' = OrderedDict()
+        self._bands: List[Dict[bytes, int]] = [{} for _ in range(BANDS)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, nlp_keywords: str) -> Optional[NearDuplicateMatch]:
+        """
+        Email mais parecido entre os candidatos. None se o email for curto demais ou não houver
+        candidatos; com similaridade abaixo do limiar, o match vem sem resultado (só o score).
+        """
+        signature = minhash_signature(nlp_keywords)
+        if signature is None:
+            return None
+        
+        with self._lock:
+            candidates = {bucket[key] for bucket, key in zip(self._bands, _band_keys(signature)) if key in bucket}
+            best_id, best_similarity = None, 0.0
+            for entry_id in candidates:
+                similarity = signature_similarity(signature, self._entries[entry_id][0])
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+            
+            if best_id is None:
+                self.misses += 1
+                return None
+            if best_similarity < self.threshold:
+                self.misses += 1
+                return NearDuplicateMatch(round(best_similarity, 4), None)
+            
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return NearDuplicateMatch(round(best_similarity, 4), dict(self._entries[best_id][1]))
+
+    def add(self, nlp_keywords: str, ai_result: Dict[str, Any]) -> None:
+        # Como no cache: resultados degradados (fallback ou produtivo sem resposta) não são guardados
+        if ai_result.get('used_fallback'):
+            return
+        if ai_result['category'] == 'Produtivo' and not ai_result.get('suggested_response'):
+            return
+        
+        signature = minhash_signature(nlp_keywords)
+        if signature is None:
+            return
+        self._insert(signature, {field: ai_result.get(field) for field in _STORED_FIELDS})
+
+    def _insert(self, signature: bytes, result: Dict[str, Any]) -> None:
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (signature, result)
+            for bucket, key in zip(self._bands, _band_keys(signature)):
+                bucket[key] = entry_id
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self.dirty = True
+
+    def _remove(self, entry_id: int) -> None:
+        signature, _ = self._entries.pop(entry_id)
+        for bucket, key in zip(self._bands, _band_keys(signature)):
+            # A banda pode já apontar para um email mais novo
+            if bucket.get(key) == entry_id:
+                del bucket[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Grava o índice (do menos para o mais recente) com escrita atômica. Cada worker do uvicorn grava
+        a própria cópia no mesmo arquivo (a última prevalece); o arquivo temporário é único por gravação
+        para que gravações simultâneas não misturem conteúdo.
+        """
+        with self._lock:
+            entries = [
+                {'signature': base64.b64encode(signature).decode('ascii'), 'result': result}
+                for signature, result in self._entries.values()
+            ]
+            self.dirty = False
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory or '.',
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as file:
+            try:
+                json.dump({'version': INDEX_VERSION, 'permutations': PERMUTATIONS, 'saved_at': time.time(),
+                           'entries': entries}, file, ensure_ascii=False)
+            except BaseException:
+                file.close()
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, path)
+
+    def load(self, path: str) -> int:
+        """
+        Carrega um índice salvo; retorna o número de emails. Arquivo ausente = índice vazio.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return 0
+        
+        if data.get('version') != INDEX_VERSION or data.get('permutations') != PERMUTATIONS:
+            raise ValueError(f"Índice de quase-duplicatas incompatível em {path}")
+        for entry in data['entries'][-self.max_entries:]:
+            self._insert(base64.b64decode(entry['signature']), entry['result'])
+        self.dirty = False
+        return len(self._entries)
+
+
+_near_duplicate_index: Optional[NearDuplicateIndex] = None
+_near_duplicate_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """
+    Índice compartilhado (None com NEAR_DUPLICATE_ENABLED=false), carregado de NEAR_DUPLICATE_PATH
+    na primeira chamada (idealmente no warm-up da API).
+    """
+    global _near_duplicate_index
+    if not NEAR_DUPLICATE_ENABLED:
+        return None
+    if _near_duplicate_index is None:
+        with _near_duplicate_index_lock:
+            if _near_duplicate_index is None:
+                index = NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_MAX_ENTRIES)
+                if NEAR_DUPLICATE_PATH:
+                    try:
+                        logger.info(f"Índice de quase-duplicatas: {index.load(NEAR_DUPLICATE_PATH)} emails carregados")
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        logger.error(f"Índice de quase-duplicatas inválido em {NEAR_DUPLICATE_PATH}, começando vazio: {str(e)}")
+                _near_duplicate_index = index
+    return _near_duplicate_index
+
+
+def save_near_duplicate_index() -> None:
+    """
+    Salva o índice em NEAR_DUPLICATE_PATH se mudou desde a última gravação.
+    """
+    index = _near_duplicate_index
+    if index is None or not NEAR_DUPLICATE_PATH or not index.dirty:
+        return
+    try:
+        index.save(NEAR_DUPLICATE_PATH)
+    except OSError as e:
+        logger.warning(f"Falha ao salvar o índice de quase-duplicatas em {NEAR_DUPLICATE_PATH}: {str(e)}")
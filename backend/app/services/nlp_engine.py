@@ -1,57 +1,197 @@
+import functools
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import RSLPStemmer
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from app.config import NLTK_AUTO_DOWNLOAD, STEM_CACHE_SIZE
 from app.utils.exceptions import NLPProcessingException
 
 
-_nltk_downloaded = False
+# Recurso -> caminho usado por nltk.data.find (o tokenizador depende da versão: _tokenizer_resource)
+_NLTK_RESOURCES = {
+    'stopwords': 'corpora/stopwords',
+    'rslp': 'stemmers/rslp',
+}
+
+_nltk_checked = False
+
+
+def _tokenizer_resource(nltk_version: str) -> Tuple[str, str]:
+    # O nltk 3.8.2+ tokeniza com punkt_tab; 3.8.0 e 3.8.1 (aceitos pelo requirements.txt) ainda usam punkt
+    version = tuple(int(part) for part in re.findall(r'\d+', nltk_version)[:3])
+    return ('punkt_tab', 'tokenizers/punkt_tab') if version >= (3, 8, 2) else ('punkt', 'tokenizers/punkt')
 
 
 def _ensure_nltk_data():
-    global _nltk_downloaded
-    if _nltk_downloaded:
+    """
+    Verifica os dados do NLTK localmente, sem acessar a rede.
+    Só baixa o que faltar se NLTK_AUTO_DOWNLOAD estiver ativo (chamado na inicialização, nunca por requisição).
+    """
+    global _nltk_checked
+    if _nltk_checked:
         return
     
-    try:
-        nltk.download('punkt', quiet=True)
-        nltk.download('punkt_tab', quiet=True)
-        nltk.download('stopwords', quiet=True)
-        nltk.download('rslp', quiet=True)
-        _nltk_downloaded = True
-    except Exception as e:
-        raise NLPProcessingException(f"Erro ao baixar dados do NLTK: {str(e)}")
-
-
-def extract_keywords(text: str) -> str:
-    if not text or not text.strip():
-        raise NLPProcessingException("Texto não pode estar vazio para extração de keywords")
+    import nltk
     
-    _ensure_nltk_data()
+    tokenizer, tokenizer_path = _tokenizer_resource(nltk.__version__)
+    missing = []
+    for resource, path in [(tokenizer, tokenizer_path)] + list(_NLTK_RESOURCES.items()):
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(resource)
     
-    try:
-        normalized_text = text.lower()
+    if missing and NLTK_AUTO_DOWNLOAD:
+        try:
+            for resource in missing:
+                nltk.download(resource, quiet=True)
+        except Exception as e:
+            raise NLPProcessingException(f"Erro ao baixar dados do NLTK: {str(e)}")
+    elif missing:
+        raise NLPProcessingException(
+            f"Dados do NLTK não encontrados: {', '.join(missing)}. "
+            f"Execute nltk.download para cada um ou defina NLTK_AUTO_DOWNLOAD=true"
+        )
+    
+    _nltk_checked = True
+
+
+class KeywordExtractor:
+    """
+    Pipeline de extração de keywords com todo o setup feito uma única vez:
+    stopwords, stemmer RSLP (com cache de stems por token) e regexes pré-compiladas.
+    """
+
+    def __init__(self, stem_cache_size: int = STEM_CACHE_SIZE):
+        # Importar o nltk custa ~1,5s (ele carrega scipy.stats): fica para o warm-up, fora do import da API
+        from nltk.corpus import stopwords
+        from nltk.stem import RSLPStemmer
+        from nltk.tokenize import word_tokenize
         
-        cleaned_text = re.sub(r'[^a-záéíóúâêîôûãõç\s]', ' ', normalized_text)
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+        _ensure_nltk_data()
+        
+        self._word_tokenize = word_tokenize
+        self.stop_words = frozenset(stopwords.words('portuguese'))
+        self._stemmer = RSLPStemmer()
+        # Vocabulário de emails é muito repetitivo: memoizar o stem de cada token
+        self.stem = functools.lru_cache(maxsize=stem_cache_size)(self._stemmer.stem)
+        self._invalid_chars_re = re.compile(r'[^a-záéíóúâêîôûãõç\s]')
+        self._whitespace_re = re.compile(r'\s+')
         
         try:
-            tokens = word_tokenize(cleaned_text, language='portuguese')
+            word_tokenize('teste', language='portuguese')
+            self._tokenizer_language = 'portuguese'
         except LookupError:
-            tokens = word_tokenize(cleaned_text)
-        
-        stop_words = set(stopwords.words('portuguese'))
-        filtered_tokens = [token for token in tokens if token not in stop_words and len(token) >= 3]
+            self._tokenizer_language = 'english'
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Normaliza o texto e retorna os tokens relevantes (sem stopwords e com 3+ caracteres), ainda sem stem.
+        """
+        normalized_text = text.lower()
         
-        stemmer = RSLPStemmer()
-        stemmed_tokens = [stemmer.stem(token) for token in filtered_tokens]
+        cleaned_text = self._invalid_chars_re.sub(' ', normalized_text)
+        cleaned_text = self._whitespace_re.sub(' ', cleaned_text)
         
-        unique_stems = list(dict.fromkeys(stemmed_tokens))
+        tokens = self._word_tokenize(cleaned_text, language=self._tokenizer_language)
         
-        keywords = ' '.join(unique_stems)
+        return [token for token in tokens if token not in self.stop_words and len(token) >= 3]
+
+    def extract(self, text: str) -> str:
+        if not text or not text.strip():
+            raise NLPProcessingException("Texto não pode estar vazio para extração de keywords")
         
-        return keywords.strip()
-    except Exception as e:
-        raise NLPProcessingException(f"Erro ao processar texto com NLP: {str(e)}")
+        try:
+            stemmed_tokens = [self.stem(token) for token in self.tokenize(text)]
+            
+            unique_stems = list(dict.fromkeys(stemmed_tokens))
+            
+            keywords = ' '.join(unique_stems)
+            
+            return keywords.strip()
+        except Exception as e:
+            raise NLPProcessingException(f"Erro ao processar texto com NLP: {str(e)}")
+
+    def stem_cache_info(self):
+        return self.stem.cache_info()
+
+
+_keyword_extractor: Optional[KeywordExtractor] = None
+_keyword_extractor_lock = threading.Lock()
+
+
+def get_keyword_extractor() -> KeywordExtractor:
+    """
+    Retorna o extrator compartilhado, criando-o na primeira chamada (idealmente na inicialização da API).
+    """
+    global _keyword_extractor
+    if _keyword_extractor is None:
+        with _keyword_extractor_lock:
+            if _keyword_extractor is None:
+                _keyword_extractor = KeywordExtractor()
+    return _keyword_extractor
+
+
+@dataclass
+class KeywordMatrix:
+    """
+    Matriz documento-termo esparsa (CSR, binária) sobre um vocabulário de stems compartilhado.
+    Cada linha guarda os stems do email na ordem da primeira ocorrência, como em extract_keywords.
+    """
+    matrix: Any
+    terms: List[str]
+    vocabulary: Dict[str, int]
+
+    def row_terms(self, row: int) -> List[str]:
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return [self.terms[index] for index in self.matrix.indices[start:end]]
+
+    def keywords(self, row: int) -> str:
+        """
+        String de keywords do email, idêntica à retornada por extract_keywords.
+        """
+        return ' '.join(self.row_terms(row))
+
+
+def extract_keywords_batch(texts: Iterable[str]) -> KeywordMatrix:
+    """
+    Extrai keywords de vários emails de uma vez e monta a matriz esparsa diretamente (sem strings intermediárias).
+    Textos vazios viram linhas vazias em vez de erro.
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    
+    extractor = get_keyword_extractor()
+    vocabulary: Dict[str, int] = {}
+    terms: List[str] = []
+    indices: List[int] = []
+    indptr = [0]
+    
+    for text in texts:
+        if text and text.strip():
+            try:
+                stems = dict.fromkeys(extractor.stem(token) for token in extractor.tokenize(text))
+            except Exception as e:
+                raise NLPProcessingException(f"Erro ao processar texto com NLP: {str(e)}")
+            
+            for stem in stems:
+                index = vocabulary.get(stem)
+                if index is None:
+                    index = vocabulary[stem] = len(terms)
+                    terms.append(stem)
+                indices.append(index)
+        indptr.append(len(indices))
+    
+    matrix = csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(terms))
+    )
+    return KeywordMatrix(matrix=matrix, terms=terms, vocabulary=vocabulary)
+
+
+def extract_keywords(text: str) -> str:
+    if not text or not text.strip():
+        raise NLPProcessingException("Texto não pode estar vazio para extração de keywords")
+    
+    return get_keyword_extractor().extract(text)
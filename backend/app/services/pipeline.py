@@ -0,0 +1,281 @@
+import asyncio
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+
+from app.config import AI_DECISION_LOG_PATH, STAGE_TIMINGS_IN_RESPONSE
+from app.services.nlp_engine import extract_keywords
+from app.services.ai_handler import KeywordHint, analyze_email, analyze_email_stream
+from app.services.cache import get_classification_cache
+from app.services.local_model import log_ai_decision
+from app.services.near_duplicate import get_near_duplicate_index
+from app.services.reply_library import get_reply_library
+from app.services.reply_store import get_reply_store
+from app.services.thread_context import ThreadMatch, ThreadStore, get_thread_store
+from app.utils.concurrency import run_cpu_bound
+from app.utils.logger import logger
+from app.utils.metrics import get_stage_timings, record_cache_lookup, record_classification, stage_timer
+
+
+def _classification_method(ai_result: Dict[str, Any]) -> str:
+    if ai_result.get('used_near_duplicate'):
+        return 'near_duplicate'
+    if ai_result.get('used_keywords_only'):
+        return 'keywords_only'
+    if ai_result.get('used_local_model'):
+        return 'local_model'
+    if ai_result.get('used_fallback'):
+        return 'fallback'
+    return 'ai'
+
+
+def build_processing_details(
+    ai_result: Dict[str, Any],
+    nlp_keywords: str,
+    cache_hit: Optional[bool] = None,
+    cache_key: Optional[str] = None,
+    stage_timings: Optional[Dict[str, float]] = None,
+    thread: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Monta os detalhes de processamento a partir do resultado da classificação.
+    """
+    classification_method = _classification_method(ai_result)
+    
+    # Preparar detalhes de processamento
+    keyword_analysis = ai_result.get('keyword_analysis', {
+        'matched_keywords': [],
+        'produtivo_score': 0,
+        'improdutivo_score': 0,
+        'total_keywords': len(nlp_keywords.split())
+    })
+    
+    return {
+        "classification_method": classification_method,
+        "used_full_text": ai_result.get('used_full_text'),
+        "used_ai": ai_result.get('used_ai', False),
+        "used_fallback": ai_result.get('used_fallback', False),
+        "cache_hit": cache_hit,
+        "cache_key": cache_key,
+        "stage_timings": stage_timings,
+        "prompt_context": ai_result.get('prompt_context'),
+        # Em acerto de cache, a similaridade guardada seria a da primeira classificação
+        "near_duplicate": None if cache_hit else ai_result.get('near_duplicate'),
+        "reply_source": ai_result.get('reply_source'),
+        "reply_library": ai_result.get('reply_library'),
+        "thread": thread,
+        "keyword_analysis": keyword_analysis
+    }
+
+
+async def _resolve_thread(raw_text: str, message_id: Optional[str],
+                    in_reply_to: Optional[str]) -> Tuple[Optional[ThreadStore], Optional[ThreadMatch]]:
+    thread_store = get_thread_store()
+    if thread_store is None:
+        return None, None
+    with stage_timer('thread_context'):
+        thread = await thread_store.resolve(raw_text, message_id, in_reply_to)
+    if thread.parent:
+        logger.info("Resposta na conversa %s (%s): processando %d de %d caracteres",
+                    thread.parent.thread_id, thread.matched_by, len(thread.text), thread.original_chars)
+    return thread_store, thread
+
+
+async def _record_thread(thread_store: Optional[ThreadStore], thread: Optional[ThreadMatch], nlp_keywords: str,
+                   ai_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Guarda o estado da conversa após esta mensagem, para as respostas a ela.
+    """
+    if thread_store is None:
+        return None
+    return thread.report(await thread_store.record(thread, nlp_keywords, ai_result))
+
+
+async def _lookup_cache(raw_text: str, keyword_text: Optional[str] = None,
+                        precomputed_keywords: Optional[str] = None) -> Tuple[Any, Optional[Dict[str, Any]], Optional[str], str]:
+    """
+    Consulta o cache pelo texto e, se não achar, pelas keywords (extraindo-as de `keyword_text`,
+    que numa conversa conhecida é só o trecho novo, ou usando `precomputed_keywords`, extraídas no lote).
+    Retorna (cache, entrada encontrada, chave usada, keywords).
+    """
+    cache = get_classification_cache()
+    cache_key = None
+    cached = await cache.get_by_text(raw_text) if cache else None
+    
+    if cached:
+        cache_key = 'text'
+        nlp_keywords = cached['nlp_keywords']
+    elif precomputed_keywords:
+        nlp_keywords = precomputed_keywords
+        cached = await cache.get_by_keywords(nlp_keywords) if cache else None
+        if cached:
+            cache_key = 'keywords'
+    else:
+        with stage_timer('extract_keywords'):
+            nlp_keywords = await run_cpu_bound(extract_keywords, keyword_text or raw_text)
+        logger.info("Keywords extraídas: %s...", nlp_keywords[:100])
+        
+        cached = await cache.get_by_keywords(nlp_keywords) if cache else None
+        if cached:
+            cache_key = 'keywords'
+    
+    if cache:
+        record_cache_lookup(f"hit_{cache_key}" if cached else 'miss')
+    
+    return cache, cached, cache_key, nlp_keywords
+
+
+async def _record_fresh_result(cache: Any, raw_text: str, nlp_keywords: str, ai_result: Dict[str, Any]) -> None:
+    """
+    Guarda a classificação recém-calculada no cache e no índice de quase-duplicatas, a resposta gerada pelo
+    Gemini na biblioteca de respostas e, se a classificação veio do Gemini, no log de treino do modelo local.
+    """
+    method = _classification_method(ai_result)
+    if cache:
+        await cache.store(raw_text, nlp_keywords, ai_result)
+    
+    # Reaproveitamentos não voltam ao índice: cópias de cópias se afastariam do email original
+    near_duplicate_index = get_near_duplicate_index()
+    if near_duplicate_index and method != 'near_duplicate':
+        near_duplicate_index.add(nlp_keywords, ai_result)
+    
+    reply_library = get_reply_library()
+    if reply_library and ai_result.get('reply_source') == 'ai':
+        reply_library.add(raw_text, nlp_keywords, ai_result['suggested_response'])
+    
+    if method == 'ai' and AI_DECISION_LOG_PATH:
+        # Append com lock no arquivo: numa thread, para não travar o event loop com disco lento
+        await asyncio.to_thread(log_ai_decision, raw_text, nlp_keywords, ai_result['category'])
+
+
+def _response_data(
+    raw_text: str,
+    filename: Optional[str],
+    nlp_keywords: str,
+    ai_result: Dict[str, Any],
+    cache: Any,
+    cached: Optional[Dict[str, Any]],
+    cache_key: Optional[str],
+    thread: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Monta o bloco `data` da resposta e registra a classificação nas métricas.
+    """
+    reply_id = None
+    if ai_result.get('reply_pending'):
+        reply_id = get_reply_store().schedule(raw_text, nlp_keywords, ai_result)
+    
+    processing_details = build_processing_details(
+        ai_result,
+        nlp_keywords,
+        cache_hit=bool(cached) if cache else None,
+        cache_key=cache_key,
+        stage_timings=get_stage_timings() if STAGE_TIMINGS_IN_RESPONSE else None,
+        thread=thread
+    )
+    record_classification(processing_details['classification_method'], ai_result['category'])
+    
+    return {
+        "filename": filename,
+        "category": ai_result['category'],
+        "confidence_score": ai_result['confidence_score'],
+        "summary": ai_result['summary'],
+        "reason": ai_result.get('reason', ai_result['summary']),
+        "suggested_response": ai_result['suggested_response'],
+        "reply_id": reply_id,
+        "reply_status": 'pending' if reply_id else None,
+        "nlp_debug": {
+            "detected_keywords": nlp_keywords,
+            "keyword_analysis": processing_details['keyword_analysis']
+        },
+        "processing_details": processing_details
+    }
+
+
+async def classify_content(
+    raw_text: str,
+    filename: Optional[str] = None,
+    defer_reply: bool = False,
+    message_id: Optional[str] = None,
+    in_reply_to: Optional[str] = None,
+    keyword_hint: Optional[KeywordHint] = None
+) -> Dict[str, Any]:
+    """
+    Executa NLP + classificação sobre o texto já extraído e monta o bloco `data` da resposta.
+    Com defer_reply=True, a resposta sugerida pode ficar pendente (consultar por reply_id).
+    Numa resposta a uma mensagem já classificada (pelo In-Reply-To ou pela conversa citada), só o trecho
+    novo passa pelo NLP e pela classificação, com o resumo da conversa no prompt da IA.
+    keyword_hint traz as keywords e a pré-classificação do texto inteiro já calculadas no lote.
+    """
+    logger.info("Processando email: %s", filename or 'texto direto')
+    
+    thread_store, thread = await _resolve_thread(raw_text, message_id, in_reply_to)
+    text = thread.text if thread else raw_text
+    # As keywords do lote são do texto inteiro: numa conversa conhecida, o trecho novo é extraído aqui
+    whole_text = thread is None or thread.parent is None
+    precomputed_keywords = keyword_hint.nlp_keywords if keyword_hint and whole_text else None
+    cache, cached, cache_key, nlp_keywords = await _lookup_cache(raw_text, text, precomputed_keywords)
+    
+    if cached:
+        ai_result = cached['ai_result']
+        logger.info("Classificação reaproveitada do cache (chave: %s): %s", cache_key, ai_result['category'])
+    else:
+        ai_result = await analyze_email(text, nlp_keywords, defer_reply=defer_reply,
+                                        thread_context=thread.context if thread else None, keyword_hint=keyword_hint)
+        logger.info("Email classificado como: %s", ai_result['category'])
+        await _record_fresh_result(cache, raw_text, nlp_keywords, ai_result)
+    
+    thread_report = await _record_thread(thread_store, thread, nlp_keywords, ai_result)
+    return _response_data(raw_text, filename, nlp_keywords, ai_result, cache, cached, cache_key, thread_report)
+
+
+def _classification_event(ai_result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "category": ai_result['category'],
+        "confidence_score": ai_result['confidence_score'],
+        "summary": ai_result['summary'],
+        "reason": ai_result.get('reason', ai_result['summary']),
+        "classification_method": _classification_method(ai_result)
+    }
+
+
+async def stream_content(raw_text: str, filename: Optional[str] = None, message_id: Optional[str] = None,
+                         in_reply_to: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Versão progressiva de classify_content: produz eventos (nome, dados) conforme cada etapa termina.
+    
+    - keywords: keywords extraídas e análise de keywords
+    - classification: categoria, confiança e razão (antes da resposta sugerida)
+    - reply_delta: trecho da resposta sugerida (só emails produtivos classificados sem fallback)
+    - done: bloco `data` completo, igual ao de POST /api/v1/process
+    
+    Em acerto de cache, os mesmos eventos saem de uma vez (a resposta em um único reply_delta).
+    """
+    logger.info("Processando email (streaming): %s", filename or 'texto direto')
+    
+    thread_store, thread = await _resolve_thread(raw_text, message_id, in_reply_to)
+    text = thread.text if thread else raw_text
+    cache, cached, cache_key, nlp_keywords = await _lookup_cache(raw_text, text)
+    
+    if cached:
+        ai_result = cached['ai_result']
+        logger.info("Classificação reaproveitada do cache (chave: %s): %s", cache_key, ai_result['category'])
+        yield 'keywords', {"detected_keywords": nlp_keywords, "keyword_analysis": ai_result.get('keyword_analysis')}
+        yield 'classification', _classification_event(ai_result)
+        if ai_result.get('suggested_response'):
+            yield 'reply_delta', {"text": ai_result['suggested_response']}
+    else:
+        ai_result = None
+        async for event, payload in analyze_email_stream(text, nlp_keywords, thread.context if thread else None):
+            if event == 'keywords':
+                yield 'keywords', {"detected_keywords": nlp_keywords, "keyword_analysis": payload}
+            elif event == 'classification':
+                yield 'classification', _classification_event(payload)
+            elif event == 'reply_delta':
+                yield 'reply_delta', {"text": payload}
+            else:
+                ai_result = payload
+        
+        logger.info("Email classificado como: %s", ai_result['category'])
+        await _record_fresh_result(cache, raw_text, nlp_keywords, ai_result)
+    
+    thread_report = await _record_thread(thread_store, thread, nlp_keywords, ai_result)
+    yield 'done', _response_data(raw_text, filename, nlp_keywords, ai_result, cache, cached, cache_key, thread_report)
@@ -0,0 +1,412 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import (
+    REPLY_LIBRARY_ENABLED,
+    REPLY_LIBRARY_THRESHOLD,
+    REPLY_LIBRARY_MAX_ENTRIES,
+    REPLY_LIBRARY_MIN_STEMS,
+    REPLY_LIBRARY_PATH
+)
+from app.services.context_builder import signature_name, split_quoted_history
+from app.utils.logger import logger
+from app.utils.metrics import record_reply_library_lookup
+
+
+# 2: modelos guardam os stems do email original citados na resposta (required_stems)
+LIBRARY_VERSION = 2
+
+# Dados do email trocados por campos no modelo, na ordem de busca (cada trecho casa com um tipo só:
+# a data de "R$ 10,00 em 05/03" não vira número de protocolo)
+_ENTITY_PATTERNS = (
+    ('email', re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')),
+    ('valor', re.compile(r'R\$\s?\d{1,3}(?:\.\d{3})*(?:,\d{2})?|R\$\s?\d+(?:,\d{2})?')),
+    ('data', re.compile(r'(?<![\d/])\d{1,2}/\d{1,2}(?:/\d{2,4})?(?![\d/])')),
+    # Protocolos, contratos, notas fiscais, CPF/CNPJ: 5+ caracteres começando e terminando em dígito
+    ('numero', re.compile(r'(?<![\w/])\d[\d./-]{3,}\d(?![\w/])'))
+)
+_PLACEHOLDER_RE = re.compile(r'\{(nome|primeiro_nome|email|valor|data|numero)(?:_\d+)?\}')
+# Nome na saudação que não veio do email ("Prezada Carla," com a assinatura fora do padrão): o modelo
+# cumprimentaria a pessoa errada
+_GREETING_NAME_RE = re.compile(
+    r'^\s*(?i:prezad[oa]s?(?:\(a\))?|car[oa]|ol[áa]|oi|bom dia|boa tarde|boa noite)'
+    r'(?:\s+(?i:sr\.?|sra\.?|senhor|senhora))?\s+([A-ZÀ-Ý][a-zà-ÿ]+)',
+    re.MULTILINE
+)
+# "Prezada {nome}" serviria mal a um remetente de outro gênero: a saudação do modelo fica neutra
+_GENDERED_GREETING_RE = re.compile(r'\b(Prezad|Car|prezad|car)[oa](\s+\{(?:primeiro_)?nome\})')
+# Palavras da resposta, para achar os stems do email original que ela cita ("março" -> "marc")
+_REPLY_WORD_RE = re.compile(r'[a-záéíóúâêîôûãõçà]{3,}')
+_GENERIC_GREETING_WORDS = {'Cliente', 'Senhor', 'Senhora', 'Colaborador', 'Colaboradora', 'Equipe', 'Time', 'Parceiro',
+                           'Parceira', 'Todos', 'Todas'}
+
+
+def extract_entities(raw_text: str) -> Dict[str, str]:
+    """
+    Dados do email que mudam de um pedido para outro, pelo nome do campo: nome e primeiro_nome (da assinatura),
+    email, valor, data e numero. Repetições do mesmo tipo viram data_2, numero_2...
+    Só o texto novo conta (a conversa citada tem os dados das mensagens anteriores).
+    """
+    text = split_quoted_history(raw_text)[0]
+    entities: Dict[str, str] = {}
+    
+    name = signature_name(text)
+    if name:
+        entities['nome'] = name
+        entities['primeiro_nome'] = name.split()[0]
+    
+    masked = text
+    for kind, pattern in _ENTITY_PATTERNS:
+        values: List[str] = []
+        for match in pattern.finditer(masked):
+            value = match.group(0)
+            if value not in values:
+                values.append(value)
+            masked = masked[:match.start()] + ' ' * len(value) + masked[match.end():]
+        for position, value in enumerate(values, start=1):
+            entities[kind if position == 1 else f"{kind}_{position}"] = value
+    return entities
+
+
+def make_template(reply: str, entities: Dict[str, str]) -> Optional[str]:
+    """
+    Troca na resposta os dados do email pelos campos ({nome}, {numero}...). None se a resposta não
+    servir de modelo: ainda cita datas, valores ou números que não vieram do email, ou saúda alguém pelo nome.
+    """
+    if '{' in reply or '}' in reply:
+        return None
+    
+    template = reply
+    # Mais longos primeiro: "Carla Souza" antes de "Carla", "12345-6" antes de "12345"
+    for placeholder, value in sorted(entities.items(), key=lambda item: len(item[1]), reverse=True):
+        template = re.sub(rf'(?<!\w){re.escape(value)}(?!\w)', f"{{{placeholder}}}", template)
+    
+    if any(pattern.search(template) for kind, pattern in _ENTITY_PATTERNS if kind != 'email'):
+        return None
+    for match in _GREETING_NAME_RE.finditer(template):
+        if match.group(1) not in _GENERIC_GREETING_WORDS:
+            return None
+    return _GENDERED_GREETING_RE.sub(r'\1o(a)\2', template)
+
+
+def mentioned_stems(template: str, stems: Set[str]) -> List[str]:
+    """
+    Stems do email original que o modelo ainda cita (alguma palavra começa pelo stem), fora dos campos.
+    Um email novo só recebe o modelo se tiver todos: "boleto de março" não serve a quem pediu o de abril.
+    """
+    words = set(_REPLY_WORD_RE.findall(_PLACEHOLDER_RE.sub(' ', template).lower()))
+    return sorted(stem for stem in stems if any(word.startswith(stem) for word in words))
+
+
+def template_placeholders(template: str) -> List[str]:
+    return sorted({match.group(0)[1:-1] for match in _PLACEHOLDER_RE.finditer(template)})
+
+
+def fill_template(template: str, entities: Dict[str, str]) -> Optional[str]:
+    """
+    Preenche os campos do modelo com os dados do email; None se faltar algum.
+    """
+    if any(placeholder not in entities for placeholder in template_placeholders(template)):
+        return None
+    return _PLACEHOLDER_RE.sub(lambda match: entities[match.group(0)[1:-1]], template)
+
+
+@dataclass
+class ReplyTemplate:
+    entry_id: str
+    stems: List[str]
+    template: str
+    placeholders: List[str]
+    created_at: float
+    uses: int = 0
+    last_used_at: Optional[float] = None
+    required_stems: List[str] = field(default_factory=list)
+
+    def serves(self, stems: Set[str], entities: Dict[str, str]) -> bool:
+        return set(self.required_stems) <= stems and set(self.placeholders) <= entities.keys()
+
+
+@dataclass
+class ReplyLibraryMatch:
+    entry_id: str
+    similarity: float
+    reply: str
+
+
+class ReplyLibrary:
+    """
+    Respostas do Gemini guardadas como modelos, recuperadas pelo cosseno TF-IDF entre os stems do email
+    novo e os do email que originou cada modelo. Índice invertido stem -> modelos: a consulta só pontua
+    modelos com algum stem em comum. Limitada a `max_entries` modelos, com despejo LRU (uso mais antigo).
+    """
+
+    def __init__(self, threshold: float, max_entries: int, min_stems: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.min_stems = min_stems
+        self.hits = 0
+        self.misses = 0
+        self.unfilled = 0
+        self.rejected = 0
+        self.dirty = False
+        self._entries: 'OrderedDict[str, ReplyTemplate]' = OrderedDict()
+        self._postings: Dict[str, Set[str]] = {}
+        # Normas dos modelos dependem do IDF, que muda a cada inclusão/remoção: recalculadas sob demanda
+        self._norms: Optional[Dict[str, float]] = None
+        self._lock = threading.Lock()
+
+    def _idf(self, stem: str) -> float:
+        return math.log((1 + len(self._entries)) / (1 + len(self._postings.get(stem, ())))) + 1
+
+    def _ranked(self, stems: Set[str]) -> List[Tuple[float, str]]:
+        """
+        (similaridade, entry_id) dos modelos com algum stem em comum, do mais parecido ao menos.
+        """
+        if self._norms is None:
+            self._norms = {
+                entry_id: math.sqrt(sum(self._idf(stem) ** 2 for stem in entry.stems))
+                for entry_id, entry in self._entries.items()
+            }
+        
+        dot: Dict[str, float] = {}
+        query_norm = 0.0
+        for stem in stems:
+            weight = self._idf(stem) ** 2
+            query_norm += weight
+            for entry_id in self._postings.get(stem, ()):
+                dot[entry_id] = dot.get(entry_id, 0.0) + weight
+        
+        query_norm = math.sqrt(query_norm)
+        return sorted(((score / (query_norm * self._norms[entry_id]), entry_id) for entry_id, score in dot.items()),
+                      reverse=True)
+
+    def match(self, raw_text: str, nlp_keywords: str) -> Optional[ReplyLibraryMatch]:
+        """
+        Modelo mais parecido (>= threshold) que possa ser preenchido com os dados deste email e cujos
+        detalhes citados (required_stems) também estejam nele. O uso só é contado em mark_used (a resposta não é usada se a IA classificar o email como improdutivo).
+        """
+        stems = set(nlp_keywords.split())
+        if len(stems) < self.min_stems:
+            record_reply_library_lookup('short')
+            return None
+        
+        with self._lock:
+            candidates = [(similarity, self._entries[entry_id]) for similarity, entry_id in self._ranked(stems)
+                          if similarity >= self.threshold]
+        
+        if candidates:
+            entities = extract_entities(raw_text)
+            for similarity, entry in candidates:
+                if not entry.serves(stems, entities):
+                    continue
+                reply = fill_template(entry.template, entities)
+                if reply is not None:
+                    self.hits += 1
+                    record_reply_library_lookup('hit')
+                    return ReplyLibraryMatch(entry.entry_id, round(similarity, 4), reply)
+            self.unfilled += 1
+            record_reply_library_lookup('unfilled')
+            return None
+        
+        self.misses += 1
+        record_reply_library_lookup('miss')
+        return None
+
+    def mark_used(self, entry_id: str) -> None:
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return
+            entry.uses += 1
+            entry.last_used_at = time.time()
+            self._entries.move_to_end(entry_id)
+            self.dirty = True
+
+    def add(self, raw_text: str, nlp_keywords: str, reply: str) -> Optional[str]:
+        """
+        Guarda a resposta do Gemini como modelo. Retorna o entry_id, ou None se o email for curto demais,
+        se a resposta não servir de modelo ou se já houver um modelo parecido que atenda este email.
+        """
+        stems = set(nlp_keywords.split())
+        if len(stems) < self.min_stems:
+            return None
+        
+        entities = extract_entities(raw_text)
+        with self._lock:
+            for similarity, entry_id in self._ranked(stems):
+                if similarity < self.threshold:
+                    break
+                if self._entries[entry_id].serves(stems, entities):
+                    return None
+        
+        template = make_template(reply, entities)
+        if template is None:
+            self.rejected += 1
+            return None
+        
+        entry = ReplyTemplate(uuid.uuid4().hex[:16], sorted(stems), template, template_placeholders(template), time.time(),
+                              required_stems=mentioned_stems(template, stems))
+        self._insert(entry)
+        return entry.entry_id
+
+    def _insert(self, entry: ReplyTemplate) -> None:
+        with self._lock:
+            self._entries[entry.entry_id] = entry
+            for stem in entry.stems:
+                self._postings.setdefault(stem, set()).add(entry.entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._norms = None
+            self.dirty = True
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id)
+        for stem in entry.stems:
+            postings = self._postings[stem]
+            postings.discard(entry_id)
+            if not postings:
+                del self._postings[stem]
+        self._norms = None
+        self.dirty = True
+
+    def remove(self, entry_id: str) -> bool:
+        with self._lock:
+            if entry_id not in self._entries:
+                return False
+            self._remove(entry_id)
+            return True
+
+    def prune(self, min_uses: Optional[int] = None, unused_days: Optional[float] = None) -> List[str]:
+        """
+        Remove os modelos com menos de `min_uses` usos e/ou sem uso (nem criação) há mais de `unused_days` dias;
+        com os dois critérios, só os que atendem a ambos. Retorna os entry_ids removidos.
+        """
+        cutoff = time.time() - unused_days * 86400 if unused_days is not None else None
+        with self._lock:
+            removed = [
+                entry.entry_id for entry in self._entries.values()
+                if (min_uses is None or entry.uses < min_uses)
+                and (cutoff is None or (entry.last_used_at or entry.created_at) < cutoff)
+            ]
+            for entry_id in removed:
+                self._remove(entry_id)
+        return removed
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            return asdict(entry) if entry else None
+
+    def entries(self, limit: int = 50, offset: int = 0, order: str = 'uses') -> List[Dict[str, Any]]:
+        """
+        Modelos ordenados por usos ('uses'), uso mais recente ('recent') ou criação ('created'), do maior ao menor.
+        """
+        keys = {
+            'uses': lambda entry: (entry.uses, entry.last_used_at or 0.0),
+            'recent': lambda entry: entry.last_used_at or entry.created_at,
+            'created': lambda entry: entry.created_at
+        }
+        with self._lock:
+            entries = sorted(self._entries.values(), key=keys[order], reverse=True)[offset:offset + limit]
+            return [asdict(entry) for entry in entries]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.unfilled
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'unfilled': self.unfilled,
+            'rejected': self.rejected,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Grava a biblioteca (do uso mais antigo ao mais recente) com escrita atômica. Cada worker do uvicorn
+        grava a própria cópia no mesmo arquivo (a última prevalece); o arquivo temporário é único por gravação
+        para que gravações simultâneas não misturem conteúdo.
+        """
+        with self._lock:
+            entries = [asdict(entry) for entry in self._entries.values()]
+            self.dirty = False
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory or '.',
+                                         prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as file:
+            try:
+                json.dump({'version': LIBRARY_VERSION, 'saved_at': time.time(), 'entries': entries}, file,
+                          ensure_ascii=False)
+            except BaseException:
+                file.close()
+                os.unlink(file.name)
+                raise
+        os.replace(file.name, path)
+
+    def load(self, path: str) -> int:
+        """
+        Carrega uma biblioteca salva; retorna o número de modelos. Arquivo ausente = biblioteca vazia.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return 0
+        
+        if data.get('version') != LIBRARY_VERSION:
+            raise ValueError(f"Biblioteca de respostas incompatível em {path}")
+        for entry in data['entries'][-self.max_entries:]:
+            self._insert(ReplyTemplate(**entry))
+        self.dirty = False
+        return len(self._entries)
+
+
+_reply_library: Optional[ReplyLibrary] = None
+_reply_library_lock = threading.Lock()
+
+
+def get_reply_library() -> Optional[ReplyLibrary]:
+    """
+    Biblioteca compartilhada (None com REPLY_LIBRARY_ENABLED=false), carregada de REPLY_LIBRARY_PATH
+    na primeira chamada (idealmente no warm-up da API).
+    """
+    global _reply_library
+    if not REPLY_LIBRARY_ENABLED:
+        return None
+    if _reply_library is None:
+        with _reply_library_lock:
+            if _reply_library is None:
+                library = ReplyLibrary(REPLY_LIBRARY_THRESHOLD, REPLY_LIBRARY_MAX_ENTRIES, REPLY_LIBRARY_MIN_STEMS)
+                if REPLY_LIBRARY_PATH:
+                    try:
+                        logger.info(f"Biblioteca de respostas: {library.load(REPLY_LIBRARY_PATH)} modelos carregados")
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        logger.error(f"Biblioteca de respostas inválida em {REPLY_LIBRARY_PATH}, começando vazia: {str(e)}")
+                _reply_library = library
+    return _reply_library
+
+
+def save_reply_library() -> None:
+    """
+    Salva a biblioteca em REPLY_LIBRARY_PATH se mudou desde a última gravação.
+    """
+    library = _reply_library
+    if library is None or not REPLY_LIBRARY_PATH or not library.dirty:
+        return
+    try:
+        library.save(REPLY_LIBRARY_PATH)
+    except OSError as e:
+        logger.warning(f"Falha ao salvar a biblioteca de respostas em {REPLY_LIBRARY_PATH}: {str(e)}")
@@ -0,0 +1,101 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import REPLY_STORE_MAX_ENTRIES, REPLY_STORE_TTL_SECONDS
+from app.services.ai_handler import generate_reply_with_ai
+from app.services.cache import get_classification_cache
+from app.services.near_duplicate import get_near_duplicate_index
+from app.services.reply_library import get_reply_library
+from app.utils.logger import logger
+from app.utils.metrics import stage_timer, start_stage_timings
+from app.utils.singleflight import SingleFlight
+from app.utils.text import content_hash
+
+
+class ReplyStore:
+    """
+    Respostas sugeridas geradas em segundo plano, consultadas depois pelo reply_id.
+    Limitado em quantidade e validade; entradas despejadas têm a geração cancelada.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[float, asyncio.Task]]' = OrderedDict()
+        self._flight = SingleFlight('generate_reply')
+
+    def schedule(self, raw_text: str, nlp_keywords: str, ai_result: Dict[str, Any]) -> str:
+        reply_id = uuid.uuid4().hex
+        task = asyncio.create_task(self._generate(raw_text, nlp_keywords, ai_result))
+        self._entries[reply_id] = (time.monotonic() + self.ttl_seconds, task)
+        self._evict()
+        return reply_id
+
+    async def get(self, reply_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Aguarda a resposta por até `timeout` segundos. Retorna None se o reply_id não existir ou expirou.
+        """
+        self._evict()
+        entry = self._entries.get(reply_id)
+        if entry is None:
+            return None
+        
+        _, task = entry
+        try:
+            reply = await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            return {'reply_id': reply_id, 'status': 'pending', 'suggested_response': None, 'message': None}
+        except Exception as e:
+            return {'reply_id': reply_id, 'status': 'failed', 'suggested_response': None, 'message': str(e)}
+        
+        return {'reply_id': reply_id, 'status': 'ready', 'suggested_response': reply, 'message': None}
+
+    async def _generate(self, raw_text: str, nlp_keywords: str, ai_result: Dict[str, Any]) -> Optional[str]:
+        # A task herda o contexto da requisição: usa tempos próprios para não alterar os de uma resposta já enviada
+        start_stage_timings()
+        try:
+            with stage_timer('ai_reply'):
+                # Cópias do mesmo email agendadas juntas geram a resposta uma única vez
+                reply = await self._flight.do(content_hash(raw_text), lambda: generate_reply_with_ai(raw_text))
+        except Exception as e:
+            logger.warning(f"IA falhou ao gerar resposta adiada: {str(e)}")
+            raise
+        
+        # Resultado completo pode ir para o cache: próximas cópias do email já saem com resposta
+        result = {key: value for key, value in ai_result.items() if key != 'reply_pending'}
+        result.update({'suggested_response': reply, 'reply_source': 'ai' if reply else None, 'used_ai': True})
+        cache = get_classification_cache()
+        if cache:
+            await cache.store(raw_text, nlp_keywords, result)
+        near_duplicate_index = get_near_duplicate_index()
+        if near_duplicate_index and not result.get('used_near_duplicate'):
+            near_duplicate_index.add(nlp_keywords, result)
+        reply_library = get_reply_library()
+        if reply_library and reply:
+            reply_library.add(raw_text, nlp_keywords, reply)
+        
+        return reply
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            reply_id, (expires_at, task) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and expires_at >= now:
+                break
+            
+            self._entries.pop(reply_id)
+            if not task.done():
+                task.cancel()
+
+
+_reply_store: Optional[ReplyStore] = None
+
+
+def get_reply_store() -> ReplyStore:
+    global _reply_store
+    if _reply_store is None:
+        _reply_store = ReplyStore(REPLY_STORE_MAX_ENTRIES, REPLY_STORE_TTL_SECONDS)
+    return _reply_store
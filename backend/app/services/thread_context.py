@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.config import (
+    THREAD_STORE_BACKEND,
+    THREAD_STORE_TTL_SECONDS,
+    THREAD_STORE_MAX_ENTRIES,
+    THREAD_STORE_MAX_MEMORY_MB,
+    THREAD_STORE_SQLITE_PATH,
+    THREAD_CONTEXT_MAX_KEYWORDS
+)
+from app.services.cache import CacheBackend, MemoryCacheBackend, SQLiteCacheBackend
+from app.services.context_builder import split_quoted_history
+from app.utils.logger import logger
+from app.utils.metrics import record_thread_lookup
+from app.utils.text import normalize_text
+
+
+# "Assunto: ..." que parse_mime põe no início e os anexos ([Anexo: ...]) no fim não aparecem
+# quando a mensagem é citada numa resposta
+_SUBJECT_RE = re.compile(r'^\s*(?:assunto|subject)\s*:', re.IGNORECASE)
+_ATTACHMENT_MARKER = '[Anexo: '
+# Marcadores de citação de qualquer nível (">", "> >", ">>"): a mesma mensagem aparece com um nível a mais em cada resposta
+_QUOTE_MARKS_RE = re.compile(r'^[\s>]+')
+
+
+def message_key(text: str) -> Optional[str]:
+    """
+    Chave de conteúdo da mensagem inteira (texto novo + conversa citada), igual à da mesma mensagem
+    citada numa resposta: sem assunto, anexos, marcadores ">" e diferenças de espaços e quebras de linha.
+    """
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').strip().split('\n')
+    if lines and _SUBJECT_RE.match(lines[0]):
+        lines = lines[1:]
+    
+    kept: List[str] = []
+    for line in lines:
+        if line.startswith(_ATTACHMENT_MARKER):
+            break
+        kept.append(_QUOTE_MARKS_RE.sub('', line))
+    
+    body = normalize_text(' '.join(kept))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest() if body else None
+
+
+@dataclass
+class ThreadState:
+    """
+    Estado da conversa depois de uma mensagem: o que a próxima resposta recebe como contexto.
+    """
+    thread_id: str
+    # Mensagens da conversa vistas até esta (inclusive)
+    messages: int
+    category: str
+    summary: str
+    # Stems da conversa, dos mais recentes para os mais antigos
+    keywords: List[str] = field(default_factory=list)
+
+    def prompt_context(self) -> str:
+        return (
+            f"Mensagens anteriores já classificadas: {self.messages}\n"
+            f"Classificação da última: {self.category}\n"
+            f"Resumo da última: {self.summary}\n"
+            f"Palavras-chave da conversa: {' '.join(self.keywords)}"
+        )
+
+
+@dataclass
+class ThreadMatch:
+    """
+    Resultado da busca da conversa de uma mensagem. Com a conversa conhecida, `text` é só o trecho novo.
+    """
+    text: str
+    original_chars: int
+    # Chaves desta mensagem no store (Message-ID e conteúdo), para as respostas a ela
+    keys: List[str]
+    parent: Optional[ThreadState] = None
+    # 'in_reply_to' ou 'quoted_text'; None se a conversa não era conhecida
+    matched_by: Optional[str] = None
+
+    @property
+    def context(self) -> Optional[str]:
+        return self.parent.prompt_context() if self.parent else None
+
+    def report(self, state: ThreadState) -> Dict[str, Any]:
+        return {
+            'thread_id': state.thread_id,
+            'position': state.messages,
+            'matched_by': self.matched_by,
+            'previous_category': self.parent.category if self.parent else None,
+            'processed_chars': len(self.text),
+            'original_chars': self.original_chars
+        }
+
+
+class ThreadStore:
+    """
+    Estado por conversa, guardado sob cada mensagem (Message-ID e chave de conteúdo). Uma resposta encontra
+    a mensagem anterior pelo In-Reply-To ou pela conversa citada; reusa os backends do cache (valores JSON).
+    Como no ClassificationCache, as chamadas a backends bloqueantes (SQLite) rodam numa thread, fora do event loop.
+    """
+
+    def __init__(self, backend: CacheBackend, max_keywords: int):
+        self.backend = backend
+        self.max_keywords = max_keywords
+        self.hits = {'in_reply_to': 0, 'quoted_text': 0}
+        self.misses = 0
+
+    async def _call(self, func, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    def _set_all(self, keys: List[str], value: str) -> None:
+        for key in keys:
+            self.backend.set(key, value)
+
+    async def _get(self, key: str) -> Optional[ThreadState]:
+        value = await self._call(self.backend.get, key)
+        return ThreadState(**json.loads(value)) if value else None
+
+    async def resolve(self, raw_text: str, message_id: Optional[str] = None,
+                in_reply_to: Optional[str] = None) -> ThreadMatch:
+        delta, quoted = split_quoted_history(raw_text)
+        
+        keys = [f"thread:mid:{message_id.strip()}"] if message_id and message_id.strip() else []
+        own_key = message_key(raw_text)
+        if own_key:
+            keys.append(f"thread:text:{own_key}")
+        
+        parent, matched_by = None, None
+        if in_reply_to and in_reply_to.strip():
+            parent, matched_by = await self._get(f"thread:mid:{in_reply_to.strip()}"), 'in_reply_to'
+        if parent is None and quoted:
+            parent_key = message_key(quoted)
+            if parent_key:
+                parent, matched_by = await self._get(f"thread:text:{parent_key}"), 'quoted_text'
+        
+        # Conversa desconhecida ou resposta sem texto novo (só cita): processa a mensagem inteira
+        if parent is None or not delta.strip():
+            self.misses += 1
+            record_thread_lookup('miss')
+            return ThreadMatch(raw_text, len(raw_text), keys)
+        
+        self.hits[matched_by] += 1
+        record_thread_lookup(matched_by)
+        return ThreadMatch(delta, len(raw_text), keys, parent, matched_by)
+
+    async def record(self, match: ThreadMatch, nlp_keywords: str, ai_result: Dict[str, Any]) -> ThreadState:
+        parent = match.parent
+        keywords = list(dict.fromkeys(nlp_keywords.split() + (parent.keywords if parent else [])))
+        state = ThreadState(
+            thread_id=parent.thread_id if parent else uuid.uuid4().hex[:16],
+            messages=(parent.messages if parent else 0) + 1,
+            category=ai_result['category'],
+            summary=ai_result.get('summary') or ai_result.get('reason') or '',
+            keywords=keywords[:self.max_keywords]
+        )
+        
+        value = json.dumps(asdict(state), ensure_ascii=False)
+        await self._call(self._set_all, match.keys, value)
+        return state
+
+    async def stats(self) -> Dict[str, Any]:
+        total_hits = sum(self.hits.values())
+        lookups = total_hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'entries': await self._call(len, self.backend),
+            'hits': total_hits,
+            'hits_by_key': dict(self.hits),
+            'misses': self.misses,
+            'hit_rate': round(total_hits / lookups, 4) if lookups else 0.0
+        }
+
+
+_thread_store: Optional[ThreadStore] = None
+
+
+def get_thread_store() -> Optional[ThreadStore]:
+    """
+    Retorna o store configurado por THREAD_STORE_BACKEND ('memory', 'sqlite' ou 'none').
+    """
+    global _thread_store
+    if _thread_store is not None or THREAD_STORE_BACKEND == 'none':
+        return _thread_store
+    
+    if THREAD_STORE_BACKEND == 'sqlite':
+        backend = SQLiteCacheBackend(THREAD_STORE_SQLITE_PATH, THREAD_STORE_TTL_SECONDS, THREAD_STORE_MAX_ENTRIES,
+                                     table='thread_state')
+    elif THREAD_STORE_BACKEND == 'memory':
+        backend = MemoryCacheBackend(THREAD_STORE_TTL_SECONDS, THREAD_STORE_MAX_ENTRIES,
+                                     THREAD_STORE_MAX_MEMORY_MB * 1024 * 1024)
+    else:
+        logger.warning(f"THREAD_STORE_BACKEND desconhecido '{THREAD_STORE_BACKEND}', contexto de conversas desativado")
+        return None
+    
+    _thread_store = ThreadStore(backend, THREAD_CONTEXT_MAX_KEYWORDS)
+    return _thread_store
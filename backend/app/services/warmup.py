@@ -0,0 +1,99 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.ai_handler import get_keyword_matcher, warm_up_ai_client
+from app.services.local_model import get_local_model
+from app.services.near_duplicate import get_near_duplicate_index
+from app.services.nlp_engine import extract_keywords
+from app.services.reply_library import get_reply_library
+from app.utils.concurrency import run_cpu_bound, warm_up_cpu_executor
+from app.utils.logger import logger
+from app.utils.metrics import record_warm_up
+
+
+@dataclass
+class _Component:
+    # Sem um componente obrigatório a API não consegue classificar; os opcionais têm alternativa
+    # (sem cliente de IA, fallback por keywords; sem modelo local, índice de quase-duplicatas ou biblioteca
+    # de respostas, o Gemini decide)
+    required: bool
+    status: str = 'pending'
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class WarmUpState:
+    """
+    Estado do warm-up feito na inicialização, consultado pela readiness (/health/ready).
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.seconds: Optional[float] = None
+        self.components: Dict[str, _Component] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.seconds is not None and all(
+            component.status == 'ready' for component in self.components.values() if component.required
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'finished': self.seconds is not None,
+            'seconds': self.seconds if self.seconds is not None else round(time.monotonic() - self.started, 3),
+            'components': {
+                name: {'status': component.status, 'required': component.required, 'seconds': component.seconds,
+                       'error': component.error}
+                for name, component in self.components.items()
+            }
+        }
+
+    async def run(self, name: str, required: bool, warm: Callable[[], Awaitable[Any]]) -> None:
+        component = self.components[name] = _Component(required=required)
+        start = time.perf_counter()
+        try:
+            await warm()
+            component.status = 'ready'
+        except Exception as e:
+            component.status = 'failed'
+            component.error = str(e)
+            log = logger.error if required else logger.warning
+            log(f"Warm-up de {name} falhou: {str(e)}")
+        finally:
+            component.seconds = round(time.perf_counter() - start, 3)
+            record_warm_up(name, component.seconds)
+
+
+async def _warm_nlp() -> None:
+    # Cria o pool de CPU e passa um texto pelo extrator: importa o nltk, carrega stopwords,
+    # stemmer e tokenizador e falha aqui (não na primeira requisição) se faltarem os dados do NLTK
+    await warm_up_cpu_executor()
+    await run_cpu_bound(extract_keywords, 'aquecimento do extrator de palavras-chave')
+
+
+async def warm_up(state: WarmUpState) -> None:
+    """
+    Prepara, em paralelo, tudo o que a primeira requisição pagaria: NLP, cliente de IA,
+    keywords de pré-classificação, modelo local, índice de quase-duplicatas e biblioteca de respostas.
+    """
+    await asyncio.gather(
+        state.run('nlp', True, _warm_nlp),
+        state.run('ai_client', False, lambda: asyncio.to_thread(warm_up_ai_client)),
+        state.run('keyword_matcher', True, lambda: asyncio.to_thread(get_keyword_matcher)),
+        state.run('local_model', False, lambda: asyncio.to_thread(get_local_model)),
+        state.run('near_duplicate', False, lambda: asyncio.to_thread(get_near_duplicate_index)),
+        state.run('reply_library', False, lambda: asyncio.to_thread(get_reply_library))
+    )
+    state.seconds = round(time.monotonic() - state.started, 3)
+    logger.info(f"Warm-up concluído em {state.seconds}s (pronto: {state.ready})")
+
+
+_warm_up_state = WarmUpState()
+
+
+def get_warm_up_state() -> WarmUpState:
+    return _warm_up_state
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.utils.logger import logger
+from app.utils.metrics import record_circuit_state
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por taxa de erro e de chamadas lentas sobre as últimas `window_size` chamadas.
+    
+    - closed: chamadas liberadas; abre quando a taxa de falhas ou de lentidão passa do limite
+      (com pelo menos `min_calls` chamadas na janela).
+    - open: chamadas recusadas na hora; após `open_seconds`, passa a half_open.
+    - half_open: libera até `half_open_probes` chamadas de teste; sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float, slow_call_seconds: float,
+                 slow_call_rate_threshold: float, window_size: int, min_calls: int, open_seconds: float,
+                 half_open_probes: int = 1, enabled: bool = True):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.enabled = enabled
+        self.state = CLOSED
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=max(1, window_size))
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Se uma chamada pode ser feita agora. Em half_open, reserva uma vaga de teste, liberada
+        por record_success/record_failure/release.
+        """
+        if not self.enabled:
+            return True
+        
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN)
+            
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    return False
+                self._probes_in_flight += 1
+            
+            return True
+
+    def record_success(self, elapsed: float) -> None:
+        self._record(failed=False, slow=elapsed >= self.slow_call_seconds)
+
+    def record_failure(self, elapsed: float) -> None:
+        self._record(failed=True, slow=elapsed >= self.slow_call_seconds)
+
+    def release(self) -> None:
+        """
+        Chamada abandonada sem resultado (ex.: cancelada): só devolve a vaga de teste.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._transition(OPEN if failed or slow else CLOSED)
+                return
+            
+            if self.state == OPEN:
+                return
+            
+            self._window.append((failed, slow))
+            if len(self._window) < self.min_calls:
+                return
+            
+            failure_rate, slow_call_rate = self._rates()
+            if failure_rate >= self.failure_rate_threshold or slow_call_rate >= self.slow_call_rate_threshold:
+                self._transition(OPEN)
+
+    def _rates(self) -> Tuple[float, float]:
+        if not self._window:
+            return 0.0, 0.0
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow_calls = sum(1 for _, slow in self._window if slow)
+        return failures / len(self._window), slow_calls / len(self._window)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            if state == OPEN:
+                self._opened_at = time.monotonic()
+            return
+        
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            failure_rate, slow_call_rate = self._rates()
+            logger.warning(
+                f"Circuito '{self.name}' aberto ({previous} -> open): falhas {failure_rate:.0%}, "
+                f"lentas {slow_call_rate:.0%}; novas chamadas vão direto ao fallback por {self.open_seconds:.0f}s"
+            )
+        elif state == CLOSED:
+            self._window.clear()
+            logger.info(f"Circuito '{self.name}' fechado ({previous} -> closed)")
+        
+        self._probes_in_flight = 0
+        record_circuit_state(self.name, state)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failure_rate, slow_call_rate = self._rates()
+            retry_in: Optional[float] = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1)
+            return {
+                'enabled': self.enabled,
+                'state': self.state,
+                'calls_in_window': len(self._window),
+                'failure_rate': round(failure_rate, 3),
+                'slow_call_rate': round(slow_call_rate, 3),
+                'retry_in_seconds': retry_in
+            }
+
+
+class RetryBudget:
+    """
+    Limita as retentativas a uma fração das requisições recentes (mais um mínimo por segundo),
+    para que retentativas não multipliquem a carga sobre um provedor já degradado.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, window_seconds: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window_seconds = window_seconds
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            
+            allowed = self.min_per_second * self.window_seconds + self.ratio * len(self._requests)
+            if len(self._retries) >= allowed:
+                return False
+            
+            self._retries.append(now)
+            return True
+
+    def refund(self) -> None:
+        """
+        Devolve a última retentativa reservada, quando ela acaba não sendo feita.
+        """
+        with self._lock:
+            if self._retries:
+                self._retries.pop()
+
+    def _expire(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window_seconds:
+                events.popleft()
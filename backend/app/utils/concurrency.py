@@ -0,0 +1,146 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from app.config import (
+    MAX_CONCURRENT_REQUESTS,
+    REQUEST_QUEUE_TIMEOUT,
+    NLP_EXECUTOR_WORKERS,
+    CPU_EXECUTOR_MODE,
+    CPU_MAX_PENDING,
+    CPU_TASK_TIMEOUT
+)
+from app.utils.exceptions import ServerBusyException, StageTimeoutException
+from app.utils.logger import logger
+
+
+_cpu_executor: Optional[Executor] = None
+_processing_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+_cpu_pending_semaphore = asyncio.Semaphore(CPU_MAX_PENDING)
+
+
+def uses_process_pool() -> bool:
+    """
+    Com o pool de processos, argumentos e resultados precisam ser serializáveis (ex.: bytes, não arquivos).
+    """
+    return CPU_EXECUTOR_MODE == 'process'
+
+
+def _warm_worker() -> None:
+    """
+    Inicializador dos workers: carrega stopwords e stemmer antes da primeira tarefa.
+    """
+    from app.services.nlp_engine import get_keyword_extractor
+    
+    try:
+        get_keyword_extractor()
+    except Exception as e:
+        # Não derrubar o pool: as tarefas de NLP vão reportar o erro normalmente
+        logger.error(f"Falha ao pré-carregar NLP no worker: {str(e)}")
+
+
+def _get_cpu_executor() -> Executor:
+    global _cpu_executor
+    if _cpu_executor is None:
+        if uses_process_pool():
+            _cpu_executor = ProcessPoolExecutor(
+                max_workers=NLP_EXECUTOR_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_warm_worker
+            )
+        else:
+            _cpu_executor = ThreadPoolExecutor(
+                max_workers=NLP_EXECUTOR_WORKERS,
+                thread_name_prefix='nlp-worker'
+            )
+    return _cpu_executor
+
+
+def _release_pending_slot(loop: asyncio.AbstractEventLoop) -> None:
+    # Chamado pela thread do executor quando a tarefa termina: o semáforo só pode ser mexido no loop
+    try:
+        loop.call_soon_threadsafe(_cpu_pending_semaphore.release)
+    except RuntimeError:
+        # Loop já fechado (desligamento): não há mais quem espere pela vaga
+        pass
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Executa trabalho de CPU (NLP, parsing) fora do event loop, num pool limitado de threads ou processos.
+    No máximo CPU_MAX_PENDING tarefas ficam em voo (backpressure) e cada uma tem CPU_TASK_TIMEOUT segundos.
+    A vaga só é devolvida quando a tarefa termina de fato: depois de um timeout ela continua ocupando o pool.
+    """
+    try:
+        await asyncio.wait_for(_cpu_pending_semaphore.acquire(), timeout=REQUEST_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ServerBusyException("Servidor ocupado. Tente novamente em alguns instantes.")
+    
+    loop = asyncio.get_running_loop()
+    try:
+        try:
+            future = _get_cpu_executor().submit(functools.partial(func, *args, **kwargs))
+        except BaseException:
+            _cpu_pending_semaphore.release()
+            raise
+        future.add_done_callback(lambda _: _release_pending_slot(loop))
+        
+        # Ao estourar o tempo, wait_for cancela o future: uma tarefa ainda na fila nem chega a rodar
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=CPU_TASK_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise StageTimeoutException(f"Tempo limite excedido na etapa {getattr(func, '__name__', 'de processamento')}")
+    except BrokenProcessPool:
+        # Um worker morreu: recriar o pool na próxima tarefa
+        logger.error("Pool de processos quebrado, recriando")
+        shutdown_executors()
+        raise StageTimeoutException("Worker de processamento indisponível. Tente novamente.")
+
+
+async def warm_up_cpu_executor() -> None:
+    """
+    Cria o pool e pré-aquece todos os workers (no modo processo, cada worker roda o inicializador).
+    """
+    executor = _get_cpu_executor()
+    loop = asyncio.get_running_loop()
+    
+    if uses_process_pool():
+        await asyncio.gather(*(loop.run_in_executor(executor, int) for _ in range(NLP_EXECUTOR_WORKERS)))
+    else:
+        await loop.run_in_executor(executor, _warm_worker)
+
+
+@asynccontextmanager
+async def processing_slot():
+    """
+    Limita o número de processamentos simultâneos por worker.
+    Se nenhuma vaga abrir dentro de REQUEST_QUEUE_TIMEOUT, rejeita com ServerBusyException.
+    """
+    try:
+        await asyncio.wait_for(_processing_semaphore.acquire(), timeout=REQUEST_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ServerBusyException("Servidor ocupado. Tente novamente em alguns instantes.")
+    
+    try:
+        yield
+    finally:
+        _processing_semaphore.release()
+
+
+async def save_periodically(interval: float, save: Callable[[], None]) -> None:
+    """
+    Chama `save` numa thread a cada `interval` segundos, até a task ser cancelada.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(save)
+
+
+def shutdown_executors() -> None:
+    global _cpu_executor
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=False, cancel_futures=True)
+        _cpu_executor = None
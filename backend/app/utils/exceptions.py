@@ -16,3 +16,38 @@ class NLPProcessingException(EmailClassifierException):
 
 class AIAPIException(EmailClassifierException):
     pass
+
+
+class CircuitOpenException(AIAPIException):
+    pass
+
+
+class QuotaExhaustedException(AIAPIException):
+    pass
+
+
+class ServerBusyException(EmailClassifierException):
+    pass
+
+
+class StageTimeoutException(EmailClassifierException):
+    pass
+
+
+# Códigos de erro das respostas por item (lotes) e dos eventos de erro (streaming)
+_ERROR_CODES = (
+    (InvalidFileException, 'INVALID_FILE'),
+    (InvalidTextException, 'INVALID_TEXT'),
+    (NLPProcessingException, 'NLP_PROCESSING_ERROR'),
+    (AIAPIException, 'AI_API_ERROR'),
+    (ServerBusyException, 'SERVER_BUSY'),
+    (StageTimeoutException, 'STAGE_TIMEOUT'),
+    (EmailClassifierException, 'CLASSIFIER_ERROR'),
+)
+
+
+def error_code_for(exc: Exception) -> str:
+    for exc_type, error_code in _ERROR_CODES:
+        if isinstance(exc, exc_type):
+            return error_code
+    return 'INTERNAL_ERROR'
@@ -1,12 +1,140 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from app.config import LOG_LEVEL, LOG_FORMAT, LOG_ASYNC, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES
+from app.utils.metrics import record_log_discarded
+
+
+_TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Id da requisição atual (middleware de requisições), incluído em todos os registros feitos durante ela
+_request_id: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
+# Atributos de todo LogRecord: o que sobra veio de `extra=` e vai como campo do JSON
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'request_id'}
+
+
+def set_request_id(request_id: Optional[str]):
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token) -> None:
+    _request_id.reset(token)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def _parse_sample_rates(value: str) -> Dict[int, float]:
+    rates: Dict[int, float] = {}
+    for item in value.split(','):
+        name, _, rate = item.partition('=')
+        level = logging.getLevelName(name.strip().upper())
+        if not isinstance(level, int) or not rate.strip():
+            continue
+        # Avisos e erros nunca são amostrados
+        if level < logging.WARNING:
+            rates[level] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Uma linha JSON por registro: timestamp (UTC), level, logger, message, request_id (dentro de uma requisição),
+    campos passados em `extra=` e exception.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Roda na thread de quem loga (antes da fila): amostragem por nível e request_id da requisição atual.
+    """
+
+    def __init__(self, sample_rates: Dict[int, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(record.levelno)
+        if rate is not None and random.random() >= rate:
+            record_log_discarded(record.levelname, 'sampled')
+            return False
+        record.request_id = _request_id.get()
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Enfileira o registro sem formatá-lo: a mensagem (args do %-format) só é montada na thread do listener.
+    Com a fila cheia o registro é descartado e contado, sem bloquear quem loga.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            record_log_discarded(record.levelname, 'queue_full')
+
+
+def _configure() -> Optional[QueueListener]:
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(_TEXT_FORMAT))
+    
+    listener = None
+    if LOG_ASYNC:
+        handler = _NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        listener = QueueListener(handler.queue, output)
+    else:
+        handler = output
+    handler.addFilter(_ContextFilter(_parse_sample_rates(LOG_SAMPLE_RATES)))
+    
+    # OFF: acima de CRITICAL, nenhum registro é criado
+    level = logging.CRITICAL + 1 if LOG_LEVEL == 'OFF' else logging.getLevelName(LOG_LEVEL)
+    if not isinstance(level, int):
+        level = logging.INFO
+    
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    
+    if listener is not None:
+        listener.start()
+        # Esvazia a fila ao encerrar o processo
+        atexit.register(listener.stop)
+    return listener
+
+
+_listener = _configure()
 
 logger = logging.getLogger(__name__)
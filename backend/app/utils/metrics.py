@@ -0,0 +1,242 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+
+
+# Etapas do pipeline: read_file, thread_context, extract_keywords, near_duplicate, pre_classify, local_model, reply_library, ai_analyze, ai_reply, fallback
+STAGE_SECONDS = Histogram(
+    'email_classifier_stage_seconds',
+    'Duração de cada etapa do processamento',
+    ['stage'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+CLASSIFICATIONS = Counter(
+    'email_classifier_classifications_total',
+    'Emails classificados por método e categoria',
+    ['method', 'category']
+)
+
+CACHE_LOOKUPS = Counter(
+    'email_classifier_cache_lookups_total',
+    'Consultas ao cache de classificações: hit_text, hit_keywords ou miss',
+    ['result']
+)
+
+THREAD_LOOKUPS = Counter(
+    'email_classifier_thread_lookups_total',
+    'Buscas da conversa de cada email: in_reply_to, quoted_text (conversa conhecida) ou miss',
+    ['result']
+)
+
+REPLY_LIBRARY_LOOKUPS = Counter(
+    'email_classifier_reply_library_lookups_total',
+    'Buscas na biblioteca de respostas: hit (modelo preenchido), unfilled (modelo parecido sem os dados '
+    'deste email), miss ou short (email com poucos stems)',
+    ['result']
+)
+
+GEMINI_REQUESTS = Counter(
+    'email_classifier_gemini_requests_total',
+    'Chamadas ao Gemini por tipo (classify, classify_batch, reply, reply_stream) e resultado (success, error, timeout)',
+    ['call', 'outcome']
+)
+
+GEMINI_LATENCY_SECONDS = Histogram(
+    'email_classifier_gemini_latency_seconds',
+    'Latência das chamadas ao Gemini',
+    ['call'],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+)
+
+GEMINI_TOKENS = Counter(
+    'email_classifier_gemini_tokens_total',
+    'Tokens consumidos no Gemini por tipo de chamada e direção (prompt, output)',
+    ['call', 'kind']
+)
+
+GEMINI_RETRIES = Counter(
+    'email_classifier_gemini_retries_total',
+    'Retentativas de chamadas ao Gemini por tipo de chamada',
+    ['call']
+)
+
+QUOTA_REJECTIONS = Counter(
+    'email_classifier_gemini_quota_rejections_total',
+    'Chamadas não feitas por falta de cota global do Gemini (foram ao fallback)',
+    ['call']
+)
+
+CIRCUIT_REJECTIONS = Counter(
+    'email_classifier_circuit_rejections_total',
+    'Chamadas recusadas na hora pelo disjuntor aberto (foram direto ao fallback)',
+    ['call']
+)
+
+# 0 = closed, 1 = half_open, 2 = open
+CIRCUIT_STATE = Gauge(
+    'email_classifier_circuit_state',
+    'Estado do disjuntor: 0 fechado, 1 meio-aberto, 2 aberto',
+    ['name'],
+    multiprocess_mode='max'
+)
+
+_CIRCUIT_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+AI_BATCH_SIZE = Histogram(
+    'email_classifier_ai_batch_size',
+    'Emails por chamada em lote ao Gemini (micro-lotes)',
+    buckets=(2, 3, 4, 6, 8, 12, 16, 24, 32)
+)
+
+COALESCED_CALLS = Counter(
+    'email_classifier_coalesced_calls_total',
+    'Chamadas que aguardaram uma execução idêntica já em andamento em vez de repeti-la',
+    ['name']
+)
+
+JOBS = Counter(
+    'email_classifier_jobs_total',
+    'Eventos de jobs assíncronos: submitted, succeeded, retried, dead_letter, webhook_delivered, webhook_failed',
+    ['event']
+)
+
+WARM_UP_SECONDS = Gauge(
+    'email_classifier_warm_up_seconds',
+    'Duração do warm-up de cada componente na inicialização (nlp, ai_client, keyword_matcher, local_model)',
+    ['component'],
+    multiprocess_mode='max'
+)
+
+LOG_RECORDS_DISCARDED = Counter(
+    'email_classifier_log_records_discarded_total',
+    'Registros de log não gravados: sampled (amostragem de LOG_SAMPLE_RATES) ou queue_full (fila cheia, stdout lento)',
+    ['level', 'reason']
+)
+
+# Tempos (ms) das etapas da requisição atual; None fora de uma requisição
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('stage_timings', default=None)
+
+
+def start_stage_timings(timings: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Inicia a coleta de tempos por etapa para a requisição (ou item de lote) atual; com `timings`,
+    continua uma coleta iniciada em outra task.
+    """
+    timings = {} if timings is None else timings
+    _stage_timings.set(timings)
+    return timings
+
+
+def get_stage_timings() -> Optional[Dict[str, float]]:
+    return _stage_timings.get()
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Mede a etapa no histograma e, se houver coleta ativa, soma o tempo (ms) aos tempos da requisição.
+    Também mede etapas que terminam com erro.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        
+        timings = _stage_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 3)
+
+
+def record_classification(method: str, category: str) -> None:
+    CLASSIFICATIONS.labels(method, category).inc()
+
+
+def record_cache_lookup(result: str) -> None:
+    CACHE_LOOKUPS.labels(result).inc()
+
+
+def record_thread_lookup(result: str) -> None:
+    THREAD_LOOKUPS.labels(result).inc()
+
+
+def record_reply_library_lookup(result: str) -> None:
+    REPLY_LIBRARY_LOOKUPS.labels(result).inc()
+
+
+def record_gemini_retry(call: str) -> None:
+    GEMINI_RETRIES.labels(call).inc()
+
+
+def record_quota_rejection(call: str) -> None:
+    QUOTA_REJECTIONS.labels(call).inc()
+
+
+def record_circuit_rejection(call: str) -> None:
+    CIRCUIT_REJECTIONS.labels(call).inc()
+
+
+def record_circuit_state(name: str, state: str) -> None:
+    CIRCUIT_STATE.labels(name).set(_CIRCUIT_STATE_VALUES[state])
+
+
+def record_ai_batch(size: int) -> None:
+    AI_BATCH_SIZE.observe(size)
+
+
+def record_coalesced(name: str) -> None:
+    COALESCED_CALLS.labels(name).inc()
+
+
+def record_job(event: str) -> None:
+    JOBS.labels(event).inc()
+
+
+def record_log_discarded(level: str, reason: str) -> None:
+    LOG_RECORDS_DISCARDED.labels(level, reason).inc()
+
+
+def record_warm_up(component: str, seconds: float) -> None:
+    WARM_UP_SECONDS.labels(component=component).set(seconds)
+
+
+def record_gemini_call(call: str, outcome: str, elapsed: float, usage_metadata=None) -> None:
+    GEMINI_REQUESTS.labels(call, outcome).inc()
+    GEMINI_LATENCY_SECONDS.labels(call).observe(elapsed)
+    
+    if usage_metadata is not None:
+        prompt_tokens = getattr(usage_metadata, 'prompt_token_count', None)
+        output_tokens = getattr(usage_metadata, 'candidates_token_count', None)
+        if prompt_tokens:
+            GEMINI_TOKENS.labels(call, 'prompt').inc(prompt_tokens)
+        if output_tokens:
+            GEMINI_TOKENS.labels(call, 'output').inc(output_tokens)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Métricas no formato de exposição do Prometheus. Com vários workers do uvicorn,
+    defina PROMETHEUS_MULTIPROC_DIR para agregar as métricas de todos eles.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple, Type, Union
+
+from limits.storage import Storage
+
+
+class SQLiteStorage(Storage):
+    """
+    Storage do `limits` (usado pelo slowapi) em SQLite: contadores compartilhados entre os workers
+    do uvicorn no mesmo host. URI: sqlite:///caminho/relativo.sqlite3 ou sqlite:////caminho/absoluto.
+    Requer SQLite 3.35+ (upsert com RETURNING).
+    
+    Suporta a estratégia fixed-window (padrão do slowapi). Importar este módulo registra o esquema 'sqlite'.
+    
+    Bloqueia o event loop: o slowapi chama o storage de forma síncrona em toda requisição limitada (o
+    `limits` tem storages assíncronos, mas o slowapi não os usa). Cada incremento custa ~30 µs sem disputa
+    e até BUSY_TIMEOUT com o arquivo travado por outro worker.
+    """
+    
+    STORAGE_SCHEME = ['sqlite']
+    
+    # Limpeza de contadores expirados a cada N incrementos
+    PURGE_EVERY = 1000
+    # Espera máxima pela trava do arquivo, no event loop: acima disso o incremento falha e o slowapi
+    # passa a limitar em memória até o storage voltar
+    BUSY_TIMEOUT = 0.1
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path = uri.split('://', 1)[1][1:] or 'data/rate_limits.sqlite3'
+        self._lock = threading.Lock()
+        self._increments = 0
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # isolation_level=None: cada comando é sua própria transação (o upsert com RETURNING é atômico)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Sem fsync a cada incremento (~100 µs -> ~30 µs no event loop); uma queda de energia perde só
+        # os contadores mais recentes
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)'
+        )
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> Union[Type[Exception], Tuple[Type[Exception], ...]]:
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            # Um único comando: a trava de escrita dura só o upsert. Janela expirada recomeça do zero
+            count = self._conn.execute(
+                'INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET '
+                'count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END, '
+                'expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END '
+                'RETURNING count',
+                (key, amount, now + expiry, now, now)
+            ).fetchone()[0]
+            
+            self._increments += 1
+            if self._increments % self.PURGE_EVERY == 0:
+                self._conn.execute('DELETE FROM rate_limits WHERE expires_at <= ?', (now,))
+        return count
+
+    def _row(self, key: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            row = self._conn.execute('SELECT count, expires_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row
+
+    def get(self, key: str) -> int:
+        row = self._row(key)
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._row(key)
+        return row[1] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute('DELETE FROM rate_limits').rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM rate_limits WHERE key = ?', (key,))
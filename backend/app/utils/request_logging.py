@@ -0,0 +1,68 @@
+import re
+import time
+import uuid
+from typing import Optional
+
+from app.config import LOG_REQUESTS
+from app.utils.logger import logger, reset_request_id, set_request_id
+from app.utils.metrics import get_stage_timings
+
+
+# X-Request-ID recebido de um proxy ou cliente só é reaproveitado se for curto e sem caracteres estranhos
+_REQUEST_ID_RE = re.compile(r'^[\w.:-]{1,128}$')
+# Health checks e scraping do Prometheus: uma linha a cada poucos segundos, sem informação útil
+_QUIET_PATHS = frozenset({'/health', '/health/live', '/health/ready', '/metrics'})
+
+
+def _incoming_request_id(scope) -> Optional[str]:
+    for name, value in scope.get('headers') or ():
+        if name == b'x-request-id':
+            request_id = value.decode('latin-1').strip()
+            return request_id if _REQUEST_ID_RE.match(request_id) else None
+    return None
+
+
+class RequestLoggingMiddleware:
+    """
+    Middleware ASGI: atribui um request_id (o X-Request-ID recebido ou um novo), devolvido no cabeçalho
+    X-Request-ID e incluído em todos os logs da requisição, e grava uma linha por requisição com status,
+    duração e tempos por etapa. ASGI puro (sem BaseHTTPMiddleware): o endpoint roda no mesmo contexto, então
+    os tempos por etapa iniciados nele são visíveis aqui no final.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = _incoming_request_id(scope) or uuid.uuid4().hex
+        token = set_request_id(request_id)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = list(message.get('headers') or []) + [(b'x-request-id', request_id.encode('latin-1'))]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            path = scope.get('path', '')
+            if LOG_REQUESTS and path not in _QUIET_PATHS:
+                elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+                stage_timings = get_stage_timings()
+                logger.info('%s %s %s %.1fms', scope.get('method'), path, status, elapsed_ms, extra={
+                    'method': scope.get('method'),
+                    'path': path,
+                    'status': status,
+                    'duration_ms': elapsed_ms,
+                    # Cópia: o registro é formatado depois, na thread do listener
+                    'stage_timings': dict(stage_timings) if stage_timings else None
+                })
+            reset_request_id(token)
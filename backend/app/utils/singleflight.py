@@ -0,0 +1,55 @@
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict
+
+from app.utils.metrics import record_coalesced
+
+
+class _Call:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplica chamadas concorrentes com a mesma chave: a primeira executa, as demais aguardam
+    e recebem uma cópia do mesmo resultado (ou a mesma exceção).
+    
+    A execução compartilhada não é cancelada quando um solicitante desiste; só quando todos desistem.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            record_coalesced(self.name)
+        
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nenhum solicitante restante: novas chamadas com a mesma chave começam do zero
+                self._forget(key, call)
+                call.task.cancel()
+        
+        # Cada solicitante recebe sua cópia: o resultado pode ser alterado depois (ex.: resposta adiada)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,19 @@
+import hashlib
+import re
+
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza o texto para comparação: minúsculas e espaços colapsados.
+    """
+    return _WHITESPACE_RE.sub(' ', text.lower()).strip()
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash SHA-256 do texto normalizado, usado como chave de conteúdo.
+    """
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
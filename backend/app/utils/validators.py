@@ -8,13 +8,17 @@ MAX_TEXT_LENGTH = 50000
 ALLOWED_EXTENSIONS = {'.pdf', '.txt'}
 
 
-def validate_file(file: UploadFile) -> None:
-    if not file.filename:
+def validate_filename(filename: str) -> None:
+    if not filename:
         raise InvalidFileException("Nome do arquivo não fornecido")
     
-    file_extension = os.path.splitext(file.filename.lower())[1]
+    file_extension = os.path.splitext(filename.lower())[1]
     if file_extension not in ALLOWED_EXTENSIONS:
         raise InvalidFileException(f"Apenas arquivos {', '.join(ALLOWED_EXTENSIONS)} são aceitos")
+
+
+def validate_file(file: UploadFile) -> None:
+    validate_filename(file.filename)
     
     if hasattr(file, 'size') and file.size and file.size > MAX_FILE_SIZE:
         raise InvalidFileException(f"Arquivo excede o tamanho máximo de {MAX_FILE_SIZE / (1024*1024)}MB")
@@ -0,0 +1,102 @@
+import http.client
+import ipaddress
+import socket
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Optional
+
+from app.config import JOB_WEBHOOK_ALLOWED_HOSTS
+from app.utils.exceptions import InvalidTextException
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    # is_global exclui loopback, privados, link-local, reservados e a faixa compartilhada (100.64/10)
+    return ip.is_global and not ip.is_multicast
+
+
+def _host_is_allowlisted(host: str) -> bool:
+    return host.lower().rstrip('.') in JOB_WEBHOOK_ALLOWED_HOSTS
+
+
+def validate_webhook_url(url: str) -> None:
+    """
+    Recusa webhooks que levariam o servidor a chamar a rede interna: URL não http(s), host fora de
+    JOB_WEBHOOK_ALLOWED_HOSTS (quando configurado) ou host que resolve para endereço não público
+    (loopback, privado, link-local, reservado). Hosts da allowlist podem apontar para a rede interna.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme.lower() not in ('http', 'https') or not parsed.hostname:
+        raise InvalidTextException("webhook_url deve ser uma URL http(s)")
+    if parsed.username or parsed.password:
+        raise InvalidTextException("webhook_url não pode conter credenciais")
+    
+    if _host_is_allowlisted(parsed.hostname):
+        return
+    if JOB_WEBHOOK_ALLOWED_HOSTS:
+        raise InvalidTextException(f"Host do webhook não permitido: {parsed.hostname}")
+    
+    try:
+        port = parsed.port
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, ValueError):
+        raise InvalidTextException(f"Não foi possível resolver o host do webhook: {parsed.hostname}")
+    if not all(_is_public(address) for address in addresses):
+        raise InvalidTextException(f"Webhook aponta para endereço não público: {parsed.hostname}")
+
+
+def _check_peer(connection: http.client.HTTPConnection) -> None:
+    # Confere o endereço efetivamente conectado: o DNS pode mudar entre a validação e a entrega
+    if _host_is_allowlisted(connection.host):
+        return
+    address = connection.sock.getpeername()[0]
+    if not _is_public(address):
+        connection.close()
+        raise urllib.error.URLError(f"webhook conectou em endereço não público ({address})")
+
+
+class _GuardedHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        super().connect()
+        _check_peer(self)
+
+
+class _GuardedHTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        super().connect()
+        _check_peer(self)
+
+
+class _GuardedHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_GuardedHTTPConnection, req)
+
+
+class _GuardedHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_GuardedHTTPSConnection, req, context=self._context)
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        # Sem seguir redirecionamentos: o 3xx vira HTTPError e conta como falha de entrega
+        return None
+
+
+# Sem proxies do ambiente: a checagem do endereço conectado precisa ver o destino real
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _GuardedHTTPHandler, _GuardedHTTPSHandler, _NoRedirectHandler
+)
+
+
+def post_webhook(url: str, body: bytes, headers: Dict[str, str], timeout: Optional[float] = None) -> int:
+    """
+    POST do webhook com as mesmas regras de validate_webhook_url, sem seguir redirecionamentos.
+    """
+    validate_webhook_url(url)
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    with _opener.open(request, timeout=timeout) as response:
+        return response.status
@@ -0,0 +1,9 @@
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.job_worker import main
+
+
+if __name__ == '__main__':
+    main()
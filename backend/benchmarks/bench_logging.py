@@ -0,0 +1,145 @@
+"""
+Custo do logging no caminho quente: roda o teste de carga (API no próprio processo, IA simulada) em
+processos novos com o logging desligado, síncrono em texto (configuração antiga), assíncrono em JSON
+e assíncrono com amostragem dos logs INFO, e compara throughput, latência e registros descartados.
+
+A saída de cada execução é consumida por uma thread; com --consumer-delay-ms ela simula um coletor
+de logs lento (pipe cheio), cenário em que o logging síncrono bloqueia as requisições e o assíncrono
+descarta registros em vez de bloquear.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_logging --synthetic 5000 --concurrency 64
+    python -m benchmarks.bench_logging --synthetic 5000 --consumer-delay-ms 0.2 --json logging.json
+    python -m benchmarks.bench_logging --synthetic 5000 --baseline logging.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+
+MODES = {
+    'off': {'LOG_LEVEL': 'OFF'},
+    'sync_text': {'LOG_ASYNC': 'false', 'LOG_FORMAT': 'text'},
+    'async_json': {'LOG_ASYNC': 'true', 'LOG_FORMAT': 'json'},
+    'async_json_sampled': {'LOG_ASYNC': 'true', 'LOG_FORMAT': 'json', 'LOG_SAMPLE_RATES': 'INFO=0.1'}
+}
+
+RUN_ENV = {
+    'FAKE_AI_LATENCY_MS': '5',
+    'FAKE_AI_LATENCY_JITTER_MS': '0',
+    'JOB_WORKERS': '0'
+}
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _consume(stream, delay_seconds: float, lines: List[int]) -> None:
+    for _ in stream:
+        lines[0] += 1
+        if delay_seconds:
+            time.sleep(delay_seconds)
+
+
+def run_mode(mode: str, args) -> Dict[str, Any]:
+    environment = dict(os.environ)
+    for name, value in RUN_ENV.items():
+        environment.setdefault(name, value)
+    environment.update(MODES[mode])
+    
+    with tempfile.TemporaryDirectory() as directory:
+        report_path = os.path.join(directory, 'report.json')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.load_test', '--no-cache', '--synthetic', str(args.synthetic),
+             '--concurrency', str(args.concurrency), '--json', report_path],
+            cwd=_BACKEND_DIR, env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        lines = [0]
+        consumer = threading.Thread(target=_consume, args=(process.stdout, args.consumer_delay_ms / 1000, lines))
+        consumer.start()
+        process.wait()
+        consumer.join()
+        if process.returncode != 0:
+            raise RuntimeError(f"load_test falhou no modo {mode} (código {process.returncode})")
+        with open(report_path, encoding='utf-8') as f:
+            report = json.load(f)
+    
+    return {
+        'throughput_rps': report['throughput_rps'],
+        'latency_ms': report['latency_ms'],
+        'statuses': report['statuses'],
+        'log_records_discarded': report.get('log_records_discarded') or {},
+        'output_lines': lines[0]
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    regressions = []
+    for mode, result in report['modes'].items():
+        before = baseline.get('modes', {}).get(mode)
+        if not before:
+            continue
+        if result['throughput_rps'] < before['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"{mode}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+        p99_before, p99_after = before['latency_ms'].get('p99'), result['latency_ms'].get('p99')
+        if p99_before and p99_after and p99_after > p99_before * (1 + max_regression):
+            regressions.append(f"{mode}: p99 {p99_before} -> {p99_after} ms")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Requisições por modo: {report['synthetic']} | concorrência: {report['concurrency']} | "
+          f"atraso do consumidor: {report['consumer_delay_ms']} ms/linha")
+    print(f"{'modo':<22}{'req/s':>10}{'vs off':>9}{'p50 ms':>10}{'p99 ms':>10}{'linhas':>10}  descartados")
+    reference = report['modes'].get('off', {}).get('throughput_rps')
+    for mode, result in report['modes'].items():
+        relative = f"{result['throughput_rps'] / reference:.0%}" if reference else '-'
+        print(f"{mode:<22}{result['throughput_rps']:>10}{relative:>9}{result['latency_ms']['p50'] or 0:>10}"
+              f"{result['latency_ms']['p99'] or 0:>10}{result['output_lines']:>10}  {result['log_records_discarded']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=3000, help='Emails sintéticos únicos por modo')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--modes', default=','.join(MODES), help="Modos separados por vírgula (padrão: todos)")
+    parser.add_argument('--consumer-delay-ms', type=float, default=0.0,
+                        help='Atraso por linha lida da saída, simulando um coletor de logs lento')
+    parser.add_argument('--json', help='Grava o relatório em JSON (para usar como --baseline depois)')
+    parser.add_argument('--baseline', help='Relatório JSON anterior para detectar regressões')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Tolerância relativa (padrão: 0.2)')
+    args = parser.parse_args()
+    
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"modos desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(MODES)})")
+    
+    report = {
+        'synthetic': args.synthetic,
+        'concurrency': args.concurrency,
+        'consumer_delay_ms': args.consumer_delay_ms,
+        'modes': {mode: run_mode(mode, args) for mode in modes}
+    }
+    print_report(report)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSÃO: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Acurácia da classificação com o texto reduzido por PROMPT_TOKEN_BUDGET vs o email inteiro (orçamento 0).
+
+Cada email de mock_emails/ entra como veio e com uma conversa citada de um email da outra categoria,
+assinatura e aviso legal: o caso em que o orçamento corta texto. A categoria esperada é a da pasta.
+Sem --gemini, a classificação é a das keywords extraídas só do texto que vai para o prompt (sem IA: mede o que a
+redução preserva); emails que as keywords não decidem contam como indefinidos. Com --gemini, o próprio Gemini
+classifica cada prompt (requer GEMINI_API_KEY; 2 chamadas por email e orçamento).
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_prompt_budget --budgets 0 1500 300 150
+    python -m benchmarks.bench_prompt_budget --budgets 0 300 --gemini
+"""
+import argparse
+import asyncio
+from typing import List, Optional, Tuple
+
+from app.services import ai_handler
+from app.services.ai_handler import get_keyword_matcher, pre_classify_with_keywords
+from app.services.context_builder import build_prompt_context
+from app.services.nlp_engine import extract_keywords
+from benchmarks.corpus import load_labeled_mock_emails
+
+
+_SIGNATURE_AND_DISCLAIMER = (
+    "\n\nAtenciosamente,\nMarina Duarte\nAnalista de Operações\n(11) 4002-8922\nmarina.duarte@exemplo.com.br\n\n"
+    "Esta mensagem é confidencial e destinada exclusivamente ao destinatário. Caso a tenha recebido por engano, "
+    "é proibida a sua divulgação, cópia ou distribuição; apague-a e avise o remetente."
+)
+
+
+def build_cases() -> List[Tuple[str, str, str]]:
+    """
+    Retorna (categoria, variante, texto): cada email sozinho e seguido de conversa citada, assinatura e aviso legal.
+    """
+    emails = load_labeled_mock_emails()
+    cases = []
+    for category, filename, text in emails:
+        cases.append((category, filename, text))
+        other = next(other_text for other_category, _, other_text in emails if other_category != category)
+        quoted = '\n'.join(f"> {line}" for line in other.split('\n'))
+        cases.append((
+            category,
+            f"{filename} + citação",
+            f"{text}{_SIGNATURE_AND_DISCLAIMER}\n\nEm seg., 3 de jun. de 2024 às 10:00, Cliente <c@x.com> escreveu:\n{quoted}"
+        ))
+    return cases
+
+
+def classify_by_keywords(text: str, budget: int) -> Tuple[Optional[str], int]:
+    context = build_prompt_context(text, extract_keywords(text), budget, get_keyword_matcher())
+    result = pre_classify_with_keywords(extract_keywords(context.text))
+    return (result['category'] if result else None), context.prompt_tokens
+
+
+async def classify_by_gemini(text: str, budget: int) -> Tuple[Optional[str], int]:
+    ai_handler.PROMPT_TOKEN_BUDGET = budget
+    nlp_keywords = extract_keywords(text)
+    result = await ai_handler._analyze_with_ai(text, nlp_keywords, use_full_text=True, with_reply=False)
+    return result['category'], build_prompt_context(text, nlp_keywords, budget, get_keyword_matcher()).prompt_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[0, 1500, 300, 150])
+    parser.add_argument('--gemini', action='store_true', help='Classificar com o Gemini em vez das keywords')
+    args = parser.parse_args()
+    
+    cases = build_cases()
+    print(f"Emails: {len(cases)} ({len(cases) // 2} de mock_emails/, cada um também com conversa citada)")
+    print(f"Classificador: {'Gemini' if args.gemini else 'keywords do texto do prompt'}")
+    print(f"{'Orçamento':>10} {'Tokens médios':>14} {'Acurácia':>9} {'Indefinidos':>12} {'Iguais ao inteiro':>18}")
+    
+    full: List[Optional[str]] = []
+    for budget in args.budgets:
+        predictions, tokens = [], []
+        for category, _, text in cases:
+            if args.gemini:
+                predicted, prompt_tokens = asyncio.run(classify_by_gemini(text, budget))
+            else:
+                predicted, prompt_tokens = classify_by_keywords(text, budget)
+            predictions.append(predicted)
+            tokens.append(prompt_tokens)
+        if budget == 0:
+            full = predictions
+        
+        correct = sum(predicted == category for predicted, (category, _, _) in zip(predictions, cases))
+        agreement = f"{sum(a == b for a, b in zip(predictions, full))}/{len(cases)}" if full else '-'
+        print(f"{budget or 'inteiro':>10} {sum(tokens) / len(tokens):14.0f} {correct / len(cases):9.0%} "
+              f"{predictions.count(None):12d} {agreement:>18}")
+
+
+if __name__ == '__main__':
+    main()
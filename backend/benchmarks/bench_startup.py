@@ -0,0 +1,222 @@
+"""
+Benchmark do cold start da API: tempo de import de app.main e, com o uvicorn num processo novo,
+tempo até a liveness responder, até a readiness ficar ok (warm-up concluído) e até a primeira
+classificação. Cada execução é um processo novo, como numa réplica recém-criada pelo autoscaling.
+
+O servidor sobe com AI_BACKEND=fake (sem chamadas ao Gemini); as variáveis podem ser
+sobrescritas pelo ambiente.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --json base.json
+    python -m benchmarks.bench_startup --runs 5 --baseline base.json --max-regression 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+SERVER_ENV = {
+    'AI_BACKEND': 'fake',
+    'FAKE_AI_LATENCY_MS': '0',
+    'FAKE_AI_LATENCY_JITTER_MS': '0',
+    'RATE_LIMIT_PER_MINUTE': '1000000000',
+    'JOB_WORKERS': '0'
+}
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _environment() -> Dict[str, str]:
+    environment = dict(os.environ)
+    for name, value in SERVER_ENV.items():
+        environment.setdefault(name, value)
+    return environment
+
+
+def measure_import() -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Tempo de import de app.main (ms) num processo novo e os pacotes de primeiro nível mais caros,
+    pelo relatório do `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app.main'],
+        cwd=_BACKEND_DIR, env=_environment(), capture_output=True, text=True, check=True
+    )
+    total = 0.0
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        if not cumulative.strip().isdigit():
+            continue
+        milliseconds = int(cumulative) / 1000
+        if name.strip() == 'app.main':
+            total = milliseconds
+        elif len(name) - len(name.lstrip()) == 3:
+            # Um nível abaixo de app.main: importado diretamente pelos módulos da API
+            packages[name.strip()] = milliseconds
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:8]
+    return round(total, 1), [(name, round(milliseconds, 1)) for name, milliseconds in heaviest]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(client, path: str, deadline: float) -> Tuple[Optional[float], Optional[Dict[str, Any]]]:
+    """
+    Consulta `path` até responder 200; retorna (instante, corpo). Para antes se a readiness
+    reportar falha no warm-up.
+    """
+    import httpx
+    
+    while time.perf_counter() < deadline:
+        try:
+            response = client.get(path)
+        except httpx.TransportError:
+            time.sleep(0.01)
+            continue
+        if response.status_code == 200:
+            return time.perf_counter(), response.json()
+        body = response.json()
+        if body.get('status') == 'failed':
+            return None, body
+        time.sleep(0.01)
+    return None, None
+
+
+def measure_cold_start(port: int, text: str, timeout: float) -> Dict[str, Any]:
+    import httpx
+    
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=_BACKEND_DIR, env=_environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    def elapsed(instant: Optional[float]) -> Optional[float]:
+        return round((instant - start) * 1000, 1) if instant else None
+    
+    try:
+        with httpx.Client(base_url=f'http://127.0.0.1:{port}', timeout=timeout) as client:
+            deadline = start + timeout
+            live, _ = _wait_for(client, '/health/live', deadline)
+            ready, readiness = _wait_for(client, '/health/ready', deadline)
+            
+            first_response = first_request_ms = status = None
+            if ready:
+                request_start = time.perf_counter()
+                response = client.post('/api/v1/process', data={'text': text})
+                first_response = time.perf_counter()
+                first_request_ms = round((first_response - request_start) * 1000, 1)
+                status = response.status_code
+            
+            return {
+                'live_ms': elapsed(live),
+                'ready_ms': elapsed(ready),
+                'first_response_ms': elapsed(first_response),
+                'first_request_ms': first_request_ms,
+                'first_request_status': status,
+                'warm_up': (readiness or {}).get('warm_up')
+            }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 1) if values else None
+
+
+def run(args) -> Dict[str, Any]:
+    from benchmarks.corpus import load_mock_emails
+    
+    emails = load_mock_emails()
+    text = emails[0][1] if emails else 'Preciso da segunda via do boleto com vencimento hoje.'
+    
+    imports = [measure_import() for _ in range(args.runs)]
+    cold_starts = [measure_cold_start(args.port or _free_port(), text, args.timeout) for _ in range(args.runs)]
+    
+    return {
+        'runs': args.runs,
+        'import_ms': _median([total for total, _ in imports]),
+        'heaviest_imports_ms': dict(imports[-1][1]),
+        'live_ms': _median([result['live_ms'] for result in cold_starts]),
+        'ready_ms': _median([result['ready_ms'] for result in cold_starts]),
+        'first_response_ms': _median([result['first_response_ms'] for result in cold_starts]),
+        'first_request_ms': _median([result['first_request_ms'] for result in cold_starts]),
+        'first_request_statuses': [result['first_request_status'] for result in cold_starts],
+        # Tempo de cada componente do warm-up na última execução (ou o erro, se a readiness falhou)
+        'warm_up': cold_starts[-1]['warm_up']
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    regressions = []
+    for name in ('import_ms', 'live_ms', 'ready_ms', 'first_response_ms'):
+        before, after = baseline.get(name), report.get(name)
+        if before and after and after > before * (1 + max_regression):
+            regressions.append(f"{name} {before} -> {after} ms")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Execuções: {report['runs']} (medianas)")
+    print(f"Import de app.main:          {report['import_ms']} ms")
+    print(f"Até a liveness responder:    {report['live_ms']} ms")
+    print(f"Até a readiness (warm-up):   {report['ready_ms']} ms")
+    print(f"Até a primeira classificação: {report['first_response_ms']} ms "
+          f"(a requisição em si: {report['first_request_ms']} ms, status {report['first_request_statuses']})")
+    print(f"Imports mais caros (ms): {report['heaviest_imports_ms']}")
+    warm_up = report.get('warm_up') or {}
+    for name, component in (warm_up.get('components') or {}).items():
+        error = f" - {component['error']}" if component.get('error') else ''
+        print(f"  warm-up {name:<16}{component['status']:<8}{component['seconds']}s{error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='Processos novos medidos (reporta a mediana)')
+    parser.add_argument('--port', type=int, help='Porta do servidor (padrão: uma porta livre)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Tempo máximo de cada inicialização')
+    parser.add_argument('--json', help='Grava o relatório em JSON (para usar como --baseline depois)')
+    parser.add_argument('--baseline', help='Relatório JSON anterior para detectar regressões')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Tolerância relativa (padrão: 0.2)')
+    args = parser.parse_args()
+    
+    # Uma linha de log por consulta às health checks esconderia o relatório
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    
+    report = run(args)
+    print_report(report)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSÃO: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import os
+from typing import List, Tuple
+
+from app.services.file_reader import read_content
+
+
+MOCK_EMAILS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'mock_emails')
+
+
+def load_mock_emails(directory: str = MOCK_EMAILS_DIR) -> List[Tuple[str, str]]:
+    """
+    Carrega os emails de exemplo (.txt e .pdf) como pares (nome do arquivo, texto).
+    """
+    emails = []
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if not filename.lower().endswith(('.txt', '.pdf')):
+                continue
+            with open(os.path.join(root, filename), 'rb') as f:
+                emails.append((filename, read_content(filename, f.read())))
+    return emails
+
+
+def load_labeled_mock_emails(directory: str = MOCK_EMAILS_DIR) -> List[Tuple[str, str, str]]:
+    """
+    Carrega os emails de exemplo como (categoria, nome do arquivo, texto), com a categoria pela pasta
+    (produtivo/ ou improdutivo/).
+    """
+    emails = []
+    for label in ('produtivo', 'improdutivo'):
+        for filename, text in load_mock_emails(os.path.join(directory, label)):
+            emails.append((label.capitalize(), filename, text))
+    return emails
@@ -0,0 +1,237 @@
+"""
+Teste de carga do POST /api/v1/process: reenvia os emails de mock_emails/ (ou um corpus sintético)
+com concorrência alvo e reporta throughput, latência p50/p95/p99 total e por etapa, memória e
+registros de log descartados pelo servidor.
+
+Sem --url, a API roda no próprio processo (ASGI, sem rede) com AI_BACKEND=fake, rate limit
+desligado e stage_timings na resposta; essas variáveis podem ser sobrescritas pelo ambiente
+(ex.: FAKE_AI_LATENCY_MS=300 FAKE_AI_ERROR_RATE=0.05). Com --url, o servidor alvo precisa
+estar configurado da mesma forma para reportar tempos por etapa.
+
+Uso (a partir de backend/):
+    python -m benchmarks.load_test --requests 2000 --concurrency 64
+    python -m benchmarks.load_test --synthetic 100000 --concurrency 128 --json atual.json
+    python -m benchmarks.load_test --url http://localhost:8000 --requests 500
+    python -m benchmarks.load_test --synthetic 5000 --baseline base.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+
+IN_PROCESS_ENV = {
+    'AI_BACKEND': 'fake',
+    'STAGE_TIMINGS_IN_RESPONSE': 'true',
+    'RATE_LIMIT_PER_MINUTE': '1000000000',
+    'MAX_CONCURRENT_REQUESTS': '1024'
+}
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def iter_corpus(emails: List[str], total: int, synthetic: bool, seed: int) -> Iterator[str]:
+    """
+    Gera `total` emails sob demanda (não mantém o corpus em memória).
+    Sintético: frases dos emails de exemplo embaralhadas + protocolo único, para não acertar o cache por texto.
+    """
+    if not synthetic:
+        yield from itertools.islice(itertools.cycle(emails), total)
+        return
+    
+    rng = random.Random(seed)
+    sentences = [_SENTENCE_RE.split(text.strip()) for text in emails]
+    for index in range(total):
+        parts = list(rng.choice(sentences))
+        rng.shuffle(parts)
+        yield f"{' '.join(parts)}\nProtocolo {index}-{rng.randrange(10 ** 6)}"
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))
+    return round(ordered[index], 2)
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    return {
+        'count': len(values),
+        'p50': _percentile(values, 50),
+        'p95': _percentile(values, 95),
+        'p99': _percentile(values, 99)
+    }
+
+
+async def _server_metrics(client) -> str:
+    try:
+        response = await client.get('/metrics')
+    except Exception:
+        return ''
+    return response.text
+
+
+def _resident_memory_mb(metrics: str) -> Optional[float]:
+    # process_resident_memory_bytes vem do coletor de processo padrão do prometheus_client (Linux)
+    match = re.search(r'^process_resident_memory_bytes ([0-9.e+]+)$', metrics, re.MULTILINE)
+    return round(float(match.group(1)) / 1024 / 1024, 1) if match else None
+
+
+def _log_records_discarded(metrics: str) -> Dict[str, int]:
+    # Registros de log descartados pelo servidor, por motivo (amostragem ou fila cheia)
+    discarded: Counter = Counter()
+    pattern = r'^email_classifier_log_records_discarded_total\{[^}]*reason="(\w+)"[^}]*\} ([0-9.e+]+)$'
+    for reason, value in re.findall(pattern, metrics, re.MULTILINE):
+        discarded[reason] += int(float(value))
+    return dict(discarded)
+
+
+async def run_load(client, corpus: Iterator[str], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    statuses: Counter = Counter()
+    methods: Counter = Counter()
+
+    async def worker():
+        for text in corpus:
+            start = time.perf_counter()
+            try:
+                response = await client.post('/api/v1/process', data={'text': text})
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(response.status_code)] += 1
+            
+            if response.status_code == 200:
+                details = response.json()['data']['processing_details']
+                methods[details['classification_method']] += 1
+                for stage, elapsed_ms in (details.get('stage_timings') or {}).items():
+                    stages[stage].append(elapsed_ms)
+    
+    metrics_before = await _server_metrics(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    metrics_after = await _server_metrics(client)
+    discarded_before = _log_records_discarded(metrics_before)
+    
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'statuses': dict(statuses),
+        'classification_methods': dict(methods),
+        'latency_ms': _summary(latencies),
+        'stage_latency_ms': {stage: _summary(values) for stage, values in sorted(stages.items())},
+        'log_records_discarded': {reason: count - discarded_before.get(reason, 0)
+                                  for reason, count in _log_records_discarded(metrics_after).items()},
+        'memory_mb': {
+            'server_rss_before': _resident_memory_mb(metrics_before),
+            'server_rss_after': _resident_memory_mb(metrics_after),
+            'load_test_peak_rss': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+    
+    from benchmarks.corpus import load_mock_emails
+    
+    emails = [text for _, text in load_mock_emails()]
+    total = args.synthetic or args.requests
+    corpus = iter_corpus(emails, total, synthetic=bool(args.synthetic), seed=args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            return await run_load(client, corpus, args.concurrency)
+    
+    from app.main import app
+    
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url='http://loadtest', timeout=args.timeout) as client:
+            return await run_load(client, corpus, args.concurrency)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Regressões acima da tolerância: queda de throughput ou aumento do p95 total e por etapa.
+    """
+    regressions = []
+    if report['throughput_rps'] < baseline['throughput_rps'] * (1 - max_regression):
+        regressions.append(f"throughput {baseline['throughput_rps']} -> {report['throughput_rps']} req/s")
+    
+    pairs = [('total', baseline['latency_ms'], report['latency_ms'])]
+    pairs += [(stage, summary, report['stage_latency_ms'].get(stage, {}))
+              for stage, summary in baseline['stage_latency_ms'].items()]
+    for name, before, after in pairs:
+        if before.get('p95') and after.get('p95') and after['p95'] > before['p95'] * (1 + max_regression):
+            regressions.append(f"p95 {name} {before['p95']} -> {after['p95']} ms")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Requisições: {report['requests']} | concorrência: {report['concurrency']} | "
+          f"tempo: {report['elapsed_seconds']}s | throughput: {report['throughput_rps']} req/s")
+    print(f"Status: {report['statuses']} | métodos: {report['classification_methods']}")
+    print(f"{'etapa':<18}{'n':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [('total', report['latency_ms'])] + list(report['stage_latency_ms'].items())
+    for name, summary in rows:
+        print(f"{name:<18}{summary['count']:>8}{summary['p50'] or 0:>10}{summary['p95'] or 0:>10}{summary['p99'] or 0:>10}")
+    if report.get('log_records_discarded'):
+        print(f"Logs descartados no servidor: {report['log_records_discarded']}")
+    print(f"Memória (MB): {report['memory_mb']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='API alvo (padrão: API no próprio processo, com IA simulada)')
+    parser.add_argument('--requests', type=int, default=1000, help='Requisições reenviando mock_emails/')
+    parser.add_argument('--synthetic', type=int, default=0, help='Usa um corpus sintético com N emails únicos')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-cache', action='store_true', help='Desativa o cache de classificações (só sem --url)')
+    parser.add_argument('--json', help='Grava o relatório em JSON (para usar como --baseline depois)')
+    parser.add_argument('--baseline', help='Relatório JSON anterior para detectar regressões')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='Tolerância relativa (padrão: 0.2)')
+    args = parser.parse_args()
+    
+    if not args.url:
+        # Antes de importar a API: a configuração é lida na importação de app.config
+        for name, value in IN_PROCESS_ENV.items():
+            os.environ.setdefault(name, value)
+        if args.no_cache:
+            os.environ['CACHE_BACKEND'] = 'none'
+    
+    report = asyncio.run(run(args))
+    print_report(report)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSÃO: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
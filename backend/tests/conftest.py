@@ -0,0 +1,51 @@
+import re
+
+import pytest
+
+from app.services import nlp_engine
+from app.utils.exceptions import NLPProcessingException
+
+
+def _nltk_data_available() -> bool:
+    try:
+        nlp_engine._ensure_nltk_data()
+    except NLPProcessingException:
+        return False
+    return True
+
+
+class _SuffixStemmer:
+    # Só para os testes sem os dados do NLTK: corta sufixos comuns, mantendo ao menos 3 letras
+    _SUFFIX_RE = re.compile(r'(ções|ção|mente|s|a|o|e)$')
+
+    def stem(self, token: str) -> str:
+        stem = self._SUFFIX_RE.sub('', token)
+        return stem if len(stem) >= 3 else token
+
+
+class _Stopwords:
+    @staticmethod
+    def words(language: str):
+        return ['a', 'o', 'e', 'de', 'do', 'da', 'que', 'para', 'com', 'não', 'um', 'uma', 'por', 'os', 'as', 'meu', 'minha']
+
+
+@pytest.fixture
+def keyword_extractor(monkeypatch):
+    """
+    Extrator compartilhado usado por extract_keywords e extract_keywords_batch. Com os dados do NLTK
+    instalados é o real; sem eles, o mesmo KeywordExtractor com tokenização por espaços, stopwords
+    mínimas e um stemmer de sufixos no lugar dos recursos do NLTK.
+    """
+    if not _nltk_data_available():
+        import nltk.corpus
+        import nltk.stem
+        import nltk.tokenize
+        
+        monkeypatch.setattr(nltk.corpus, 'stopwords', _Stopwords())
+        monkeypatch.setattr(nltk.stem, 'RSLPStemmer', _SuffixStemmer)
+        monkeypatch.setattr(nltk.tokenize, 'word_tokenize', lambda text, language='english': text.split())
+        monkeypatch.setattr(nlp_engine, '_ensure_nltk_data', lambda: None)
+    
+    extractor = nlp_engine.KeywordExtractor()
+    monkeypatch.setattr(nlp_engine, '_keyword_extractor', extractor)
+    return extractor
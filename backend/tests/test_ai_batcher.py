@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import ai_handler
+from app.services.ai_batcher import MicroBatcher
+from app.utils.exceptions import AIAPIException
+
+
+class _Handler:
+    """
+    Handler que registra os lotes recebidos e devolve, por item, o texto em maiúsculas
+    ou a exceção do item ('erro:<mensagem>').
+    """
+
+    def __init__(self, fail_with=None):
+        self.batches = []
+        self.fail_with = fail_with
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(0)
+        if self.fail_with:
+            raise self.fail_with
+        return [ValueError(item[5:]) if item.startswith('erro:') else item.upper() for item in items]
+
+
+def _submit_all(batcher, items):
+    async def run():
+        return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True)
+    return asyncio.run(run())
+
+
+async def _gather(batcher, items):
+    return await asyncio.gather(*(batcher.submit(item) for item in items))
+
+
+def test_cada_solicitante_recebe_o_resultado_do_seu_item():
+    handler = _Handler()
+    batcher = MicroBatcher(handler, window_seconds=0.01, max_size=8)
+    
+    results = _submit_all(batcher, ['a', 'erro:b', 'c'])
+    
+    assert handler.batches == [['a', 'erro:b', 'c']]
+    assert results[0] == 'A' and results[2] == 'C'
+    assert isinstance(results[1], ValueError) and str(results[1]) == 'b'
+
+
+def test_lote_cheio_e_enviado_sem_esperar_a_janela():
+    handler = _Handler()
+    batcher = MicroBatcher(handler, window_seconds=60, max_size=2)
+    
+    results = asyncio.run(asyncio.wait_for(_gather(batcher, ['a', 'b', 'c', 'd']), timeout=5))
+    
+    assert handler.batches == [['a', 'b'], ['c', 'd']]
+    assert results == ['A', 'B', 'C', 'D']
+
+
+def test_falha_do_handler_chega_a_todos_do_lote():
+    batcher = MicroBatcher(_Handler(fail_with=RuntimeError('fora do ar')), window_seconds=0.01, max_size=8)
+    
+    results = _submit_all(batcher, ['a', 'b'])
+    
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_item_de_solicitante_cancelado_nao_vai_ao_handler():
+    handler = _Handler()
+    batcher = MicroBatcher(handler, window_seconds=0.01, max_size=8)
+
+    async def run():
+        cancelled = asyncio.ensure_future(batcher.submit('x'))
+        kept = asyncio.ensure_future(batcher.submit('y'))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        return await kept
+    
+    assert asyncio.run(run()) == 'Y'
+    assert handler.batches == [['y']]
+
+
+def test_resposta_em_lote_da_ia_e_distribuida_pelo_id(monkeypatch):
+    # Fora de ordem, com um id repetido e sem o email 2
+    response = [
+        {'id': 3, 'categoria': 'Improdutivo', 'razao': 'felicitações', 'sugestao_resposta': None},
+        {'id': 1, 'categoria': 'Produtivo', 'razao': 'pedido de boleto', 'sugestao_resposta': 'Segue o boleto.'},
+        {'id': 3, 'categoria': 'Produtivo', 'razao': 'duplicado', 'sugestao_resposta': 'x'},
+        {'id': 4, 'categoria': 'Talvez', 'razao': 'categoria inválida'}
+    ]
+    prompts = []
+
+    async def fake_generate(prompt, max_output_tokens=None, call='classify'):
+        prompts.append((call, prompt))
+        return json.dumps(response)
+    
+    monkeypatch.setattr(ai_handler, '_generate_content', fake_generate)
+    items = [(f'email {index}', 'boleto solicit', False, None) for index in range(1, 5)]
+    
+    results = asyncio.run(ai_handler._analyze_batch_with_ai(items))
+    
+    assert [call for call, _ in prompts] == ['classify_batch']
+    assert results[0]['category'] == 'Produtivo' and results[0]['suggested_response'] == 'Segue o boleto.'
+    assert isinstance(results[1], AIAPIException)
+    assert results[2]['category'] == 'Improdutivo' and results[2]['reason'] == 'felicitações'
+    assert isinstance(results[3], AIAPIException)
+
+
+def test_resposta_em_lote_que_nao_e_array_falha_o_lote(monkeypatch):
+    async def fake_generate(prompt, max_output_tokens=None, call='classify'):
+        return json.dumps({'categoria': 'Produtivo'})
+    
+    monkeypatch.setattr(ai_handler, '_generate_content', fake_generate)
+    
+    with pytest.raises(AIAPIException):
+        asyncio.run(ai_handler._analyze_batch_with_ai([('a', 'x', False, None), ('b', 'y', False, None)]))
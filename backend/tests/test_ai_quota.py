@@ -0,0 +1,130 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.services import ai_handler
+from app.services.ai_quota import MemoryTokenBucket, RedisTokenBucket, SQLiteTokenBucket
+from app.utils.rate_limit_storage import SQLiteStorage
+
+
+def test_balde_sqlite_compartilhado_entre_conexoes(tmp_path):
+    path = str(tmp_path / 'quota.sqlite3')
+    first = SQLiteTokenBucket(path, rate_per_second=0.001, capacity=2)
+    second = SQLiteTokenBucket(path, rate_per_second=0.001, capacity=2)
+    
+    assert first.try_acquire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    assert second.available() < 1
+
+
+def test_balde_sqlite_travado_libera_a_chamada_sem_esperar(tmp_path):
+    path = str(tmp_path / 'quota.sqlite3')
+    bucket = SQLiteTokenBucket(path, rate_per_second=0.001, capacity=1)
+    bucket.try_acquire()
+    
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+    try:
+        # Cota esgotada, mas o arquivo travado falha rápido e libera (fail-open)
+        assert bucket.try_acquire()
+    finally:
+        holder.execute('ROLLBACK')
+        holder.close()
+
+
+def test_balde_redis_roda_o_script_lua():
+    fakeredis = pytest.importorskip('fakeredis')
+    # O fakeredis executa Lua com o pacote lupa
+    pytest.importorskip('lupa')
+    client = fakeredis.FakeRedis()
+    first = RedisTokenBucket('redis://fake', rate_per_second=0.001, capacity=2, client=client)
+    second = RedisTokenBucket('redis://fake', rate_per_second=0.001, capacity=2, client=client)
+    
+    assert first.blocking
+    assert first.try_acquire()
+    assert second.try_acquire()
+    assert not first.try_acquire()
+    assert second.available() < 1
+    # Chave expira sozinha depois que o balde encheria de novo
+    assert 0 < client.ttl(first.key) <= 2 / 0.001 + 60
+
+
+def test_balde_redis_recarrega_com_o_tempo():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    client = fakeredis.FakeRedis()
+    bucket = RedisTokenBucket('redis://fake', rate_per_second=1000, capacity=1, client=client)
+    
+    assert bucket.try_acquire()
+    time.sleep(0.01)
+    assert bucket.try_acquire()
+
+
+def test_balde_redis_indisponivel_libera_a_chamada():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    server = fakeredis.FakeServer()
+    bucket = RedisTokenBucket('redis://fake', rate_per_second=0.001, capacity=1,
+                              client=fakeredis.FakeRedis(server=server))
+    server.connected = False
+    
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert bucket.available() is None
+
+
+def test_cota_bloqueante_roda_fora_do_event_loop(monkeypatch):
+    threads = []
+
+    class _Bucket(MemoryTokenBucket):
+        blocking = True
+
+        def try_acquire(self, tokens: float = 1.0) -> bool:
+            threads.append(threading.current_thread())
+            return super().try_acquire(tokens)
+    
+    monkeypatch.setattr(ai_handler, 'get_ai_quota', lambda: _Bucket(rate_per_second=1, capacity=1))
+    
+    assert asyncio.run(ai_handler._acquire_quota('classify'))
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_cota_em_memoria_roda_no_event_loop(monkeypatch):
+    bucket = MemoryTokenBucket(rate_per_second=0.001, capacity=1)
+    monkeypatch.setattr(ai_handler, 'get_ai_quota', lambda: bucket)
+    rejected = []
+    monkeypatch.setattr(ai_handler, 'record_quota_rejection', rejected.append)
+    
+    assert asyncio.run(ai_handler._acquire_quota('classify'))
+    assert not asyncio.run(ai_handler._acquire_quota('classify'))
+    assert rejected == ['classify']
+
+
+def test_rate_limit_storage_incrementa_e_reinicia_janela(tmp_path):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path / 'limits.sqlite3'}")
+    
+    assert storage.incr('ip', expiry=60) == 1
+    assert storage.incr('ip', expiry=60, amount=2) == 3
+    assert storage.get('ip') == 3
+    
+    # Janela expirada recomeça do zero
+    assert storage.incr('curta', expiry=-1) == 1
+    assert storage.incr('curta', expiry=60) == 1
+
+
+def test_rate_limit_storage_travado_falha_rapido(tmp_path):
+    path = tmp_path / 'limits.sqlite3'
+    storage = SQLiteStorage(f"sqlite:///{path}")
+    
+    holder = sqlite3.connect(str(path), isolation_level=None)
+    holder.execute('BEGIN IMMEDIATE')
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            storage.incr('ip', expiry=60)
+    finally:
+        holder.execute('ROLLBACK')
+        holder.close()
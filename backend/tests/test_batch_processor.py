@@ -0,0 +1,121 @@
+import asyncio
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import ai_handler, batch_processor, pipeline
+from app.services.batch_processor import BatchItem, expand_upload, process_batch
+from app.utils.exceptions import InvalidFileException
+
+
+def _zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_zip_expande_entradas_e_ignora_diretorios():
+    content = _zip([('a.txt', 'primeiro email'), ('pasta/b.txt', 'segundo email'), ('__MACOSX/._a.txt', 'x')])
+    
+    items = expand_upload('lote.zip', content)
+    
+    assert [item.source for item in items] == ['lote.zip/a.txt', 'lote.zip/pasta/b.txt']
+    assert items[1].content == b'segundo email'
+
+
+def test_zip_com_mais_entradas_que_o_lote_e_recusado_antes_de_descompactar(monkeypatch):
+    content = _zip([(f'{index}.txt', 'email') for index in range(6)])
+    monkeypatch.setattr(zipfile.ZipFile, 'read', lambda *args: pytest.fail('entrada descompactada'))
+    
+    with pytest.raises(InvalidFileException, match='limite de 5 itens'):
+        expand_upload('lote.zip', content, max_items=5)
+
+
+def test_zip_acima_do_limite_descompactado_e_recusado():
+    # ~3MB de texto repetido comprime para poucos KB
+    content = _zip([(f'{index}.txt', 'a' * 1024 * 1024) for index in range(3)])
+    
+    with pytest.raises(InvalidFileException, match='2MB descompactado'):
+        expand_upload('lote.zip', content, max_uncompressed_mb=2)
+
+
+def test_lote_acima_do_total_e_recusado_antes_de_processar(monkeypatch):
+    async def fail_process_batch(items):
+        raise AssertionError("o lote não deveria ser processado")
+    
+    monkeypatch.setattr(main, 'MAX_BATCH_TOTAL_SIZE_MB', 1)
+    monkeypatch.setattr(main, 'process_batch', fail_process_batch)
+    
+    # Cada arquivo cabe no limite por arquivo; juntos passam de 1MB
+    content = b'Preciso da segunda via do boleto. ' * 20000
+    response = TestClient(main.app).post('/api/v1/process/batch', files=[
+        ('files', ('a.txt', content, 'text/plain')),
+        ('files', ('b.txt', content, 'text/plain'))
+    ])
+    
+    assert response.status_code == 400
+    assert response.json()['error_code'] == 'INVALID_FILE'
+
+
+_EMAILS = [
+    'Solicito com urgência a segunda via do boleto, o sistema apresenta erro ao gerar o documento.',
+    'Feliz natal e um próspero ano novo para toda a equipe! Parabéns pelo ano.',
+    'Reunião de amanhã confirmada para as 10h.'
+]
+
+
+@pytest.fixture
+def offline_pipeline(monkeypatch, keyword_extractor):
+    async def fake_reply(raw_text):
+        return 'Resposta'
+
+    async def fake_ai(raw_text, nlp_keywords, use_full_text, thread_context=None, with_reply=True):
+        return {'category': 'Produtivo', 'confidence_score': 0.9, 'summary': 'IA', 'reason': 'IA',
+                'suggested_response': None, 'used_ai': True, 'reply_source': None}
+    
+    monkeypatch.setattr(pipeline, 'get_classification_cache', lambda: None)
+    monkeypatch.setattr(ai_handler, 'generate_reply_with_ai', fake_reply)
+    monkeypatch.setattr(ai_handler, '_classify_with_ai', fake_ai)
+
+
+def _summary(result):
+    return [
+        (item['status'], item['data'] and (item['data']['category'], item['data']['processing_details']['classification_method'],
+                                           item['data']['nlp_debug']['detected_keywords']))
+        for item in result['items']
+    ]
+
+
+def test_lote_extrai_keywords_e_pre_classifica_de_uma_vez(monkeypatch, offline_pipeline):
+    items = [BatchItem(source=f"texts[{index}]", text=text) for index, text in enumerate(_EMAILS)]
+    items.append(BatchItem(source='texts[3]', text='   '))
+    
+    batches = []
+
+    def keyword_hints(texts):
+        if not batches:
+            # Primeira passada: a extração em lote falha e cada item extrai as próprias keywords (caminho por email)
+            batches.append(None)
+            raise RuntimeError('sem lote')
+        batches.append(list(texts))
+        return ai_handler.keyword_hints_batch(texts)
+    
+    monkeypatch.setattr(batch_processor, 'keyword_hints_batch', keyword_hints)
+    expected = asyncio.run(process_batch(items))
+
+    def per_email(*args):
+        raise AssertionError('o lote não deveria extrair nem pré-classificar item a item')
+    
+    monkeypatch.setattr(pipeline, 'extract_keywords', per_email)
+    monkeypatch.setattr(ai_handler, 'pre_classify_with_keywords', per_email)
+    result = asyncio.run(process_batch(items))
+    
+    assert batches == [None, _EMAILS]
+    assert result['failed'] == expected['failed'] == 1
+    assert _summary(result) == _summary(expected)
+    assert {summary[1] for _, summary in _summary(result) if summary} == {'keywords_only', 'ai'}
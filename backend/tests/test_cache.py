@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+from app.services.cache import ClassificationCache, MemoryCacheBackend, SQLiteCacheBackend
+
+
+def _backend(tmp_path, max_entries=10, ttl_seconds=60):
+    return SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), ttl_seconds, max_entries)
+
+
+def test_sqlite_despeja_as_menos_acessadas_ao_passar_do_limite(tmp_path):
+    backend = _backend(tmp_path, max_entries=10)
+    for index in range(11):
+        backend.set(f'k{index}', 'v')
+    # Até a marca de 10% acima do limite, nada é despejado
+    assert len(backend) == 11
+    
+    backend.get('k0')
+    backend.set('k11', 'v')
+    
+    assert len(backend) == 10
+    assert backend.get('k0') == 'v'
+    assert backend.get('k1') is None
+    assert backend.get('k2') is None
+
+
+def test_sqlite_nao_grava_acesso_a_cada_leitura(tmp_path):
+    backend = _backend(tmp_path)
+    backend.set('k', 'v')
+    
+    statements = []
+    backend._conn.set_trace_callback(statements.append)
+    for _ in range(10):
+        assert backend.get('k') == 'v'
+    
+    assert not [statement for statement in statements if statement.startswith('UPDATE')]
+    assert backend._touched == {'k': backend._touched['k']}
+
+
+def test_sqlite_ignora_entradas_expiradas(tmp_path):
+    backend = _backend(tmp_path, ttl_seconds=-1)
+    backend.set('k', 'v')
+    
+    assert backend.get('k') is None
+
+
+class _RecordingBackend(SQLiteCacheBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value):
+        self.threads.append(threading.get_ident())
+        super().set(key, value)
+
+
+def test_classification_cache_com_sqlite_roda_fora_do_event_loop(tmp_path):
+    backend = _RecordingBackend(str(tmp_path / 'cache.sqlite3'), 60, 10)
+    cache = ClassificationCache(backend, use_keyword_key=True)
+    result = {'category': 'Improdutivo', 'used_ai': True}
+
+    async def run():
+        await cache.store('Feliz natal a todos!', 'feliz natal', result)
+        found = await cache.get_by_text('Feliz natal a todos!'), await cache.get_by_keywords('natal feliz')
+        return threading.get_ident(), found
+    
+    loop_thread, (by_text, by_keywords) = asyncio.run(run())
+    
+    # Todas as chamadas ao SQLite (gravações e as duas leituras) rodaram fora da thread do event loop
+    assert len(backend.threads) == 4
+    assert loop_thread not in backend.threads
+    assert by_text['ai_result'] == result
+    assert by_keywords['nlp_keywords'] == 'feliz natal'
+    assert cache.hits == {'text': 1, 'keywords': 1}
+    assert asyncio.run(cache.stats())['entries'] == 2
+
+
+def test_classification_cache_nao_guarda_fallback():
+    cache = ClassificationCache(MemoryCacheBackend(60, 10, 1024 * 1024))
+    
+    asyncio.run(cache.store('texto', 'text', {'category': 'Improdutivo', 'used_fallback': True}))
+    
+    assert asyncio.run(cache.get_by_text('texto')) is None
+    assert cache.misses == 1
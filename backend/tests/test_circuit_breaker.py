@@ -0,0 +1,156 @@
+import asyncio
+import types
+
+import pytest
+
+from app.services import ai_handler
+from app.utils import circuit_breaker
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, RetryBudget
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _breaker(**overrides) -> CircuitBreaker:
+    options = dict(failure_rate_threshold=0.5, slow_call_seconds=10, slow_call_rate_threshold=0.8,
+                   window_size=4, min_calls=4, open_seconds=30, half_open_probes=1)
+    options.update(overrides)
+    return CircuitBreaker('teste', **options)
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.record_failure(0.1)
+    assert breaker.state == OPEN
+
+
+def test_abre_pela_taxa_de_falhas_so_com_chamadas_suficientes(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure(0.1)
+    assert breaker.state == CLOSED
+    
+    breaker.record_success(0.1)
+    
+    # 3 de 4 falharam
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_abre_pela_taxa_de_chamadas_lentas(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record_success(12.0)
+    
+    assert breaker.state == OPEN
+
+
+def test_meio_aberto_libera_so_as_vagas_de_teste_e_fecha_com_sucesso(clock):
+    breaker = _breaker(half_open_probes=2)
+    _open(breaker)
+    clock.now += 29
+    assert not breaker.allow()
+    
+    clock.now += 2
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    
+    breaker.record_success(0.1)
+    
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['calls_in_window'] == 0
+    assert breaker.allow()
+
+
+def test_falha_no_meio_aberto_reabre_por_mais_um_periodo(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 31
+    assert breaker.allow()
+    
+    breaker.record_failure(0.1)
+    
+    assert breaker.state == OPEN
+    clock.now += 29
+    assert not breaker.allow()
+
+
+def test_release_devolve_a_vaga_de_teste(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 31
+    assert breaker.allow()
+    assert not breaker.allow()
+    
+    breaker.release()
+    
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_desativado_sempre_libera(clock):
+    breaker = _breaker(enabled=False)
+    for _ in range(10):
+        breaker.record_failure(0.1)
+    
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_orcamento_limita_retentativas_e_aceita_devolucao(clock):
+    budget = RetryBudget(ratio=0.5, min_per_second=0, window_seconds=10)
+    for _ in range(4):
+        budget.record_request()
+    
+    assert budget.try_acquire() and budget.try_acquire()
+    assert not budget.try_acquire()
+    
+    budget.refund()
+    assert budget.try_acquire()
+    
+    clock.now += 11
+    assert not budget.try_acquire()
+
+
+def test_retentativa_sem_cota_devolve_vaga_de_teste_e_orcamento(clock, monkeypatch):
+    breaker = _breaker()
+    budget = RetryBudget(ratio=0, min_per_second=1, window_seconds=10)
+    monkeypatch.setattr(ai_handler, '_circuit_breaker', breaker)
+    monkeypatch.setattr(ai_handler, '_retry_budget', budget)
+
+    async def deny_quota(call):
+        return False
+    
+    monkeypatch.setattr(ai_handler, '_acquire_quota', deny_quota)
+    # A chamada original começou antes do circuito abrir e falhou depois do período aberto
+    _open(breaker)
+    clock.now += 31
+    
+    assert not asyncio.run(ai_handler._reserve_retry('classify'))
+    
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert len(budget._retries) == 0
+
+
+def test_retentativa_com_circuito_aberto_devolve_o_orcamento(clock, monkeypatch):
+    breaker = _breaker()
+    budget = RetryBudget(ratio=0, min_per_second=1, window_seconds=10)
+    monkeypatch.setattr(ai_handler, '_circuit_breaker', breaker)
+    monkeypatch.setattr(ai_handler, '_retry_budget', budget)
+    _open(breaker)
+    
+    assert not asyncio.run(ai_handler._reserve_retry('classify'))
+    assert len(budget._retries) == 0
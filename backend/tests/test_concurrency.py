@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils import concurrency
+from app.utils.exceptions import ServerBusyException, StageTimeoutException
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(concurrency, '_cpu_executor', executor)
+    monkeypatch.setattr(concurrency, 'CPU_TASK_TIMEOUT', 0.05)
+    monkeypatch.setattr(concurrency, 'REQUEST_QUEUE_TIMEOUT', 0.05)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_tarefa_que_estourou_o_tempo_segura_a_vaga_ate_terminar(monkeypatch, pool):
+    release = threading.Event()
+
+    async def scenario():
+        monkeypatch.setattr(concurrency, '_cpu_pending_semaphore', asyncio.Semaphore(1))
+        
+        with pytest.raises(StageTimeoutException):
+            await concurrency.run_cpu_bound(release.wait, 5)
+        # A tarefa continua rodando no pool: a vaga não volta com o timeout
+        with pytest.raises(ServerBusyException):
+            await concurrency.run_cpu_bound(int, '1')
+        
+        release.set()
+        for _ in range(100):
+            if not concurrency._cpu_pending_semaphore.locked():
+                break
+            await asyncio.sleep(0.01)
+        assert await concurrency.run_cpu_bound(int, '2') == 2
+    
+    asyncio.run(scenario())
+
+
+def test_erro_da_tarefa_devolve_a_vaga(monkeypatch, pool):
+    async def scenario():
+        monkeypatch.setattr(concurrency, '_cpu_pending_semaphore', asyncio.Semaphore(1))
+        
+        with pytest.raises(ValueError):
+            await concurrency.run_cpu_bound(int, 'x')
+        await asyncio.sleep(0.01)
+        assert await concurrency.run_cpu_bound(int, '3') == 3
+    
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+from app.services.context_builder import clean_email_text, signature_name, split_quoted_history
+
+
+def test_agradecimento_no_meio_nao_remove_o_pedido():
+    text = (
+        "Bom dia, equipe…\nMuito obrigado!\nAinda não recebi o boleto de março.\n"
+        "Podem reenviar ainda hoje? É urgente.\nMaria"
+    )
+    paragraphs, removed = clean_email_text(text)
+    
+    cleaned = '\n'.join(paragraphs)
+    assert 'signature' not in removed
+    assert 'Ainda não recebi o boleto de março.' in cleaned
+    assert 'Podem reenviar ainda hoje? É urgente.' in cleaned
+
+
+def test_assinatura_com_nome_cargo_e_contato_e_removida():
+    text = (
+        "Olá, preciso da segunda via do boleto do contrato 12345, que venceu ontem e não chegou por email.\n\n"
+        "Atenciosamente,\nCarla Souza\nAnalista Financeiro\nEmpresa Exemplo Ltda.\n"
+        "(11) 98765-4321\ncarla.souza@exemplo.com.br"
+    )
+    paragraphs, removed = clean_email_text(text)
+    
+    cleaned = '\n'.join(paragraphs)
+    assert 'signature' in removed
+    assert cleaned.endswith('Atenciosamente,')
+    assert '98765' not in cleaned
+    assert signature_name(text) == 'Carla Souza'
+
+
+def test_pergunta_depois_do_fecho_nao_e_assinatura():
+    text = (
+        "Olá, segue em anexo o comprovante de pagamento referente à fatura do mês passado, conforme combinado.\n"
+        "Obrigada,\nJoana\nVocês conseguem confirmar o recebimento?"
+    )
+    paragraphs, removed = clean_email_text(text)
+    
+    assert 'signature' not in removed
+    assert 'Vocês conseguem confirmar o recebimento?' in '\n'.join(paragraphs)
+
+
+def test_fecho_seguido_de_frase_longa_nao_e_assinatura():
+    text = (
+        "Olá, gostaria de atualizar o endereço de cobrança cadastrado na minha conta para o novo escritório.\n"
+        "Grato\nO endereço novo é Rua das Flores 100 sala 2 no centro da cidade"
+    )
+    paragraphs, removed = clean_email_text(text)
+    
+    assert 'signature' not in removed
+    assert 'Rua das Flores 100' in '\n'.join(paragraphs)
+
+
+def test_frase_com_escreveu_nao_e_cabecalho_de_citacao():
+    text = (
+        "Olá, preciso de ajuda com o reembolso da viagem.\nEm março o gerente escreveu\n"
+        "que o valor seria depositado em 30 dias, mas até agora nada. Podem verificar?"
+    )
+    paragraphs, removed = clean_email_text(text)
+    
+    assert 'quoted_reply' not in removed
+    assert 'Podem verificar?' in '\n'.join(paragraphs)
+    assert split_quoted_history(text) == (text, None)
+
+
+def test_cabecalho_de_citacao_com_data_e_remetente_corta_a_conversa():
+    text = (
+        "Podem reenviar o boleto de março ainda hoje?\n\n"
+        "On Mon, Jun 3, 2024 at 10:00 AM Suporte <suporte@x.com> wrote:\n> Segue o boleto em anexo."
+    )
+    paragraphs, removed = clean_email_text(text)
+    
+    assert 'quoted_reply' in removed
+    assert 'Segue o boleto' not in '\n'.join(paragraphs)
+    assert split_quoted_history(text) == ("Podem reenviar o boleto de março ainda hoje?", "Segue o boleto em anexo.")
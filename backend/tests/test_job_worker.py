@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+from app.services import job_worker
+
+
+class _IdleQueue:
+    def __init__(self, stop_event, polls):
+        self.stop_event = stop_event
+        self.polls = polls
+
+    def claim(self, worker):
+        self.polls -= 1
+        if self.polls <= 0:
+            self.stop_event.set()
+        return None
+
+    def purge(self):
+        pass
+
+
+def test_worker_salva_indice_e_biblioteca_periodicamente_e_ao_encerrar(monkeypatch):
+    saves = []
+    stop_event = threading.Event()
+
+    async def no_warm_up():
+        pass
+    
+    monkeypatch.setattr(job_worker, 'get_job_queue', lambda: _IdleQueue(stop_event, polls=20))
+    monkeypatch.setattr(job_worker, 'warm_up_cpu_executor', no_warm_up)
+    monkeypatch.setattr(job_worker, 'JOB_POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(job_worker, 'NEAR_DUPLICATE_SAVE_INTERVAL', 0.02)
+    monkeypatch.setattr(job_worker, 'REPLY_LIBRARY_SAVE_INTERVAL', 0.02)
+    monkeypatch.setattr(job_worker, 'save_near_duplicate_index', lambda: saves.append(('near_duplicate', stop_event.is_set())))
+    monkeypatch.setattr(job_worker, 'save_reply_library', lambda: saves.append(('reply_library', stop_event.is_set())))
+    
+    asyncio.run(job_worker.run_worker('teste', stop_event))
+    
+    # Gravações periódicas enquanto roda e a final, depois do sinal de parada
+    for name in ('near_duplicate', 'reply_library'):
+        assert (name, False) in saves and (name, True) in saves
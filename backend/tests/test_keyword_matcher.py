@@ -0,0 +1,129 @@
+import os
+import random
+
+from app.services.ai_handler import IMPRODUTIVO_KEYWORDS, PRODUTIVO_KEYWORDS, pre_classify_with_keywords
+from app.services.keyword_matcher import KeywordMatcher, ReloadableKeywordMatcher, build_entries
+
+
+# Termos de uma palavra: os que a busca antiga por conjunto conseguia casar
+SINGLE_WORD_PRODUTIVO = {term for term in PRODUTIVO_KEYWORDS if ' ' not in term}
+SINGLE_WORD_IMPRODUTIVO = {term for term in IMPRODUTIVO_KEYWORDS if ' ' not in term}
+ALL_TERMS = SINGLE_WORD_PRODUTIVO | SINGLE_WORD_IMPRODUTIVO
+
+
+def _default_matcher() -> KeywordMatcher:
+    return KeywordMatcher(build_entries(PRODUTIVO_KEYWORDS, IMPRODUTIVO_KEYWORDS))
+
+
+def _set_lookup(stems, terms):
+    # Busca antiga: stem idêntico ao termo
+    return set(stems) & terms
+
+
+def _prefix_lookup(stems, terms):
+    return {term for term in terms if any(stem.startswith(term) for stem in stems)}
+
+
+def test_busca_na_trie_contem_a_busca_por_conjunto():
+    matcher = _default_matcher()
+    # Stems que nenhum termo prefixa: só os termos sorteados podem casar
+    noise = [word for word in ('reuniã', 'amanh', 'confirm', 'document', 'equip', 'segund', 'via', 'boleto')
+             if not any(word.startswith(term) for term in ALL_TERMS)]
+    # Termos sem outro termo como prefixo
+    prefix_free = {term for term in ALL_TERMS if not any(other != term and term.startswith(other) for other in ALL_TERMS)}
+    rng = random.Random(7)
+    
+    for _ in range(200):
+        stems = rng.sample(sorted(ALL_TERMS), rng.randint(0, 6)) + rng.sample(noise, rng.randint(0, len(noise)))
+        rng.shuffle(stems)
+        
+        matches = matcher.match(stems)
+        
+        for found, terms in ((matches.produtivo, SINGLE_WORD_PRODUTIVO), (matches.improdutivo, SINGLE_WORD_IMPRODUTIVO)):
+            assert _set_lookup(stems, terms) <= set(found) <= _prefix_lookup(stems, terms)
+            if set(stems) <= prefix_free | set(noise):
+                assert set(found) == _set_lookup(stems, terms)
+        assert matches.total_keywords == len(set(stems))
+
+
+def test_busca_na_trie_igual_a_por_conjunto_sem_termos_prefixos():
+    matcher = _default_matcher()
+    
+    matches = matcher.match(['urgent', 'suport', 'natal', 'confirm'])
+    
+    assert set(matches.produtivo) == {'urgent', 'suport'}
+    assert set(matches.improdutivo) == {'natal'}
+    assert set(matcher.match(['obrigado']).improdutivo) == {'obrigad'}
+
+
+def test_um_stem_sozinho_nao_atinge_o_limiar():
+    matcher = _default_matcher()
+    
+    for term in sorted(ALL_TERMS):
+        for stem in (term, term + 'ment'):
+            matches = matcher.match([stem])
+            assert matches.produtivo_weight < 2 and matches.improdutivo_weight < 2
+            assert pre_classify_with_keywords(stem) is None
+
+
+def test_termos_prefixos_um_do_outro_contam_uma_vez_por_stem():
+    matcher = KeywordMatcher({'produtivo': {}, 'improdutivo': {'obrigad': 1.0, 'obrigado': 1.0, 'obrig': 1.5}})
+    
+    assert matcher.match(['obrigado']).improdutivo == {'obrig': 1.5}
+    assert matcher.term_matches('obrigado') == ([('improdutivo', 'obrig', 1.5)], False)
+    # Stems diferentes continuam somando
+    assert matcher.match(['obrigado', 'obrigada']).improdutivo_weight == 1.5
+    assert KeywordMatcher({'produtivo': {}, 'improdutivo': {'obrigad': 1.0, 'natal': 1.0}}).match(
+        ['obrigado', 'natal']).improdutivo_weight == 2.0
+
+
+def test_termo_casa_como_prefixo_do_stem():
+    matcher = KeywordMatcher({'produtivo': {'fatur': 1.0}, 'improdutivo': {'faturamento': 1.0}})
+    
+    assert matcher.match(['faturament']).produtivo == {'fatur': 1.0}
+    assert matcher.match(['faturament']).improdutivo == {}
+    assert matcher.match(['fat']).produtivo == {}
+
+
+def test_frase_casa_stems_consecutivos():
+    matcher = KeywordMatcher({'produtivo': {}, 'improdutivo': {'ano nov': 1.0}})
+    
+    assert matcher.has_phrases
+    assert matcher.match(['feliz', 'ano', 'nov']).improdutivo == {'ano nov': 1.0}
+    # Cada palavra da frase também casa como prefixo
+    assert matcher.match(['anos', 'novidad']).improdutivo == {'ano nov': 1.0}
+    assert matcher.match(['ano', 'feliz', 'nov']).improdutivo == {}
+    assert matcher.match(['nov', 'ano']).improdutivo == {}
+
+
+def test_pesos_somam_por_categoria_e_termos_contam_uma_vez():
+    matcher = KeywordMatcher({'produtivo': {'urgent': 2.0, 'erro': 0.5}, 'improdutivo': {'obrigad': 1.5}})
+    
+    matches = matcher.match(['urgent', 'erro', 'errou', 'obrigad'])
+    
+    assert matches.produtivo_score == 2
+    assert matches.produtivo_weight == 2.5
+    assert matches.improdutivo_weight == 1.5
+
+
+def test_term_matches_isola_um_stem_e_indica_inicio_de_frase():
+    matcher = KeywordMatcher({'produtivo': {'ajud': 1.0}, 'improdutivo': {'ano nov': 1.0}})
+    
+    assert matcher.term_matches('ajudar') == ([('produtivo', 'ajud', 1.0)], False)
+    assert matcher.term_matches('ano') == ([], True)
+    assert matcher.term_matches('xyz') == ([], False)
+
+
+def test_recarrega_quando_o_arquivo_muda_e_mantem_a_ultima_versao_valida(tmp_path):
+    path = tmp_path / 'keywords.json'
+    path.write_text('{"produtivo": ["boleto"], "improdutivo": []}', encoding='utf-8')
+    reloadable = ReloadableKeywordMatcher(build_entries(['ajud'], []), str(path), check_interval=0)
+    
+    assert reloadable.current().match(['boleto']).produtivo == {'boleto': 1.0}
+    
+    path.write_text('{"produtivo": {"boleto": -1}}', encoding='utf-8')
+    os.utime(path, (1, 1))
+    assert reloadable.current().match(['boleto']).produtivo == {'boleto': 1.0}
+    
+    path.unlink()
+    assert reloadable.current().match(['ajud']).produtivo == {'ajud': 1.0}
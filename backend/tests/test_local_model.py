@@ -0,0 +1,50 @@
+import os
+import random
+
+from app.services.local_model import LocalModel
+from app.services.model_training import evaluate, split_examples, train_model
+
+
+# Stems fora das listas de keywords: quem decide é o modelo local, não a pré-classificação
+_PRODUTIVO_STEMS = ['reembols', 'contrat', 'document', 'praz', 'envi', 'cadastr', 'acess', 'senh']
+_IMPRODUTIVO_STEMS = ['confraterniz', 'almoc', 'convit', 'fest', 'equip', 'sort', 'promoc', 'newslett']
+_NOISE_STEMS = ['hoj', 'seman', 'empres', 'client', 'time', 'mes']
+
+
+def _examples(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    examples = []
+    for index in range(count):
+        category, stems = (('Produtivo', _PRODUTIVO_STEMS) if index % 2 == 0
+                           else ('Improdutivo', _IMPRODUTIVO_STEMS))
+        keywords = rng.sample(stems, 4) + rng.sample(_NOISE_STEMS, 2)
+        examples.append((' '.join(keywords), category))
+    return examples
+
+
+def test_treino_previsao_e_avaliacao_de_ponta_a_ponta(tmp_path):
+    train, holdout = split_examples(_examples(200), holdout=0.25)
+    model = train_model(train)
+    
+    assert model.examples == len(train)
+    assert model.weights['reembols'] > 0 > model.weights['confraterniz']
+    
+    prediction = model.predict('reembols contrat praz hoj')
+    assert prediction.category == 'Produtivo' and prediction.confidence > 0.9
+    assert set(prediction.top_stems) <= {'reembols', 'contrat', 'praz'}
+    # Poucos stems conhecidos: o modelo não decide
+    assert model.predict('reembols desconhec', min_stems=2) is None
+    
+    report = evaluate(model, holdout, threshold=0.8, min_stems=2)
+    assert report['examples'] == len(holdout)
+    assert report['keywords'] == 0
+    assert report['model_accuracy'] == 1.0
+    assert report['kept_off_gemini'] == 1.0
+    
+    path = str(tmp_path / 'modelo' / 'local_model.json')
+    model.save(path)
+    loaded = LocalModel.load(path)
+    
+    assert os.listdir(tmp_path / 'modelo') == ['local_model.json']
+    assert loaded.weights == model.weights and loaded.bias == model.bias
+    assert evaluate(loaded, holdout, threshold=0.8, min_stems=2)['model_accuracy'] == 1.0
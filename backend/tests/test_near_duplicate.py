@@ -0,0 +1,123 @@
+import json
+import os
+import random
+import threading
+
+from app.services.near_duplicate import NearDuplicateIndex, minhash_signature, signature_similarity
+
+
+def _result(category='Produtivo'):
+    return {'category': category, 'confidence_score': 0.9, 'summary': 'resumo', 'reason': 'motivo',
+            'suggested_response': 'resposta'}
+
+
+def _stems(rng, count, prefix='stem'):
+    return [f"{prefix}{rng.randrange(10 ** 9)}" for _ in range(count)]
+
+
+def _variant(rng, stems, jaccard):
+    """Conjunto com Jaccard exato em relação a `stems`: troca parte dos stems por novos."""
+    # |A ∩ B| / |A ∪ B| = (n - k) / (n + k)  =>  k = n (1 - j) / (1 + j)
+    replaced = round(len(stems) * (1 - jaccard) / (1 + jaccard))
+    kept = stems[:len(stems) - replaced]
+    return kept + _stems(rng, replaced, 'novo')
+
+
+def test_similaridade_estima_jaccard():
+    rng = random.Random(7)
+    errors = []
+    for jaccard in (0.3, 0.6, 0.9):
+        for _ in range(30):
+            stems = _stems(rng, 60)
+            first = minhash_signature(' '.join(stems))
+            second = minhash_signature(' '.join(_variant(rng, stems, jaccard)))
+            errors.append(abs(signature_similarity(first, second) - jaccard))
+    
+    assert sum(errors) / len(errors) < 0.05
+    assert max(errors) < 0.25
+
+
+def test_lsh_encontra_quase_duplicatas_acima_de_0_8():
+    rng = random.Random(11)
+    index = NearDuplicateIndex(threshold=0.0, max_entries=10000)
+    originals = [_stems(rng, 40) for _ in range(300)]
+    for stems in originals:
+        index.add(' '.join(stems), _result())
+    
+    found = sum(1 for stems in originals if index.lookup(' '.join(_variant(rng, stems, 0.85))) is not None)
+    
+    # Probabilidade teórica de coincidir numa banda com Jaccard 0,85: > 99,9%
+    assert found >= 297
+
+
+def test_lsh_raramente_compara_emails_diferentes():
+    rng = random.Random(13)
+    index = NearDuplicateIndex(threshold=0.0, max_entries=10000)
+    for _ in range(300):
+        index.add(' '.join(_stems(rng, 40)), _result())
+    
+    candidates = sum(1 for _ in range(300) if index.lookup(' '.join(_stems(rng, 40))) is not None)
+    
+    assert candidates <= 3
+
+
+def test_limiar_decide_se_reaproveita_o_resultado():
+    rng = random.Random(17)
+    stems = _stems(rng, 40)
+    index = NearDuplicateIndex(threshold=0.85, max_entries=100)
+    index.add(' '.join(stems), _result())
+    
+    same = index.lookup(' '.join(reversed(stems)))
+    assert same.similarity == 1.0 and same.result['category'] == 'Produtivo'
+    
+    distant = index.lookup(' '.join(_variant(rng, stems, 0.5)))
+    assert distant is None or (distant.similarity < 0.85 and distant.result is None)
+    assert index.hits == 1
+
+
+def test_curtos_e_degradados_nao_entram():
+    index = NearDuplicateIndex(threshold=0.85, max_entries=100)
+    index.add('boleto venc', _result())
+    index.add('a b c d e f', dict(_result(), used_fallback=True))
+    index.add('g h i j k l', dict(_result(), suggested_response=None))
+    
+    assert index.stats()['entries'] == 0
+    assert index.lookup('boleto venc') is None
+
+
+def test_despejo_lru():
+    rng = random.Random(19)
+    index = NearDuplicateIndex(threshold=0.85, max_entries=2)
+    first, second, third = (_stems(rng, 20) for _ in range(3))
+    index.add(' '.join(first), _result())
+    index.add(' '.join(second), _result())
+    index.lookup(' '.join(first))
+    index.add(' '.join(third), _result())
+    
+    assert index.lookup(' '.join(first)).result is not None
+    assert index.lookup(' '.join(second)) is None
+
+
+def test_gravacoes_simultaneas_nao_corrompem_o_arquivo(tmp_path):
+    rng = random.Random(23)
+    path = str(tmp_path / 'near.json')
+    indexes = []
+    for size in (50, 80):
+        index = NearDuplicateIndex(threshold=0.85, max_entries=1000)
+        for _ in range(size):
+            index.add(' '.join(_stems(rng, 20)), _result())
+        indexes.append(index)
+    
+    threads = [threading.Thread(target=lambda index=index: [index.save(path) for _ in range(20)]) for index in indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    with open(path, encoding='utf-8') as file:
+        assert len(json.load(file)['entries']) in (50, 80)
+    assert os.listdir(tmp_path) == ['near.json']
+    
+    loaded = NearDuplicateIndex(threshold=0.85, max_entries=1000)
+    assert loaded.load(path) in (50, 80)
+    assert not loaded.dirty
@@ -0,0 +1,68 @@
+import pytest
+
+from app.services.ai_handler import pre_classify_batch, pre_classify_with_keywords
+from app.services import nlp_engine
+from app.services.nlp_engine import extract_keywords, extract_keywords_batch
+from app.utils.exceptions import NLPProcessingException
+
+
+EMAILS = [
+    'Solicito com urgência a segunda via do boleto, o sistema apresenta erro ao gerar o documento.',
+    'Feliz natal e um próspero ano novo para toda a equipe! Parabéns pelo ano.',
+    'Obrigado pelo retorno, agradeço a atenção de todos.',
+    'Preciso de ajuda: o suporte não respondeu ao pedido de acesso e o problema continua.',
+    'Reunião de amanhã confirmada para as 10h.',
+    'Solicito solicito SOLICITO o status do pedido 123 e do pedido 456.'
+]
+
+
+def test_lote_gera_as_mesmas_keywords_que_o_caminho_por_email(keyword_extractor):
+    matrix = extract_keywords_batch(EMAILS)
+    
+    assert matrix.matrix.shape[0] == len(EMAILS)
+    for row, text in enumerate(EMAILS):
+        assert matrix.keywords(row) == extract_keywords(text)
+
+
+def test_lote_compartilha_o_vocabulario_e_marca_cada_stem_uma_vez(keyword_extractor):
+    matrix = extract_keywords_batch(EMAILS)
+    
+    assert len(matrix.terms) == len(set(matrix.terms)) == matrix.matrix.shape[1]
+    assert all(matrix.vocabulary[term] == index for index, term in enumerate(matrix.terms))
+    # Matriz binária: stems repetidos no email contam uma vez
+    assert matrix.matrix.max() == 1
+    assert matrix.keywords(5).split().count(keyword_extractor.stem('solicito')) == 1
+
+
+def test_lote_transforma_textos_vazios_em_linhas_vazias(keyword_extractor):
+    matrix = extract_keywords_batch(['', '   ', EMAILS[0]])
+    
+    assert matrix.row_terms(0) == [] and matrix.row_terms(1) == []
+    assert matrix.keywords(2) == extract_keywords(EMAILS[0])
+    with pytest.raises(NLPProcessingException):
+        extract_keywords('   ')
+
+
+def test_pre_classificacao_em_lote_igual_a_por_email(keyword_extractor):
+    matrix = extract_keywords_batch(EMAILS)
+    
+    expected = [pre_classify_with_keywords(extract_keywords(text)) for text in EMAILS]
+    
+    assert pre_classify_batch(matrix) == expected
+    # O corpus cobre os dois atalhos e o caso ambíguo
+    assert {result and result['category'] for result in expected} == {'Produtivo', 'Improdutivo', None}
+
+
+@pytest.mark.parametrize('version, resource', [('3.8', 'punkt'), ('3.8.1', 'punkt'), ('3.8.2', 'punkt_tab'), ('3.9.1', 'punkt_tab')])
+def test_tokenizador_exigido_depende_da_versao_do_nltk(monkeypatch, version, resource):
+    import nltk
+    
+    found = []
+    monkeypatch.setattr(nltk, '__version__', version)
+    monkeypatch.setattr(nltk.data, 'find', found.append)
+    monkeypatch.setattr(nlp_engine, '_nltk_checked', False)
+    
+    nlp_engine._ensure_nltk_data()
+    
+    assert found[0] == f"tokenizers/{resource}"
+    assert set(found[1:]) == {'corpora/stopwords', 'stemmers/rslp'}
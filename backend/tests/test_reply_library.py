@@ -0,0 +1,95 @@
+import os
+
+from app.services.nlp_engine import extract_keywords
+from app.services.reply_library import (
+    ReplyLibrary,
+    extract_entities,
+    fill_template,
+    make_template,
+    mentioned_stems
+)
+
+
+MARCH = (
+    "Bom dia, preciso da segunda via do boleto de março do contrato 12345, o pagamento vence em breve.\n"
+    "Atenciosamente,\nCarla Souza"
+)
+MARCH_REPLY = (
+    "Prezada Carla, segue a segunda via do boleto de março do contrato 12345. "
+    "Qualquer dúvida, estamos à disposição."
+)
+APRIL = (
+    "Bom dia, preciso da segunda via do boleto de abril do contrato 67890, o pagamento vence em breve.\n"
+    "Atenciosamente,\nJoão Lima"
+)
+MARCH_OTHER_CONTRACT = (
+    "Bom dia, preciso da segunda via do boleto de março do contrato 67890, o pagamento vence em breve.\n"
+    "Atenciosamente,\nJoão Lima"
+)
+
+
+def _library(keyword_extractor, threshold=0.3):
+    library = ReplyLibrary(threshold=threshold, max_entries=100, min_stems=4)
+    assert library.add(MARCH, extract_keywords(MARCH), MARCH_REPLY)
+    return library
+
+
+def test_modelo_troca_os_dados_do_email_por_campos():
+    entities = extract_entities(MARCH)
+    template = make_template(MARCH_REPLY, entities)
+    
+    assert entities['nome'] == 'Carla Souza' and entities['numero'] == '12345'
+    assert template.startswith('Prezado(a) {primeiro_nome}, segue')
+    assert '{numero}' in template and '12345' not in template
+    assert fill_template(template, {'primeiro_nome': 'João', 'numero': '67890'}).startswith('Prezado(a) João')
+    assert fill_template(template, {'primeiro_nome': 'João'}) is None
+
+
+def test_resposta_com_numero_que_nao_veio_do_email_nao_vira_modelo():
+    assert make_template("Seu protocolo é 998877.", extract_entities(MARCH)) is None
+    assert make_template("Prezada Ana, recebemos o pedido.", extract_entities(MARCH)) is None
+
+
+def test_modelo_guarda_os_detalhes_citados_do_email_original(keyword_extractor):
+    template = make_template(MARCH_REPLY, extract_entities(MARCH))
+    required = mentioned_stems(template, set(extract_keywords(MARCH).split()))
+    
+    assert any('março'.startswith(stem) for stem in required)
+    assert not any(stem.startswith('nom') or stem.startswith('numer') for stem in required)
+
+
+def test_modelo_do_boleto_de_marco_nao_responde_o_de_abril(keyword_extractor):
+    library = _library(keyword_extractor)
+    
+    assert library.match(APRIL, extract_keywords(APRIL)) is None
+    assert library.unfilled == 1 and library.hits == 0
+
+
+def test_modelo_responde_o_mesmo_pedido_com_os_dados_novos(keyword_extractor):
+    library = _library(keyword_extractor)
+    
+    match = library.match(MARCH_OTHER_CONTRACT, extract_keywords(MARCH_OTHER_CONTRACT))
+    
+    assert match is not None
+    assert '67890' in match.reply and '12345' not in match.reply
+    assert match.reply.startswith('Prezado(a) João')
+
+
+def test_email_de_outro_mes_ganha_modelo_proprio(keyword_extractor):
+    library = _library(keyword_extractor)
+    
+    assert library.add(MARCH_OTHER_CONTRACT, extract_keywords(MARCH_OTHER_CONTRACT), MARCH_REPLY) is None
+    april_reply = MARCH_REPLY.replace('março', 'abril').replace('Carla', 'João').replace('12345', '67890')
+    assert library.add(APRIL, extract_keywords(APRIL), april_reply) is not None
+    assert '67890' in library.match(APRIL, extract_keywords(APRIL)).reply
+
+
+def test_salva_e_carrega_sem_deixar_temporarios(keyword_extractor, tmp_path):
+    library = _library(keyword_extractor)
+    path = str(tmp_path / 'library.json')
+    library.save(path)
+    
+    loaded = ReplyLibrary(threshold=0.3, max_entries=100, min_stems=4)
+    assert loaded.load(path) == 1
+    assert loaded.match(APRIL, extract_keywords(APRIL)) is None
+    assert os.listdir(tmp_path) == ['library.json']
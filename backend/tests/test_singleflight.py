@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+class _Work:
+    """
+    Função compartilhada controlada pelo teste: conta as execuções e só termina quando liberada.
+    """
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_chamadas_concorrentes_executam_uma_vez_e_recebem_copias():
+    async def run():
+        flight = SingleFlight('teste')
+        work = _Work(result={'category': 'Produtivo', 'tags': []})
+        tasks = [asyncio.ensure_future(flight.do('k', work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        work.release.set()
+        results = await asyncio.gather(*tasks)
+        return flight, work, results
+    
+    flight, work, results = asyncio.run(run())
+    
+    assert work.calls == 1
+    assert len(flight) == 0
+    assert results[0] == results[1] == results[2] == {'category': 'Produtivo', 'tags': []}
+    results[0]['tags'].append('alterado')
+    assert results[1]['tags'] == [] and results[0] is not results[1]
+
+
+def test_excecao_chega_a_todos_os_solicitantes():
+    async def run():
+        flight = SingleFlight('teste')
+        work = _Work(error=ValueError('falhou'))
+        tasks = [asyncio.ensure_future(flight.do('k', work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return work, await asyncio.gather(*tasks, return_exceptions=True)
+    
+    work, results = asyncio.run(run())
+    
+    assert work.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_desistencia_de_um_solicitante_nao_cancela_os_demais():
+    async def run():
+        flight = SingleFlight('teste')
+        work = _Work(result='ok')
+        first = asyncio.ensure_future(flight.do('k', work))
+        second = asyncio.ensure_future(flight.do('k', work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        return work, first, await second
+    
+    work, first, result = asyncio.run(run())
+    
+    assert first.cancelled()
+    assert result == 'ok'
+    assert work.calls == 1 and not work.cancelled
+
+
+def test_execucao_e_cancelada_quando_todos_desistem_e_a_chave_recomeca():
+    async def run():
+        flight = SingleFlight('teste')
+        abandoned = _Work(result='antigo')
+        tasks = [asyncio.ensure_future(flight.do('k', abandoned)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        pending_after_cancel = len(flight)
+        
+        fresh = _Work(result='novo')
+        fresh.release.set()
+        return abandoned, pending_after_cancel, fresh, await flight.do('k', fresh)
+    
+    abandoned, pending_after_cancel, fresh, result = asyncio.run(run())
+    
+    assert abandoned.cancelled
+    assert pending_after_cancel == 0
+    assert fresh.calls == 1 and result == 'novo'
+
+
+def test_chaves_diferentes_e_chamadas_seguintes_executam_de_novo():
+    async def run():
+        flight = SingleFlight('teste')
+        work = _Work(result='ok')
+        work.release.set()
+        await asyncio.gather(flight.do('a', work), flight.do('b', work))
+        await flight.do('a', work)
+        return work
+    
+    assert asyncio.run(run()).calls == 3
+
+
+def test_cancelar_o_solicitante_propaga_cancelamento():
+    async def run():
+        flight = SingleFlight('teste')
+        task = asyncio.ensure_future(flight.do('k', _Work()))
+        await asyncio.sleep(0)
+        task.cancel()
+        await task
+    
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from app.services.cache import SQLiteCacheBackend
+from app.services.thread_context import ThreadStore
+
+
+class _RecordingBackend(SQLiteCacheBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value):
+        self.threads.append(threading.get_ident())
+        super().set(key, value)
+
+
+def test_resposta_encontra_a_conversa_com_sqlite_fora_do_event_loop(tmp_path):
+    backend = _RecordingBackend(str(tmp_path / 'threads.sqlite3'), 3600, 100, table='thread_state')
+    store = ThreadStore(backend, 10)
+    ai_result = {'category': 'Produtivo', 'summary': 'Pede o boleto de março'}
+
+    async def run():
+        first = await store.resolve('Ainda não recebi o boleto de março', message_id='<a@x>')
+        await store.record(first, 'boleto marc', ai_result)
+        reply = await store.resolve('Pode reenviar hoje?\n\n> Ainda não recebi o boleto de março', in_reply_to='<a@x>')
+        return threading.get_ident(), reply
+    
+    loop_thread, reply = asyncio.run(run())
+    
+    assert reply.matched_by == 'in_reply_to'
+    assert reply.parent.messages == 1 and reply.parent.keywords == ['boleto', 'marc']
+    assert backend.threads and loop_thread not in backend.threads
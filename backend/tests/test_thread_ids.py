@@ -0,0 +1,54 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    calls = []
+
+    async def fake_process_email(file, text, defer_reply=False, message_id=None, in_reply_to=None):
+        calls.append((message_id, in_reply_to))
+        raise HTTPException(status_code=418)
+    
+    monkeypatch.setattr(main, '_process_email', fake_process_email)
+    return calls
+
+
+def _post(client):
+    return client.post('/api/v1/process', data={
+        'text': 'Ainda não recebi o boleto de março', 'message_id': '<a@x>', 'in_reply_to': '<alheio@y>'
+    })
+
+
+def test_ids_do_cliente_ignorados_por_padrao(monkeypatch, captured):
+    monkeypatch.setattr(main, 'THREAD_TRUST_CLIENT_IDS', False)
+    
+    assert _post(TestClient(main.app)).status_code == 418
+    assert captured == [(None, None)]
+
+
+def test_ids_do_cliente_aceitos_quando_confiaveis(monkeypatch, captured):
+    monkeypatch.setattr(main, 'THREAD_TRUST_CLIENT_IDS', True)
+    
+    assert _post(TestClient(main.app)).status_code == 418
+    assert captured == [('<a@x>', '<alheio@y>')]
+
+
+def test_stream_ignora_ids_do_cliente(monkeypatch):
+    calls = []
+
+    async def fake_events(raw_text, filename, message_id, in_reply_to):
+        calls.append((message_id, in_reply_to))
+        yield main._sse('done', {})
+    
+    monkeypatch.setattr(main, 'THREAD_TRUST_CLIENT_IDS', False)
+    monkeypatch.setattr(main, '_sse_events', fake_events)
+    
+    response = TestClient(main.app).post('/api/v1/process/stream', data={
+        'text': 'Ainda não recebi o boleto de março', 'in_reply_to': '<alheio@y>'
+    })
+    assert response.status_code == 200
+    assert calls == [(None, None)]